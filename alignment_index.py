@@ -0,0 +1,228 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from quran_text import get_word_spans
+from quran_tokens import FATHA, KASRA, DAMMA, TANWEEN, load_ayah_tokens
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from segment_arrays import (SEGMENT_ARRAYS_DIR, SegmentArrays, INDEX_RECITER, INDEX_SURAH, INDEX_AYAH,
+                            INDEX_COUNT, SEGMENT_WORD, SEGMENT_START, SEGMENT_END, PLACEHOLDER_MAX_MS)
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+ALIGNMENT_INDEX_PATH = os.path.join(BASE_PATH, 'alignment_index.npz')
+ALIGNMENT_INDEX_VERSION = 2
+# Every syllable has one short vowel (or tanween) as its nucleus
+SYLLABLE_BITS = FATHA | KASRA | DAMMA | TANWEEN
+# Dense (surah, ayah) table: surahs 1-114, ayahs up to 286
+AYAH_TABLE_SHAPE = (115, 287)
+
+
+def count_syllables(tokens):
+    """
+    Syllables per word from the text, as {(surah, ayah): int array} with one
+    entry per word. Counted in one bincount over all ayahs.
+    """
+    keys = sorted(tokens)
+    word_counts = np.array([len(tokens[key].word_texts) for key in keys], dtype=np.int64)
+    word_base = np.cumsum(word_counts) - word_counts
+
+    letter_counts = np.array([len(tokens[key]) for key in keys], dtype=np.int64)
+    marks = np.concatenate([np.frombuffer(tokens[key].marks, dtype=np.uint16) for key in keys])
+    words = np.concatenate([np.frombuffer(tokens[key].words, dtype=np.uint16) for key in keys]).astype(np.int64)
+    global_word = np.repeat(word_base, letter_counts) + words - 1
+
+    syllables = np.bincount(global_word, weights=(marks & SYLLABLE_BITS) != 0, minlength=int(word_counts.sum()))
+    syllables = syllables.astype(np.int16)
+    return {key: syllables[base:base + count] for key, base, count in zip(keys, word_base, word_counts)}
+
+
+def qul_syllables(syllables_by_ayah):
+    """
+    Syllables per QUL word, as {(surah, ayah): int array}, from the text
+    words that are one QUL word each (quran_text.qul_to_text_words). The two
+    halves of a joined word (يٰٓأَيُّهَا) get 0, and so does every word of an
+    ayah that cannot be lined up with QUL.
+    """
+    by_qul_word = {}
+    for (surah_number, ayah_number), syllables in syllables_by_ayah.items():
+        spans = get_word_spans(surah_number, ayah_number)
+        if spans is None:
+            by_qul_word[(surah_number, ayah_number)] = np.zeros(0, dtype=np.int16)
+            continue
+        ayah_syllables = np.zeros(spans[-1][1] if spans else 0, dtype=np.int16)
+        for (first, last), count in zip(spans, syllables):
+            if first == last:
+                ayah_syllables[first - 1] = count
+        by_qul_word[(surah_number, ayah_number)] = ayah_syllables
+    return by_qul_word
+
+
+def build_alignment_index(arrays, tokens, refined=False):
+    """
+    Align every word of the Quran across all reciters in the segment arrays.
+
+    Words are rows of (W, R) arrays (R = reciters), numbered as in QUL:
+    start_ms/end_ms (-1 where a reciter has no segment), measured (False
+    where there is no segment or only a placeholder of PLACEHOLDER_MAX_MS or
+    less) and normalized_duration, the measured duration divided by that
+    reciter's median ms per syllable, i.e. how many of its own typical
+    syllables the word lasted. ayah_first[surah, ayah] is the row of word 1
+    of each ayah and word_count[surah, ayah] its number of words, so a
+    word's row is ayah_first + word - 1.
+
+    When a reciter repeats part of an ayah its segments repeat word numbers;
+    each word keeps its first recitation.
+    """
+    index = np.asarray(arrays.index)
+    segments = np.asarray(arrays.segments_for(refined))
+    counts = index[:, INDEX_COUNT].astype(np.int64)
+    seg_reciter = np.repeat(index[:, INDEX_RECITER], counts)
+    seg_surah = np.repeat(index[:, INDEX_SURAH], counts)
+    seg_ayah = np.repeat(index[:, INDEX_AYAH], counts)
+    seg_word = segments[:, SEGMENT_WORD].astype(np.int64)
+
+    syllables_by_ayah = qul_syllables(count_syllables(tokens))
+
+    # Each ayah gets as many rows as its longest version (text or any reciter)
+    word_count = np.zeros(AYAH_TABLE_SHAPE, dtype=np.int32)
+    np.maximum.at(word_count, (seg_surah, seg_ayah), seg_word)
+    for (surah_number, ayah_number), syllables in syllables_by_ayah.items():
+        word_count[surah_number, ayah_number] = max(word_count[surah_number, ayah_number], len(syllables))
+    ayah_first = (np.cumsum(word_count.ravel()) - word_count.ravel()).reshape(AYAH_TABLE_SHAPE).astype(np.int32)
+    total_words = int(word_count.sum())
+
+    syllables = np.zeros(total_words, dtype=np.int16)
+    for (surah_number, ayah_number), ayah_syllables in syllables_by_ayah.items():
+        first = ayah_first[surah_number, ayah_number]
+        syllables[first:first + len(ayah_syllables)] = ayah_syllables
+
+    rows = ayah_first[seg_surah, seg_ayah] + seg_word - 1
+    cells = np.where(seg_word >= 1, rows * len(arrays.reciters) + seg_reciter, -1)
+    # np.unique keeps the first segment of every (word, reciter) cell
+    _, first = np.unique(cells, return_index=True)
+    first = first[cells[first] >= 0]
+    start_ms = np.full((total_words, len(arrays.reciters)), -1, dtype=np.int32)
+    end_ms = np.full((total_words, len(arrays.reciters)), -1, dtype=np.int32)
+    start_ms[rows[first], seg_reciter[first]] = segments[first, SEGMENT_START]
+    end_ms[rows[first], seg_reciter[first]] = segments[first, SEGMENT_END]
+
+    duration = (end_ms - start_ms).astype(np.float64)
+    measured = (start_ms >= 0) & (duration > PLACEHOLDER_MAX_MS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_syllable = np.where(measured & (syllables[:, None] > 0), duration / syllables[:, None], np.nan)
+    ms_per_syllable = np.zeros(len(arrays.reciters))
+    timed = ~np.isnan(per_syllable).all(axis=0)
+    ms_per_syllable[timed] = np.nanmedian(per_syllable[:, timed], axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.where(measured & (ms_per_syllable > 0), duration / ms_per_syllable, np.nan)
+
+    return {
+        "version": np.array(ALIGNMENT_INDEX_VERSION),
+        "reciters": np.array(arrays.reciters),
+        "ayah_first": ayah_first,
+        "word_count": word_count,
+        "syllables": syllables,
+        "start_ms": start_ms,
+        "end_ms": end_ms,
+        "measured": measured,
+        "normalized_duration": normalized.astype(np.float32),
+        "ms_per_syllable": ms_per_syllable.astype(np.float32)
+    }
+
+
+def save_alignment_index(alignment, index_path=ALIGNMENT_INDEX_PATH):
+    temp_path = index_path + '.part.npz'
+    np.savez(temp_path, **alignment)
+    os.replace(temp_path, index_path)
+
+
+class AlignmentIndex:
+    """
+    Loaded alignment index from build_alignment_index.
+
+    Every lookup is a table read: no search over reciters or segments.
+    """
+
+    def __init__(self, index_path=ALIGNMENT_INDEX_PATH):
+        with np.load(index_path) as data:
+            if int(data["version"]) != ALIGNMENT_INDEX_VERSION:
+                raise ValueError(f"{index_path} is an old alignment index, rebuild it with alignment_index.py")
+            self.reciters = [str(reciter_key) for reciter_key in data["reciters"]]
+            self.ayah_first = data["ayah_first"]
+            self.word_count = data["word_count"]
+            self.syllables = data["syllables"]
+            self.start_ms = data["start_ms"]
+            self.end_ms = data["end_ms"]
+            self.measured = data["measured"]
+            self.normalized_duration = data["normalized_duration"]
+            self.ms_per_syllable = dict(zip(self.reciters, data["ms_per_syllable"].tolist()))
+        self.reciter_ids = {reciter_key: i for i, reciter_key in enumerate(self.reciters)}
+
+    def row(self, surah_number, ayah_number, word_index):
+        """Row of one word (1-based QUL word number), or -1 if the ayah has no such word."""
+        if not (0 < surah_number < AYAH_TABLE_SHAPE[0] and 0 < ayah_number < AYAH_TABLE_SHAPE[1]):
+            return -1
+        if not 1 <= word_index <= self.word_count[surah_number, ayah_number]:
+            return -1
+        return int(self.ayah_first[surah_number, ayah_number]) + word_index - 1
+
+    def durations(self, surah_number, ayah_number, word_index, normalized=True):
+        """
+        {reciter: duration} for every reciter with a segment for the word
+        (normalized or in ms; normalized is NaN for placeholder segments).
+        """
+        row = self.row(surah_number, ayah_number, word_index)
+        if row < 0:
+            return {}
+        start, end = self.start_ms[row], self.end_ms[row]
+        values = self.normalized_duration[row] if normalized else end - start
+        return {reciter_key: float(values[i]) if normalized else int(values[i])
+                for i, reciter_key in enumerate(self.reciters) if start[i] >= 0}
+
+    def get_word(self, surah_number, ayah_number, word_index):
+        """{reciter: {start_ms, end_ms, duration_ms, measured, normalized_duration}} for one word."""
+        row = self.row(surah_number, ayah_number, word_index)
+        if row < 0:
+            return {}
+        return {reciter_key: {
+                    'start_ms': int(self.start_ms[row, i]),
+                    'end_ms': int(self.end_ms[row, i]),
+                    'duration_ms': int(self.end_ms[row, i] - self.start_ms[row, i]),
+                    'measured': bool(self.measured[row, i]),
+                    'normalized_duration': float(self.normalized_duration[row, i])
+                } for i, reciter_key in enumerate(self.reciters) if self.start_ms[row, i] >= 0}
+
+
+def load_alignment_index(index_path=ALIGNMENT_INDEX_PATH, arrays_dir=SEGMENT_ARRAYS_DIR, rebuild=False):
+    """The AlignmentIndex at index_path, built from the segment arrays first if missing."""
+    if rebuild or not os.path.exists(index_path):
+        save_alignment_index(build_alignment_index(SegmentArrays(arrays_dir), load_ayah_tokens()), index_path)
+    return AlignmentIndex(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align every word across reciters with tempo-normalized durations.")
+    parser.add_argument('--arrays-dir', default=SEGMENT_ARRAYS_DIR)
+    parser.add_argument('--output', default=ALIGNMENT_INDEX_PATH)
+    parser.add_argument('--refined', action='store_true', help="use the boundaries from segment_refine.py")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    alignment = build_alignment_index(SegmentArrays(args.arrays_dir), load_ayah_tokens(), args.refined)
+    save_alignment_index(alignment, args.output)
+    elapsed = time.perf_counter() - start
+
+    words, reciters = alignment["start_ms"].shape
+    print(f"Aligned {words} words across {reciters} reciters in {elapsed:.1f} s")
+    for reciter_key, ms in zip(alignment["reciters"], alignment["ms_per_syllable"]):
+        print(f"  {reciter_key}: {ms:.0f} ms per syllable")
+    print(f"Saved alignment index to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
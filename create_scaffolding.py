@@ -1,96 +1,163 @@
-import json
+import argparse
 import os
-
-def create_scaffolding(input_json_path, output_json_path, target_surahs):
+import sys
+import time
+from datetime import datetime
+
+from tajweed_rules import RECITER_KEY, RULE_SEPARATOR, annotate_surahs
+from quran_text import get_word_spans
+from quran_tokens import load_ayah_tokens
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from json_output import DEFAULT_JSON_FORMAT, JSON_FORMATS, dump_json
+from segment_arrays import (SEGMENT_ARRAYS_DIR, SEGMENT_WORD, SEGMENT_START, SEGMENT_END, PLACEHOLDER_MAX_MS,
+                            SegmentArrays)
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_PATH, 'tajweed_annotation')
+OUTPUT_FILE = 'tajweed_scaffolding.json'
+# Placeholder for characters whose rule has not been annotated yet
+UNFILLED_RULE = "to be filled"
+
+
+def load_segment_index(surah_numbers, reciter_key=RECITER_KEY, arrays_dir=SEGMENT_ARRAYS_DIR):
+    """{(surah, ayah): (count, 3) array of word, start_ms, end_ms} for one reciter, if the arrays are exported."""
+    if not os.path.exists(arrays_dir):
+        print(f"Warning: Segment arrays not found at {arrays_dir}, writing the scaffold without timings")
+        return {}
+    arrays = SegmentArrays(arrays_dir)
+    if reciter_key not in arrays.reciter_ids:
+        print(f"Warning: No segments for {reciter_key} in {arrays_dir}, writing the scaffold without timings")
+        return {}
+    return {(surah_number, ayah_number): segments
+            for surah_number in surah_numbers
+            for ayah_number, segments in arrays.get_surah(reciter_key, surah_number).items()}
+
+
+def scaffold_ayah(word_texts, segments, instances, rule_ids, spans=None):
+    """
+    One ayah of the scaffold as parallel arrays.
+
+    words/start_ms/end_ms have one entry per word (times are None where the
+    reciter has no segment). Segments are numbered by QUL word and placed
+    through spans (quran_text.get_word_spans); a word that is two QUL words
+    runs from the start of the first to the end of the second, and without
+    spans the ayah gets no times. A word the reciter repeats takes its first
+    recitation, and QUL placeholders (PLACEHOLDER_MAX_MS or shorter) are
+    left untimed. rule_word/rule_char/rule_id have one entry
+    per annotated character: 1-based word index, character index in the word
+    string and index into the scaffold's rule_names. A character with two
+    rules appears twice.
+    """
+    start_ms, end_ms = [None] * len(word_texts), [None] * len(word_texts)
+    if segments is not None and spans is not None:
+        times = {}
+        for word_number, start, end in segments[:, [SEGMENT_WORD, SEGMENT_START, SEGMENT_END]].tolist():
+            times.setdefault(word_number, (start, end))
+        times = {word_number: (start, end) for word_number, (start, end) in times.items()
+                 if end - start > PLACEHOLDER_MAX_MS}
+        for i, (first, last) in enumerate(spans[:len(word_texts)]):
+            if first in times and last in times:
+                start_ms[i], end_ms[i] = times[first][0], times[last][1]
+
+    rule_word, rule_char, rule_id = [], [], []
+    for inst in sorted(instances, key=lambda inst: (inst['word_position'], inst['letter_position'])):
+        rule_word.append(inst['word_position'])
+        rule_char.append(inst['letter_position'])
+        rule_id.append(rule_ids.setdefault(inst['type'], len(rule_ids)))
+
+    return {
+        "words": word_texts,
+        "start_ms": start_ms,
+        "end_ms": end_ms,
+        "rule_word": rule_word,
+        "rule_char": rule_char,
+        "rule_id": rule_id
+    }
+
+
+def character_rules(ayah_obj, word_index, rule_names):
+    """Expand the rules of one word (1-based) into [{"char", "tajweed_rule"}] for every character."""
+    by_char = {}
+    for word, char, rule in zip(ayah_obj["rule_word"], ayah_obj["rule_char"], ayah_obj["rule_id"]):
+        if word == word_index:
+            by_char.setdefault(char, []).append(rule_names[rule])
+    return [{"char": char, "tajweed_rule": RULE_SEPARATOR.join(by_char.get(i, [UNFILLED_RULE]))}
+            for i, char in enumerate(ayah_obj["words"][word_index - 1])]
+
+
+def create_scaffolding(output_path, surah_numbers=None, reciter_key=RECITER_KEY, prefill=True,
+                       json_format=DEFAULT_JSON_FORMAT, arrays_dir=SEGMENT_ARRAYS_DIR):
     """
     Creates a scaffolding JSON file for Tajweed rule annotation.
 
-    This function reads a JSON file containing word-level timestamps for Quranic
-    recitation, and for a specific set of surahs, it generates a new JSON 
-    structure. This new structure is designed to be manually filled in with
-    character-level Tajweed rules.
-
-    The output JSON is organized by surah and ayah number. Each ayah contains a
-    list of words, and each word is broken down into its constituent characters.
-    Each character object has a placeholder "to be filled" for the Tajweed rule.
-
-    Args:
-        input_json_path (str): The path to the source JSON file containing
-                               word timestamps and text.
-        output_json_path (str): The path where the generated scaffolding
-                                JSON file will be saved.
-        target_surahs (list of int): A list of surah numbers to process.
+    Every ayah with known text (the whole mushaf by default) is joined with
+    the reciter's word segments and written under surah -> ayah. Rules are
+    kept per character as the parallel rule_word/rule_char/rule_id arrays of
+    scaffold_ayah(), so only annotated characters take up space; with
+    prefill they start out as the rules found by tajweed_rules.py for the
+    annotators to correct. Ayahs whose words cannot be lined up with the
+    QUL word numbers have no times and are listed in the metadata as
+    untimed_ayahs. With json_format='jsonl' each ayah is written on
+    its own line and can be read lazily with json_output.JsonLinesFile.
+
+    Returns the path written and the number of ayahs in the scaffold.
     """
-    try:
-        with open(input_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Input file not found at {input_json_path}")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {input_json_path}")
-        return
-
-    scaffolding = {}
-
-    for segment in data:
-        surah_num = int(segment['surah'])
-        if surah_num not in target_surahs:
-            continue
-
-        ayah_num = int(segment['ayah'])
-        word_text = segment['text']
-        
-        # Word text from the source json is 'word_1', 'word_2', etc.
-        # We need the actual arabic text. The 'text' field in the segment IS the word.
-        # The source JSON is a list of dictionaries, where each dict is a word.
-        # So 'word_text' is just 'text'
-        
-        if surah_num not in scaffolding:
-            scaffolding[surah_num] = {}
-
-        if ayah_num not in scaffolding[surah_num]:
-            scaffolding[surah_num][ayah_num] = {"words": []}
-
-        word_obj = {
-            "word_text": word_text,
-            "characters": []
-        }
-
-        for char in word_text:
-            char_obj = {
-                "char": char,
-                "tajweed_rule": "to be filled"
-            }
-            word_obj["characters"].append(char_obj)
-        
-        scaffolding[surah_num][ayah_num]["words"].append(word_obj)
-
-    # Ensure the output directory exists
-    output_dir = os.path.dirname(output_json_path)
+    tokens = load_ayah_tokens(surah_numbers)
+    annotations = annotate_surahs(surah_numbers) if prefill else {}
+    segment_index = load_segment_index(sorted({surah_number for surah_number, _ in tokens}), reciter_key, arrays_dir)
+
+    rule_ids = {}
+    surahs = {}
+    untimed = []
+    total_words = total_rules = 0
+    for (surah_number, ayah_number), ayah_tokens in sorted(tokens.items()):
+        spans = get_word_spans(surah_number, ayah_number)
+        if spans is None:
+            untimed.append(f"{surah_number}:{ayah_number}")
+        ayah_obj = scaffold_ayah(ayah_tokens.word_texts, segment_index.get((surah_number, ayah_number)),
+                                 annotations.get((surah_number, ayah_number), []), rule_ids, spans)
+        surahs.setdefault(str(surah_number), {})[str(ayah_number)] = ayah_obj
+        total_words += len(ayah_obj["words"])
+        total_rules += len(ayah_obj["rule_id"])
+
+    output_dir = os.path.dirname(output_path)
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
-    with open(output_json_path, 'w', encoding='utf-8') as f:
-        json.dump(scaffolding, f, ensure_ascii=False, indent=4)
-
-    print(f"Scaffolding file created at: {output_json_path}")
-    # Also print the structure for a small part to verify
-    if 1 in scaffolding and 1 in scaffolding[1] and scaffolding[1][1]["words"]:
-         print("\\n--- Example from Surah 1, Ayah 1 ---")
-         print(json.dumps(scaffolding[1][1]["words"][0], ensure_ascii=False, indent=4))
-         print("------------------------------------")
+    output_path = dump_json({
+        "metadata": {
+            "created_date": datetime.now().isoformat(),
+            "reciter_key": reciter_key,
+            "prefilled": prefill,
+            "unfilled_rule": UNFILLED_RULE,
+            "rule_names": list(rule_ids),
+            "total_ayahs": len(tokens),
+            "total_words": total_words,
+            "total_rules": total_rules,
+            "untimed_ayahs": untimed
+        },
+        "surahs": surahs
+    }, output_path, json_format, indent=4, records_key="surahs", depth=2)
+    return output_path, len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the character-level tajweed annotation scaffold.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every surah with text)")
+    parser.add_argument('--reciter', default=RECITER_KEY, help="reciter whose word timings go in the scaffold")
+    parser.add_argument('--output', default=os.path.join(OUTPUT_DIR, OUTPUT_FILE))
+    parser.add_argument('--no-prefill', action='store_true', help="leave every character unfilled")
+    parser.add_argument('--json-format', choices=JSON_FORMATS, default=DEFAULT_JSON_FORMAT,
+                        help="indented (default), compact (no whitespace) or jsonl (one ayah per line)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    output_path, ayah_count = create_scaffolding(args.output, args.surahs, args.reciter, not args.no_prefill,
+                                                 args.json_format)
+    print(f"Scaffolding file created at: {output_path} ({ayah_count} ayahs, {time.perf_counter() - start:.1f} s)")
 
 
 if __name__ == '__main__':
-    # Using Mishary's timestamp file as the source for the text
-    INPUT_FILE = os.path.join('download_script', 'extracted_timestamps', 'mishary_timestamps.json')
-    
-    # Define the output directory and file path
-    OUTPUT_DIR = 'tajweed_annotation'
-    OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'tajweed_scaffolding.json')
-
-    # Surahs to be processed
-    TARGET_SURAHS = [1, 109, 110, 111, 112, 113, 114]
-
-    create_scaffolding(INPUT_FILE, OUTPUT_FILE, TARGET_SURAHS) 
\ No newline at end of file
+    main()
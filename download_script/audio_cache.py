@@ -0,0 +1,184 @@
+import argparse
+import glob
+import hashlib
+import os
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+from reciters import BASE_PATH, RECITERS, find_audio_file, get_audio_folder
+
+# Configuration
+AUDIO_CACHE_DIR = os.path.join(BASE_PATH, 'audio_cache')
+# Least recently used ayahs are evicted once the cache grows past this size
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Cached audio is mono 16-bit PCM at this rate
+SAMPLE_RATE = 16000
+PCM_DTYPE = '<i2'
+PCM_SCALE = 32767.0
+
+# Source hashes by (path, size, mtime_ns), so a file is only hashed once per process
+_source_hashes = {}
+# Cache size per cache_dir as last scanned plus what this process has added
+# since, so the directory is only scanned again once the limit is reached
+_cache_bytes = {}
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode an audio file to mono float32 at sample_rate."""
+    samples, source_rate = sf.read(path, dtype='float32', always_2d=True)
+    samples = samples.mean(axis=1)
+    if source_rate != sample_rate:
+        divisor = np.gcd(source_rate, sample_rate)
+        samples = resample_poly(samples, sample_rate // divisor, source_rate // divisor).astype(np.float32)
+    return samples
+
+
+def source_hash(path):
+    """First 16 hex digits of the file's SHA-256."""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _source_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _source_hashes[key] = digest.hexdigest()[:16]
+    return _source_hashes[key]
+
+
+def cache_path(reciter_key, surah_number, ayah_number, digest, cache_dir=AUDIO_CACHE_DIR):
+    return os.path.join(cache_dir, reciter_key, f"{surah_number:03d}", f"{ayah_number:03d}-{digest}.pcm")
+
+
+def _scan(cache_dir):
+    """(mtime_ns, size, path) of every cached entry; entries deleted meanwhile by another process are left out."""
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*', '*', '*.pcm')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    return entries
+
+
+def cache_size(cache_dir=AUDIO_CACHE_DIR):
+    """Total bytes of cached PCM."""
+    return sum(size for _, size, _ in _scan(cache_dir))
+
+
+def evict(cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES, keep=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes.
+    An entry's mtime is its last use (get_pcm touches it on every hit).
+    Safe to run from several processes at once. Returns the number of files removed.
+    """
+    entries = _scan(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    _cache_bytes[cache_dir] = total
+    return removed
+
+
+def load_pcm(path):
+    """Read-only memory map of a cached ayah (int16 samples, nothing is copied)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=PCM_DTYPE)
+    return np.memmap(path, dtype=PCM_DTYPE, mode='r')
+
+
+def get_pcm(reciter_key, surah_number, ayah_number, source_path=None, cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+    """
+    Mono int16 PCM of one downloaded ayah at SAMPLE_RATE, as a read-only memmap.
+
+    The first request decodes the MP3 and stores the samples under
+    <cache_dir>/<reciter>/<NNN>/<ayah>-<source hash>.pcm; later requests map
+    that file directly. A re-downloaded source gets a new hash, and the old
+    entry is replaced. An entry evicted by another process between the
+    check and the read is decoded again. Returns None if the ayah has not
+    been downloaded.
+    """
+    source_path = source_path or find_audio_file(reciter_key, surah_number, ayah_number)
+    if not source_path or not os.path.exists(source_path):
+        return None
+
+    path = cache_path(reciter_key, surah_number, ayah_number, source_hash(source_path), cache_dir)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+            return load_pcm(path)
+        except FileNotFoundError:
+            pass
+
+    samples = decode_audio(source_path)
+    pcm = np.round(np.clip(samples, -1.0, 1.0) * PCM_SCALE).astype(PCM_DTYPE)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for stale in glob.glob(cache_path(reciter_key, surah_number, ayah_number, '*', cache_dir)):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+    temp_path = f"{path}.{os.getpid()}.part"
+    pcm.tofile(temp_path)
+    os.replace(temp_path, path)
+
+    if cache_dir in _cache_bytes:
+        _cache_bytes[cache_dir] += pcm.nbytes
+    else:
+        _cache_bytes[cache_dir] = cache_size(cache_dir)
+    if _cache_bytes[cache_dir] > max_bytes:
+        evict(cache_dir, max_bytes, keep=path)
+    try:
+        return load_pcm(path)
+    except FileNotFoundError:
+        # Evicted by another process already; the decoded samples are still here
+        return pcm
+
+
+def pcm_to_float(pcm):
+    """int16 PCM to float32 in [-1, 1]."""
+    return np.asarray(pcm, dtype=np.float32) / PCM_SCALE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode downloaded ayahs into the memory-mappable PCM cache.")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every registered reciter)")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every downloaded surah)")
+    parser.add_argument('--cache-dir', default=AUDIO_CACHE_DIR)
+    parser.add_argument('--max-bytes', type=int, default=AUDIO_CACHE_MAX_BYTES)
+    args = parser.parse_args()
+
+    cached = failed = 0
+    for reciter_key in args.reciters or list(RECITERS):
+        for path in sorted(glob.glob(os.path.join(get_audio_folder(reciter_key), '[0-9][0-9][0-9]_*', 'Ayah_[0-9][0-9][0-9].mp3'))):
+            surah_number = int(os.path.basename(os.path.dirname(path))[:3])
+            ayah_number = int(os.path.basename(path)[5:8])
+            if args.surahs and surah_number not in args.surahs:
+                continue
+            try:
+                get_pcm(reciter_key, surah_number, ayah_number, path, args.cache_dir, args.max_bytes)
+                cached += 1
+            except (sf.LibsndfileError, RuntimeError) as e:
+                print(f"Warning: Could not decode {path}: {e}")
+                failed += 1
+
+    print(f"Cached {cached} ayahs ({failed} failed), {cache_size(args.cache_dir) / 1024 ** 2:.1f} MB in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import soundfile as sf
+
+from audio_cache import SAMPLE_RATE, get_pcm, pcm_to_float
+from reciters import BASE_PATH, RECITERS, find_audio_file, get_audio_folder
+from segment_arrays import (SEGMENT_ARRAYS_DIR, SegmentArrays, export_segment_arrays, SEGMENT_WORD, SEGMENT_START,
+                            SEGMENT_END, INDEX_FILE, SEGMENTS_FILE)
+
+# Configuration
+FEATURE_CACHE_DIR = os.path.join(BASE_PATH, 'audio_features')
+MAX_WORKERS = os.cpu_count() or 1
+
+# Ayahs come from the PCM cache (mono, SAMPLE_RATE), so features are comparable across reciters
+FRAME_LENGTH = 400      # 25 ms
+HOP_LENGTH = 160        # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 13
+
+# words array columns (frame ranges index into the surah's rms/flux/mfcc arrays)
+WORD_AYAH, WORD_INDEX, WORD_START_FRAME, WORD_END_FRAME, WORD_START_MS, WORD_END_MS = range(6)
+# ayahs array columns
+AYAH_NUMBER, AYAH_FRAME_OFFSET, AYAH_FRAME_COUNT = range(3)
+
+
+def _mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    fft_bins = np.arange(n_fft // 2 + 1)
+
+    left, center, right = bins[:-2, None], bins[1:-1, None], bins[2:, None]
+    rising = (fft_bins - left) / np.maximum(center - left, 1)
+    falling = (right - fft_bins) / np.maximum(right - center, 1)
+    return np.clip(np.minimum(rising, falling), 0.0, None).astype(np.float32)
+
+
+def _dct_matrix(n_mfcc=N_MFCC, n_mels=N_MELS):
+    """Orthonormal DCT-II basis, shape (n_mfcc, n_mels)."""
+    k = np.arange(n_mfcc)[:, None]
+    n = np.arange(n_mels)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+MEL_FILTERS = _mel_filterbank()
+DCT_BASIS = _dct_matrix()
+WINDOW = np.hanning(FRAME_LENGTH).astype(np.float32)
+
+
+def frame_features(samples):
+    """
+    Frame-level features of one decoded ayah, all frames computed at once.
+    Returns rms (F,), flux (F,) and mfcc (F, N_MFCC) as float32.
+    """
+    if len(samples) < FRAME_LENGTH:
+        samples = np.pad(samples, (0, FRAME_LENGTH - len(samples)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_LENGTH)[::HOP_LENGTH]
+
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+
+    spectrum = np.abs(np.fft.rfft(frames * WINDOW, n=N_FFT, axis=1)).astype(np.float32)
+    flux = np.zeros(len(spectrum), dtype=np.float32)
+    flux[1:] = np.sqrt(np.sum(np.maximum(np.diff(spectrum, axis=0), 0.0) ** 2, axis=1))
+
+    mel_energy = (spectrum ** 2) @ MEL_FILTERS.T
+    mfcc = np.log(mel_energy + 1e-10) @ DCT_BASIS.T
+
+    return rms.astype(np.float32), flux, mfcc.astype(np.float32)
+
+
+def ms_to_frame(ms):
+    """Frame index containing time ms (works on arrays)."""
+    return np.asarray(ms, dtype=np.int64) * SAMPLE_RATE // (1000 * HOP_LENGTH)
+
+
+def frame_to_ms(frame):
+    """Start time in ms of a frame index (works on arrays)."""
+    return np.asarray(frame, dtype=np.float64) * HOP_LENGTH * 1000 / SAMPLE_RATE
+
+
+def feature_cache_path(reciter_key, surah_number, cache_dir=FEATURE_CACHE_DIR):
+    return os.path.join(cache_dir, reciter_key, f"{surah_number:03d}.npz")
+
+
+def _sources_signature(audio_paths, arrays_dir=SEGMENT_ARRAYS_DIR):
+    """
+    Size and mtime of every source file and of the segment arrays the words
+    are sliced by, to notice re-downloads and re-exported segments.
+    """
+    signature = []
+    for ayah_number, path in sorted(audio_paths.items()):
+        stat = os.stat(path)
+        signature.append([ayah_number, os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    for name in (INDEX_FILE, SEGMENTS_FILE):
+        stat = os.stat(os.path.join(arrays_dir, name))
+        signature.append([0, name, stat.st_size, stat.st_mtime_ns])
+    return json.dumps(signature)
+
+
+def _cached_signature(cache_path):
+    try:
+        with np.load(cache_path) as cached:
+            return str(cached['sources'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def extract_surah_features(reciter_key, surah_number, arrays_dir=SEGMENT_ARRAYS_DIR, cache_dir=FEATURE_CACHE_DIR, force=False):
+    """
+    Decode each ayah of one reciter's surah once, compute frame features and
+    slice them by the word segments. Written to <cache_dir>/<reciter>/<NNN>.npz.
+    Returns (reciter_key, surah_number, status) with status 'cached', 'extracted' or 'missing'.
+    """
+    arrays = SegmentArrays(arrays_dir)
+    ayah_segments = arrays.get_surah(reciter_key, surah_number)
+    audio_paths = {}
+    for ayah_number in ayah_segments:
+        path = find_audio_file(reciter_key, surah_number, ayah_number)
+        if path:
+            audio_paths[ayah_number] = path
+    if not audio_paths:
+        return reciter_key, surah_number, 'missing'
+
+    cache_path = feature_cache_path(reciter_key, surah_number, cache_dir)
+    signature = _sources_signature(audio_paths, arrays_dir)
+    if not force and _cached_signature(cache_path) == signature:
+        return reciter_key, surah_number, 'cached'
+
+    rms_parts, flux_parts, mfcc_parts, ayahs, words = [], [], [], [], []
+    frame_offset = 0
+    for ayah_number, path in sorted(audio_paths.items()):
+        try:
+            samples = pcm_to_float(get_pcm(reciter_key, surah_number, ayah_number, path))
+        except (sf.LibsndfileError, RuntimeError) as e:
+            print(f"Warning: Could not decode {path}, skipping ayah {ayah_number}: {e}")
+            continue
+        rms, flux, mfcc = frame_features(samples)
+        frame_count = len(rms)
+
+        segments = np.asarray(ayah_segments[ayah_number])
+        start_frames = np.minimum(ms_to_frame(segments[:, SEGMENT_START]), frame_count)
+        end_frames = np.clip(ms_to_frame(segments[:, SEGMENT_END]), start_frames, frame_count)
+        words.append(np.column_stack([
+            np.full(len(segments), ayah_number),
+            segments[:, SEGMENT_WORD],
+            start_frames + frame_offset,
+            end_frames + frame_offset,
+            segments[:, SEGMENT_START],
+            segments[:, SEGMENT_END]
+        ]))
+
+        ayahs.append([ayah_number, frame_offset, frame_count])
+        rms_parts.append(rms)
+        flux_parts.append(flux)
+        mfcc_parts.append(mfcc)
+        frame_offset += frame_count
+
+    if not ayahs:
+        return reciter_key, surah_number, 'missing'
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.savez(cache_path,
+             rms=np.concatenate(rms_parts),
+             flux=np.concatenate(flux_parts),
+             mfcc=np.concatenate(mfcc_parts),
+             ayahs=np.array(ayahs, dtype=np.int32),
+             words=np.concatenate(words).astype(np.int32),
+             sources=np.array(signature))
+    return reciter_key, surah_number, 'extracted'
+
+
+class SurahFeatures:
+    """Cached frame features of one reciter's surah, addressed by ayah and word."""
+
+    def __init__(self, reciter_key, surah_number, cache_dir=FEATURE_CACHE_DIR):
+        self.reciter_key = reciter_key
+        self.surah_number = surah_number
+        with np.load(feature_cache_path(reciter_key, surah_number, cache_dir)) as cached:
+            self.rms = cached['rms']
+            self.flux = cached['flux']
+            self.mfcc = cached['mfcc']
+            self.ayahs = cached['ayahs']
+            self.words = cached['words']
+        # A word the reciter repeats keeps its first recitation, as in alignment_index.py
+        self._word_rows = {}
+        for row, (ayah, word) in enumerate(self.words[:, [WORD_AYAH, WORD_INDEX]].tolist()):
+            self._word_rows.setdefault((ayah, word), row)
+        self._ayah_rows = {int(ayah): row for row, ayah in enumerate(self.ayahs[:, AYAH_NUMBER])}
+
+    def ayah_frames(self, ayah_number):
+        """(start_frame, end_frame) of a whole ayah, or None."""
+        row = self._ayah_rows.get(ayah_number)
+        if row is None:
+            return None
+        offset, count = self.ayahs[row, AYAH_FRAME_OFFSET], self.ayahs[row, AYAH_FRAME_COUNT]
+        return int(offset), int(offset + count)
+
+    def word_frames(self, ayah_number, word_index):
+        """(start_frame, end_frame) of one word, or None."""
+        row = self._word_rows.get((ayah_number, word_index))
+        if row is None:
+            return None
+        return int(self.words[row, WORD_START_FRAME]), int(self.words[row, WORD_END_FRAME])
+
+    def word_ms(self, ayah_number, word_index):
+        """(start_ms, end_ms) of one word's segment, or None."""
+        row = self._word_rows.get((ayah_number, word_index))
+        if row is None:
+            return None
+        return int(self.words[row, WORD_START_MS]), int(self.words[row, WORD_END_MS])
+
+    def word(self, ayah_number, word_index):
+        """{'rms', 'flux', 'mfcc'} views for one word, or None."""
+        frames = self.word_frames(ayah_number, word_index)
+        if frames is None:
+            return None
+        start, end = frames
+        return {'rms': self.rms[start:end], 'flux': self.flux[start:end], 'mfcc': self.mfcc[start:end]}
+
+
+def downloaded_surahs(reciter_key):
+    """Surah numbers that have an audio folder for this reciter."""
+    folders = glob.glob(os.path.join(get_audio_folder(reciter_key), '[0-9][0-9][0-9]_*'))
+    return sorted(int(os.path.basename(folder)[:3]) for folder in folders if os.path.isdir(folder))
+
+
+def extract_features(reciters=None, surah_numbers=None, arrays_dir=SEGMENT_ARRAYS_DIR,
+                     cache_dir=FEATURE_CACHE_DIR, workers=MAX_WORKERS, force=False):
+    """Extract features for every downloaded (reciter, surah) pair, in a process pool."""
+    if not os.path.exists(os.path.join(arrays_dir, 'index.npy')):
+        print(f"Segment arrays not found at {arrays_dir}, exporting them first...")
+        export_segment_arrays(arrays_dir)
+
+    arrays = SegmentArrays(arrays_dir)
+    reciters = reciters or [key for key in RECITERS if key in arrays.reciter_ids]
+    jobs = [(reciter_key, surah_number) for reciter_key in reciters for surah_number in downloaded_surahs(reciter_key)
+            if surah_numbers is None or surah_number in surah_numbers]
+
+    counts = {'extracted': 0, 'cached': 0, 'missing': 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_surah_features, reciter_key, surah_number, arrays_dir, cache_dir, force)
+                   for reciter_key, surah_number in jobs]
+        for future in as_completed(futures):
+            reciter_key, surah_number, status = future.result()
+            counts[status] += 1
+            if status == 'extracted':
+                print(f"  {reciter_key} surah {surah_number}: extracted")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode ayah audio and cache per-word frame features.")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every registered reciter)")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every downloaded surah)")
+    parser.add_argument('--cache-dir', default=FEATURE_CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--force', action='store_true', help="re-extract even if the cache is up to date")
+    args = parser.parse_args()
+
+    print("Extracting audio features (RMS, spectral flux, MFCC) per word...")
+    counts = extract_features(args.reciters, args.surahs, cache_dir=args.cache_dir, workers=args.workers, force=args.force)
+    print(f"Extracted: {counts['extracted']}, up to date: {counts['cached']}, no audio: {counts['missing']}")
+    print(f"Saved features to: {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
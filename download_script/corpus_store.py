@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import sys
+from array import array
+from datetime import datetime
+
+from qul_source import iter_ayahs
+from reciters import BASE_PATH, get_all_sources, get_source_format
+
+# Configuration
+CORPUS_DB_PATH = os.path.join(BASE_PATH, 'quran_corpus.db')
+
+# Same column layout as the QUL SQLite exports ('verses' table), keyed by
+# reciter so every recitation lives in one indexed file.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reciters (
+    reciter TEXT PRIMARY KEY,
+    reciter_name TEXT,
+    source_path TEXT,
+    source_format TEXT,
+    ingested_at TEXT
+);
+CREATE TABLE IF NOT EXISTS verses (
+    reciter TEXT NOT NULL,
+    surah_number INTEGER NOT NULL,
+    ayah_number INTEGER NOT NULL,
+    audio_url TEXT,
+    duration INTEGER,
+    word_count INTEGER,
+    segments BLOB,
+    PRIMARY KEY (reciter, surah_number, ayah_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_verses_surah ON verses (surah_number, ayah_number);
+"""
+
+
+def pack_segments(segments):
+    """
+    Pack [[word, start_ms, end_ms], ...] (as normalized by qul_source)
+    into little-endian int32 bytes.
+    """
+    flat = array('i')
+    for segment in segments:
+        flat.extend(segment)
+    if sys.byteorder == 'big':
+        flat.byteswap()
+    return flat.tobytes()
+
+
+def unpack_segments(blob):
+    """Inverse of pack_segments: bytes -> [[word, start_ms, end_ms], ...]."""
+    flat = array('i')
+    flat.frombytes(blob or b'')
+    if sys.byteorder == 'big':
+        flat.byteswap()
+    return [flat[i:i + 3].tolist() for i in range(0, len(flat), 3)]
+
+
+def open_corpus_store(db_path=CORPUS_DB_PATH):
+    """Open (creating if needed) the corpus store."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def ingest_source(conn, reciter_key, reciter_name, source_path):
+    """Load one QUL recitation file into the store, replacing any previous copy."""
+    rows = []
+    for ayah_info in iter_ayahs(source_path):
+        surah_number = ayah_info.get("surah_number")
+        ayah_number = ayah_info.get("ayah_number")
+        if surah_number is None or ayah_number is None:
+            continue
+        segments = ayah_info.get("segments") or []
+        rows.append((reciter_key, surah_number, ayah_number, ayah_info.get("audio_url"),
+                     ayah_info.get("duration"), len(segments), pack_segments(segments)))
+
+    with conn:
+        conn.execute("DELETE FROM verses WHERE reciter = ?", (reciter_key,))
+        conn.executemany("INSERT INTO verses VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO reciters VALUES (?, ?, ?, ?, ?)",
+                     (reciter_key, reciter_name, source_path, get_source_format(source_path),
+                      datetime.now().isoformat()))
+    return len(rows)
+
+
+def build_corpus_store(db_path=CORPUS_DB_PATH, sources=None):
+    """One-time ingest of every known reciter source into the store."""
+    if sources is None:
+        sources = get_all_sources()
+
+    conn = open_corpus_store(db_path)
+    try:
+        for reciter_key, info in sources.items():
+            if not os.path.exists(info['source']):
+                print(f"Warning: Source file not found for {reciter_key} at {info['source']}")
+                continue
+            count = ingest_source(conn, reciter_key, info['reciter_name'], info['source'])
+            print(f"Ingested {count} ayahs for {reciter_key}")
+    finally:
+        conn.close()
+
+
+def list_reciters(conn):
+    """Return {reciter_key: reciter_name} for everything in the store."""
+    return dict(conn.execute("SELECT reciter, reciter_name FROM reciters ORDER BY reciter"))
+
+
+def get_surahs(conn, surah_numbers, reciters=None):
+    """
+    Indexed lookup of whole surahs.
+
+    Returns {reciter_key: {surah_number: {ayah_number: {"segments", "audio_url", "reciter"}}}},
+    the same per-reciter layout produced by extract_timestamps.py.
+    """
+    surah_numbers = list(surah_numbers)
+    query = ("SELECT v.reciter, r.reciter_name, v.surah_number, v.ayah_number, v.audio_url, v.segments "
+             "FROM verses v JOIN reciters r ON r.reciter = v.reciter "
+             f"WHERE v.surah_number IN ({','.join('?' * len(surah_numbers))})")
+    params = surah_numbers
+    if reciters is not None:
+        reciters = list(reciters)
+        query += f" AND v.reciter IN ({','.join('?' * len(reciters))})"
+        params = params + reciters
+    query += " ORDER BY v.reciter, v.surah_number, v.ayah_number"
+
+    result = {}
+    for reciter_key, reciter_name, surah_number, ayah_number, audio_url, segments in conn.execute(query, params):
+        result.setdefault(reciter_key, {}).setdefault(surah_number, {})[ayah_number] = {
+            "segments": unpack_segments(segments),
+            "audio_url": audio_url,
+            "reciter": reciter_name
+        }
+    return result
+
+
+def get_surah(conn, surah_number, reciters=None):
+    """Return {reciter_key: {ayah_number: ayah_data}} for one surah."""
+    return {reciter_key: surahs.get(surah_number, {})
+            for reciter_key, surahs in get_surahs(conn, [surah_number], reciters).items()}
+
+
+def get_ayah(conn, reciter_key, surah_number, ayah_number):
+    """Point lookup of one ayah for one reciter, or None."""
+    row = conn.execute(
+        "SELECT audio_url, segments FROM verses WHERE reciter = ? AND surah_number = ? AND ayah_number = ?",
+        (reciter_key, surah_number, ayah_number)).fetchone()
+    if row is None:
+        return None
+    return {"segments": unpack_segments(row[1]), "audio_url": row[0]}
+
+
+if __name__ == "__main__":
+    print(f"Building corpus store at {CORPUS_DB_PATH}...")
+    build_corpus_store()
+    print("Corpus store ready.")
@@ -0,0 +1,221 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuration
+DEFAULT_WORKERS = 8
+# Concurrent connections allowed to any single host (None = only the worker count applies)
+DEFAULT_HOST_LIMIT = None
+CHUNK_SIZE = 256 * 1024
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+# Client errors that are worth retrying (timeouts and rate limiting)
+RETRYABLE_STATUS_CODES = {408, 429}
+
+
+def create_session(pool_size=DEFAULT_WORKERS):
+    """Create a requests session whose connection pool matches the worker count."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_file(path, expected_size=None, sha256=None):
+    """Check a file against an expected size and/or checksum (None skips that check)."""
+    if not os.path.exists(path):
+        return False
+    if expected_size is not None and os.path.getsize(path) != expected_size:
+        return False
+    if sha256 is not None and file_sha256(path) != sha256.lower():
+        return False
+    return True
+
+
+def get_remote_size(session, url, timeout=REQUEST_TIMEOUT):
+    """Return the Content-Length reported by a HEAD request, or None."""
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+        length = response.headers.get('Content-Length')
+        return int(length) if length is not None else None
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def _range_total(response):
+    """The full file size from a Content-Range header ('bytes 0-9/10' or 'bytes */10'), or None."""
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    return None
+
+
+def _total_size(response, offset):
+    """Work out the full file size from a (possibly partial) response."""
+    total = _range_total(response)
+    if total is not None:
+        return total
+    length = response.headers.get('Content-Length')
+    if length is not None and length.isdigit():
+        return int(length) + offset
+    return None
+
+
+def download_file(session, url, dest_path, expected_size=None, sha256=None, verify_existing=False,
+                  retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, timeout=REQUEST_TIMEOUT):
+    """
+    Download url to dest_path, resuming from dest_path + '.part' with an HTTP Range request.
+
+    The file only gets its final name once it is complete and matches
+    expected_size/sha256 (when given), so an interrupted run never leaves a
+    truncated file behind. With verify_existing=True an existing file is also
+    compared against the server's Content-Length before being skipped.
+
+    Returns 'skipped', 'downloaded' or 'failed'.
+    """
+    if os.path.exists(dest_path):
+        if expected_size is None and verify_existing:
+            expected_size = get_remote_size(session, url, timeout)
+        if verify_file(dest_path, expected_size, sha256):
+            return 'skipped'
+        print(f"Existing file failed verification, re-downloading: {dest_path}")
+        os.remove(dest_path)
+
+    part_path = dest_path + '.part'
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if offset and response.status_code == 416:
+                    # Nothing left to fetch, but only trust the .part file if it
+                    # is exactly the size the server (or the caller) reports
+                    total = expected_size if expected_size is not None else _range_total(response)
+                    if total != offset:
+                        os.remove(part_path)
+                        raise IOError(f"range not satisfiable for a {offset} byte partial file, restarting")
+                else:
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:
+                        # Server ignored the Range header, start over
+                        offset = 0
+                    total = _total_size(response, offset)
+
+                    with open(part_path, 'ab' if offset else 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+
+            size = os.path.getsize(part_path)
+            if total is not None and size < total:
+                raise IOError(f"incomplete download ({size} of {total} bytes)")
+
+            if not verify_file(part_path, expected_size if expected_size is not None else total, sha256):
+                os.remove(part_path)
+                raise IOError("size/checksum verification failed")
+
+            os.replace(part_path, dest_path)
+            return 'downloaded'
+
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and 400 <= status < 500 and status not in RETRYABLE_STATUS_CODES:
+                print(f"Error downloading {url}: {e}")
+                return 'failed'
+            error = e
+        except (requests.exceptions.RequestException, IOError) as e:
+            error = e
+
+        if attempt == retries:
+            print(f"Error downloading {url} after {retries + 1} attempts: {error}")
+            return 'failed'
+
+        delay = backoff * (2 ** attempt)
+        print(f"Retrying {url} in {delay:.1f}s ({error})")
+        time.sleep(delay)
+
+    return 'failed'
+
+
+class HostLimiter:
+    """Hands out one bounded semaphore per host so a shared pool cannot flood a single server."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[host]
+
+
+def download_all(jobs, workers=DEFAULT_WORKERS, session=None, host_limit=DEFAULT_HOST_LIMIT, **download_options):
+    """
+    Download a list of jobs on a bounded thread pool sharing one pooled session.
+
+    Each job is a dict with 'url' and 'dest' plus optional 'expected_size',
+    'sha256' and 'label' (used for progress messages). All jobs go through
+    one global queue; host_limit caps concurrent requests per host. Extra
+    keyword arguments are passed on to download_file.
+
+    Returns a dict of counts per status ('downloaded', 'skipped', 'failed').
+    """
+    if session is None:
+        session = create_session(workers)
+    limiter = HostLimiter(host_limit) if host_limit else None
+
+    counts = {'downloaded': 0, 'skipped': 0, 'failed': 0}
+
+    def run(job):
+        dest_dir = os.path.dirname(job['dest'])
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        with limiter.for_url(job['url']) if limiter else nullcontext():
+            return download_file(session, job['url'], job['dest'],
+                                 expected_size=job.get('expected_size'),
+                                 sha256=job.get('sha256'),
+                                 **download_options)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            label = job.get('label', job['dest'])
+            try:
+                status = future.result()
+            except Exception as e:
+                print(f"An unexpected error occurred for {label}: {e}")
+                status = 'failed'
+            counts[status] += 1
+            if status == 'downloaded':
+                print(f"Downloaded: {label}")
+            elif status == 'failed':
+                print(f"Could not download {label}.")
+
+    return counts
@@ -1,16 +1,35 @@
+import argparse
+import hashlib
 import json
 import os
 import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from itertools import islice
+
+from json_output import DEFAULT_JSON_FORMAT, JSON_FORMATS, dump_json, load_json, output_path
+from qul_source import iter_ayahs
+from reciters import RECITERS
 
 # Configuration
-HUSARY_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script\ayah-recitation-mahmoud-khalil-al-husary-murattal-hafs-957.json'
-MINSHAWI_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\Husary\Husarry Murattal\ayah-recitation-muhammad-siddiq-al-minshawi-murattal-hafs-959.json\ayah-recitation-muhammad-siddiq-al-minshawi-murattal-hafs-959.json'
-ABDUL_BASIT_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-abdul-basit-abdul-samad-murattal-hafs-950.json\ayah-recitation-abdul-basit-abdul-samad-murattal-hafs-950.json'
-MISHARY_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-mishari-rashid-al-afasy-murattal-hafs-953.json\ayah-recitation-mishari-rashid-al-afasy-murattal-hafs-953.json'
-MAHER_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-maher-al-mu-aiqly-murattal-hafs-948.json\ayah-recitation-maher-al-mu-aiqly-murattal-hafs-948.json'
-YASSER_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-yasser-al-dosari-murattal-hafs-961.json\ayah-recitation-yasser-al-dosari-murattal-hafs-961.json'
-SHURAIM_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-saud-al-shuraim-murattal-hafs-960.json\ayah-recitation-saud-al-shuraim-murattal-hafs-960.json'
+OUTPUT_DIR = "extracted_timestamps"
+
+# Reciters to extract (keys into reciters.RECITERS), in the order they
+# appear in combined_timestamps.json
+EXTRACTION_RECITERS = ['husary', 'minshawi', 'abdul_basit', 'mishary', 'maher', 'yasser', 'shuraim']
+
+# Source files are parsed in a process pool, one reciter per worker
+MAX_WORKERS = min(len(EXTRACTION_RECITERS), os.cpu_count() or 1)
+
+# Records the source hash and surah selection behind each reciter's outputs,
+# so unchanged reciters are not re-extracted on the next run
+BUILD_MANIFEST_FILE = "extraction_manifest.json"
+
+# Columns of the word-level CSV (and Parquet) exports
+TIMESTAMP_COLUMNS = ['surah_number', 'surah_name', 'ayah_number', 'reciter', 'word_number',
+                     'start_time_ms', 'end_time_ms', 'duration_ms', 'audio_url']
+# CSV rows are written in chunks of this many
+CSV_CHUNK_ROWS = 10000
 
 # Surahs to extract timestamps for
 SURAH_NUMBERS_TO_EXTRACT = [
@@ -31,81 +50,77 @@ SURAH_NUMBER_TO_NAME = {
     82: "Al-Infitar"
 }
 
-def load_json_data(file_path):
-    """Load JSON data from file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading JSON from {file_path}: {e}")
-        return None
-
-def extract_timestamps_from_json(json_data, reciter_name):
-    """Extract timestamp data for specified surahs."""
+def extract_timestamps_from_source(source_path, reciter_name):
+    """
+    Extract timestamp data for specified surahs by streaming the source file
+    (.json or .db, see qul_source.iter_ayahs) without materializing the
+    whole Quran.
+    """
     timestamps_data = {}
     
-    for key, ayah_info in json_data.items():
-        if isinstance(ayah_info, dict):
+    try:
+        for ayah_info in iter_ayahs(source_path, SURAH_NUMBERS_TO_EXTRACT):
             surah_number = ayah_info.get("surah_number")
-            if surah_number in SURAH_NUMBERS_TO_EXTRACT:
-                ayah_number = ayah_info.get("ayah_number")
-                segments = ayah_info.get("segments", [])
-                audio_url = ayah_info.get("audio_url")
-                
-                if surah_number not in timestamps_data:
-                    timestamps_data[surah_number] = {}
-                
-                timestamps_data[surah_number][ayah_number] = {
-                    "segments": segments,
-                    "audio_url": audio_url,
-                    "reciter": reciter_name
-                }
+            ayah_number = ayah_info.get("ayah_number")
+            
+            if surah_number not in timestamps_data:
+                timestamps_data[surah_number] = {}
+            
+            timestamps_data[surah_number][ayah_number] = {
+                "segments": ayah_info.get("segments", []),
+                "audio_url": ayah_info.get("audio_url"),
+                "reciter": reciter_name
+            }
+    except Exception as e:
+        print(f"Error loading source {source_path}: {e}")
+        return None
     
     return timestamps_data
 
-def save_timestamps_as_json(timestamps_data, output_file):
-    """Save timestamps data as JSON."""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(timestamps_data, f, indent=2, ensure_ascii=False)
+def save_timestamps_as_json(timestamps_data, output_file, json_format=DEFAULT_JSON_FORMAT, depth=2):
+    """
+    Save timestamps data as JSON. With json_format='jsonl' every line holds
+    one entry depth levels down (2: one ayah of {surah: {ayah: ...}}).
+    """
+    output_file = dump_json(timestamps_data, output_file, json_format, depth=depth)
     print(f"Saved timestamps to: {output_file}")
+    return output_file
 
-def save_timestamps_as_csv(timestamps_data, output_file):
-    """Save timestamps data as CSV for easy analysis."""
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['surah_number', 'surah_name', 'ayah_number', 'reciter', 'word_number', 'start_time_ms', 'end_time_ms', 'duration_ms', 'audio_url']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        writer.writeheader()
+def iter_timestamp_rows(timestamps_data):
+    """Yield one TIMESTAMP_COLUMNS tuple per word segment, in surah/ayah order."""
+    for surah_num in sorted(timestamps_data.keys()):
+        surah_name = SURAH_NUMBER_TO_NAME.get(surah_num, f"Surah_{surah_num}")
         
-        for surah_num in sorted(timestamps_data.keys()):
-            surah_name = SURAH_NUMBER_TO_NAME.get(surah_num, f"Surah_{surah_num}")
+        for ayah_num in sorted(timestamps_data[surah_num].keys()):
+            ayah_data = timestamps_data[surah_num][ayah_num]
+            reciter = ayah_data["reciter"]
+            audio_url = ayah_data["audio_url"]
             
-            for ayah_num in sorted(timestamps_data[surah_num].keys()):
-                ayah_data = timestamps_data[surah_num][ayah_num]
-                segments = ayah_data["segments"]
-                reciter = ayah_data["reciter"]
-                audio_url = ayah_data["audio_url"]
-                
-                for segment in segments:
-                    if len(segment) >= 3:
-                        word_num, start_time, end_time = segment[0], segment[1], segment[2]
-                        duration = end_time - start_time
-                        
-                        writer.writerow({
-                            'surah_number': surah_num,
-                            'surah_name': surah_name,
-                            'ayah_number': ayah_num,
-                            'reciter': reciter,
-                            'word_number': word_num,
-                            'start_time_ms': start_time,
-                            'end_time_ms': end_time,
-                            'duration_ms': duration,
-                            'audio_url': audio_url
-                        })
-    
+            for segment in ayah_data["segments"]:
+                if len(segment) >= 3:
+                    word_num, start_time, end_time = segment[0], segment[1], segment[2]
+                    yield (surah_num, surah_name, ayah_num, reciter, word_num,
+                           start_time, end_time, end_time - start_time, audio_url)
+
+def write_csv_rows(rows, output_file, chunk_size=CSV_CHUNK_ROWS):
+    """Write TIMESTAMP_COLUMNS rows from any iterable, chunk_size rows at a time."""
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(TIMESTAMP_COLUMNS)
+        
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+
+def save_timestamps_as_csv(timestamps_data, output_file):
+    """Save timestamps data as CSV for easy analysis."""
+    write_csv_rows(iter_timestamp_rows(timestamps_data), output_file)
     print(f"Saved timestamps CSV to: {output_file}")
 
-def save_timestamps_by_surah(timestamps_data, output_dir):
+def save_timestamps_by_surah(timestamps_data, output_dir, json_format=DEFAULT_JSON_FORMAT):
     """Save timestamps data organized by surah."""
     os.makedirs(output_dir, exist_ok=True)
     
@@ -119,8 +134,7 @@ def save_timestamps_by_surah(timestamps_data, output_dir):
             "ayahs": timestamps_data[surah_num]
         }
         
-        with open(surah_file, 'w', encoding='utf-8') as f:
-            json.dump(surah_data, f, indent=2, ensure_ascii=False)
+        surah_file = dump_json(surah_data, surah_file, json_format, records_key="ayahs")
         
         print(f"Saved {surah_name} timestamps to: {surah_file}")
 
@@ -152,123 +166,144 @@ def create_word_level_summary(timestamps_data, output_file):
     
     print(f"Saved summary to: {output_file}")
 
-def main():
-    """Main function to extract timestamps from both reciters."""
-    print("Extracting word-level timestamps from Quran JSON files...")
+def extract_reciter(reciter_key):
+    """Worker: stream one reciter's source file and return only the requested surahs."""
+    reciter_info = RECITERS[reciter_key]
+    return reciter_key, extract_timestamps_from_source(reciter_info['source'], reciter_info['reciter_name'])
+
+def save_reciter_outputs(reciter_key, timestamps_data, output_dir, json_format=DEFAULT_JSON_FORMAT):
+    """Write the JSON, CSV, by-surah and summary outputs for one reciter."""
+    save_timestamps_as_json(timestamps_data, os.path.join(output_dir, f"{reciter_key}_timestamps.json"), json_format)
+    save_timestamps_as_csv(timestamps_data, os.path.join(output_dir, f"{reciter_key}_timestamps.csv"))
+    save_timestamps_by_surah(timestamps_data, os.path.join(output_dir, f"{reciter_key}_by_surah"), json_format)
+    create_word_level_summary(timestamps_data, os.path.join(output_dir, f"{reciter_key}_summary.json"))
+
+def source_sha256(file_path):
+    """Return the hex SHA-256 of a source file, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def load_build_manifest(output_dir):
+    """Load the extraction build manifest, or an empty one."""
+    manifest_path = os.path.join(output_dir, BUILD_MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"reciters": {}}
+
+def save_build_manifest(manifest, output_dir):
+    """Save the extraction build manifest."""
+    with open(os.path.join(output_dir, BUILD_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+def reciter_outputs_exist(reciter_key, output_dir, json_format=DEFAULT_JSON_FORMAT):
+    """Check that every file save_reciter_outputs writes for this reciter is present."""
+    paths = [
+        output_path(os.path.join(output_dir, f"{reciter_key}_timestamps.json"), json_format),
+        os.path.join(output_dir, f"{reciter_key}_timestamps.csv"),
+        os.path.join(output_dir, f"{reciter_key}_summary.json")
+    ]
+    for surah_num in SURAH_NUMBERS_TO_EXTRACT:
+        surah_name = SURAH_NUMBER_TO_NAME.get(surah_num, f"Surah_{surah_num}")
+        paths.append(output_path(os.path.join(output_dir, f"{reciter_key}_by_surah", f"{surah_num:03d}_{surah_name}_timestamps.json"), json_format))
+    return all(os.path.exists(path) for path in paths)
+
+def is_reciter_up_to_date(reciter_key, source_hash, manifest, output_dir, json_format=DEFAULT_JSON_FORMAT):
+    """A reciter can be skipped when its source, surah selection and JSON format match the last build."""
+    entry = manifest["reciters"].get(reciter_key)
+    return (entry is not None
+            and source_hash is not None
+            and entry.get("source_sha256") == source_hash
+            and entry.get("surahs") == sorted(SURAH_NUMBERS_TO_EXTRACT)
+            and entry.get("json_format", DEFAULT_JSON_FORMAT) == json_format
+            and reciter_outputs_exist(reciter_key, output_dir, json_format))
+
+def load_reciter_timestamps(reciter_key, output_dir, json_format=DEFAULT_JSON_FORMAT):
+    """Read back a reciter's previous {reciter}_timestamps.json with integer keys."""
+    data = load_json(output_path(os.path.join(output_dir, f"{reciter_key}_timestamps.json"), json_format))
+    return {int(surah_num): {int(ayah_num): ayah_data for ayah_num, ayah_data in ayahs.items()}
+            for surah_num, ayahs in data.items()}
+
+def main(force=False, json_format=DEFAULT_JSON_FORMAT):
+    """Main function to extract timestamps for every registered reciter."""
+    print("Extracting word-level timestamps from the QUL source files...")
     
     # Create output directory
-    output_dir = "extracted_timestamps"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
     
-    # Extract from Husary
-    print("\nProcessing Husary JSON...")
-    husary_data = load_json_data(HUSARY_JSON_PATH)
-    if husary_data:
-        husary_timestamps = extract_timestamps_from_json(husary_data, "Husary")
-        print(f"Extracted timestamps for {len(husary_timestamps)} surahs from Husary")
-        
-        # Save Husary timestamps
-        save_timestamps_as_json(husary_timestamps, os.path.join(output_dir, "husary_timestamps.json"))
-        save_timestamps_as_csv(husary_timestamps, os.path.join(output_dir, "husary_timestamps.csv"))
-        save_timestamps_by_surah(husary_timestamps, os.path.join(output_dir, "husary_by_surah"))
-        create_word_level_summary(husary_timestamps, os.path.join(output_dir, "husary_summary.json"))
+    # Filled in reciter by reciter as results arrive; only the filtered
+    # surahs are kept, never the full source files
+    combined_timestamps = {surah_num: {} for surah_num in SURAH_NUMBERS_TO_EXTRACT}
+    failed_reciters = []
     
-    # Extract from Minshawi
-    print("\nProcessing Minshawi JSON...")
-    minshawi_data = load_json_data(MINSHAWI_JSON_PATH)
-    if minshawi_data:
-        minshawi_timestamps = extract_timestamps_from_json(minshawi_data, "Minshawi")
-        print(f"Extracted timestamps for {len(minshawi_timestamps)} surahs from Minshawi")
-        
-        # Save Minshawi timestamps
-        save_timestamps_as_json(minshawi_timestamps, os.path.join(output_dir, "minshawi_timestamps.json"))
-        save_timestamps_as_csv(minshawi_timestamps, os.path.join(output_dir, "minshawi_timestamps.csv"))
-        save_timestamps_by_surah(minshawi_timestamps, os.path.join(output_dir, "minshawi_by_surah"))
-        create_word_level_summary(minshawi_timestamps, os.path.join(output_dir, "minshawi_summary.json"))
+    # Only reciters whose source or surah selection changed (or whose
+    # outputs are missing) are re-extracted
+    manifest = load_build_manifest(output_dir)
+    source_hashes = {}
+    stale_reciters = []
+    for reciter_key in EXTRACTION_RECITERS:
+        source_hashes[reciter_key] = source_sha256(RECITERS[reciter_key]['source'])
+        if not force and is_reciter_up_to_date(reciter_key, source_hashes[reciter_key], manifest, output_dir, json_format):
+            print(f"Up to date, skipping: {RECITERS[reciter_key]['reciter_name']}")
+            reciter_timestamps = load_reciter_timestamps(reciter_key, output_dir, json_format)
+            for surah_num in SURAH_NUMBERS_TO_EXTRACT:
+                combined_timestamps[surah_num][reciter_key] = reciter_timestamps.get(surah_num, {})
+        else:
+            stale_reciters.append(reciter_key)
     
-    # Extract from Abdul Basit
-    print("\nProcessing Abdul Basit JSON...")
-    abdul_basit_data = load_json_data(ABDUL_BASIT_JSON_PATH)
-    if abdul_basit_data:
-        abdul_basit_timestamps = extract_timestamps_from_json(abdul_basit_data, "Abdul Basit")
-        print(f"Extracted timestamps for {len(abdul_basit_timestamps)} surahs from Abdul Basit")
-        
-        # Save Abdul Basit timestamps
-        save_timestamps_as_json(abdul_basit_timestamps, os.path.join(output_dir, "abdul_basit_timestamps.json"))
-        save_timestamps_as_csv(abdul_basit_timestamps, os.path.join(output_dir, "abdul_basit_timestamps.csv"))
-        save_timestamps_by_surah(abdul_basit_timestamps, os.path.join(output_dir, "abdul_basit_by_surah"))
-        create_word_level_summary(abdul_basit_timestamps, os.path.join(output_dir, "abdul_basit_summary.json"))
-    
-    # Extract from Mishary
-    print("\nProcessing Mishary JSON...")
-    mishary_data = load_json_data(MISHARY_JSON_PATH)
-    if mishary_data:
-        mishary_timestamps = extract_timestamps_from_json(mishary_data, "Mishary")
-        print(f"Extracted timestamps for {len(mishary_timestamps)} surahs from Mishary")
-        
-        # Save Mishary timestamps
-        save_timestamps_as_json(mishary_timestamps, os.path.join(output_dir, "mishary_timestamps.json"))
-        save_timestamps_as_csv(mishary_timestamps, os.path.join(output_dir, "mishary_timestamps.csv"))
-        save_timestamps_by_surah(mishary_timestamps, os.path.join(output_dir, "mishary_by_surah"))
-        create_word_level_summary(mishary_timestamps, os.path.join(output_dir, "mishary_summary.json"))
-    
-    # Extract from Maher Al-Mu'aiqly
-    print("\nProcessing Maher Al-Mu'aiqly JSON...")
-    maher_data = load_json_data(MAHER_JSON_PATH)
-    if maher_data:
-        maher_timestamps = extract_timestamps_from_json(maher_data, "Maher Al-Mu'aiqly")
-        print(f"Extracted timestamps for {len(maher_timestamps)} surahs from Maher Al-Mu'aiqly")
-        
-        # Save Maher Al-Mu'aiqly timestamps
-        save_timestamps_as_json(maher_timestamps, os.path.join(output_dir, "maher_timestamps.json"))
-        save_timestamps_as_csv(maher_timestamps, os.path.join(output_dir, "maher_timestamps.csv"))
-        save_timestamps_by_surah(maher_timestamps, os.path.join(output_dir, "maher_by_surah"))
-        create_word_level_summary(maher_timestamps, os.path.join(output_dir, "maher_summary.json"))
-    
-    # Extract from Yasser Al-Dosari
-    print("\nProcessing Yasser Al-Dosari JSON...")
-    yasser_data = load_json_data(YASSER_JSON_PATH)
-    if yasser_data:
-        yasser_timestamps = extract_timestamps_from_json(yasser_data, "Yasser Al-Dosari")
-        print(f"Extracted timestamps for {len(yasser_timestamps)} surahs from Yasser Al-Dosari")
-        
-        # Save Yasser Al-Dosari timestamps
-        save_timestamps_as_json(yasser_timestamps, os.path.join(output_dir, "yasser_timestamps.json"))
-        save_timestamps_as_csv(yasser_timestamps, os.path.join(output_dir, "yasser_timestamps.csv"))
-        save_timestamps_by_surah(yasser_timestamps, os.path.join(output_dir, "yasser_by_surah"))
-        create_word_level_summary(yasser_timestamps, os.path.join(output_dir, "yasser_summary.json"))
+    combined_file = output_path(os.path.join(output_dir, "combined_timestamps.json"), json_format)
+    if not stale_reciters and os.path.exists(combined_file):
+        print("\nAll reciters are up to date, nothing to extract.")
+        return
     
-    # Extract from Saud Al-Shuraim
-    print("\nProcessing Saud Al-Shuraim JSON...")
-    shuraim_data = load_json_data(SHURAIM_JSON_PATH)
-    if shuraim_data:
-        shuraim_timestamps = extract_timestamps_from_json(shuraim_data, "Saud Al-Shuraim")
-        print(f"Extracted timestamps for {len(shuraim_timestamps)} surahs from Saud Al-Shuraim")
+    print(f"\nParsing {len(stale_reciters)} reciters with {MAX_WORKERS} worker processes...")
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(extract_reciter, reciter_key) for reciter_key in stale_reciters]
         
-        # Save Saud Al-Shuraim timestamps
-        save_timestamps_as_json(shuraim_timestamps, os.path.join(output_dir, "shuraim_timestamps.json"))
-        save_timestamps_as_csv(shuraim_timestamps, os.path.join(output_dir, "shuraim_timestamps.csv"))
-        save_timestamps_by_surah(shuraim_timestamps, os.path.join(output_dir, "shuraim_by_surah"))
-        create_word_level_summary(shuraim_timestamps, os.path.join(output_dir, "shuraim_summary.json"))
+        for future in as_completed(futures):
+            reciter_key, reciter_timestamps = future.result()
+            reciter_name = RECITERS[reciter_key]['reciter_name']
+            
+            if not reciter_timestamps:
+                print(f"\nFailed to extract timestamps for {reciter_name}")
+                failed_reciters.append(reciter_key)
+                continue
+            
+            print(f"\nExtracted timestamps for {len(reciter_timestamps)} surahs from {reciter_name}")
+            save_reciter_outputs(reciter_key, reciter_timestamps, output_dir, json_format)
+            manifest["reciters"][reciter_key] = {
+                "source": RECITERS[reciter_key]['source'],
+                "source_sha256": source_hashes[reciter_key],
+                "surahs": sorted(SURAH_NUMBERS_TO_EXTRACT),
+                "json_format": json_format,
+                "extracted_at": datetime.now().isoformat()
+            }
+            save_build_manifest(manifest, output_dir)
+            
+            for surah_num in SURAH_NUMBERS_TO_EXTRACT:
+                combined_timestamps[surah_num][reciter_key] = reciter_timestamps.get(surah_num, {})
     
     # Create combined dataset
-    if husary_data and minshawi_data and abdul_basit_data and mishary_data and maher_data and yasser_data and shuraim_data:
+    if not failed_reciters:
         print("\nCreating combined dataset...")
-        combined_timestamps = {}
-        
-        for surah_num in SURAH_NUMBERS_TO_EXTRACT:
-            combined_timestamps[surah_num] = {
-                "husary": husary_timestamps.get(surah_num, {}),
-                "minshawi": minshawi_timestamps.get(surah_num, {}),
-                "abdul_basit": abdul_basit_timestamps.get(surah_num, {}),
-                "mishary": mishary_timestamps.get(surah_num, {}),
-                "maher": maher_timestamps.get(surah_num, {}),
-                "yasser": yasser_timestamps.get(surah_num, {}),
-                "shuraim": shuraim_timestamps.get(surah_num, {})
-            }
+        combined_timestamps = {
+            surah_num: {reciter_key: reciters[reciter_key] for reciter_key in EXTRACTION_RECITERS}
+            for surah_num, reciters in combined_timestamps.items()
+        }
         
-        save_timestamps_as_json(combined_timestamps, os.path.join(output_dir, "combined_timestamps.json"))
-        print(f"Saved combined timestamps to: {os.path.join(output_dir, 'combined_timestamps.json')}")
+        # {surah: {reciter: {ayah: ...}}}: one line per reciter's ayah in JSON Lines
+        save_timestamps_as_json(combined_timestamps, combined_file, json_format, depth=3)
+        print(f"Saved combined timestamps to: {combined_file}")
+    else:
+        print(f"\nSkipping combined dataset, missing: {', '.join(failed_reciters)}")
     
     print(f"\nExtraction complete! All files saved to: {output_dir}")
     print("\nFiles created:")
@@ -283,4 +318,10 @@ def main():
     print("- Recitation comparison studies")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract word-level timestamps for the configured reciters.")
+    parser.add_argument('--force', action='store_true',
+                        help="re-extract every reciter even if its source is unchanged")
+    parser.add_argument('--json-format', choices=JSON_FORMATS, default=DEFAULT_JSON_FORMAT,
+                        help="indented (default), compact (no whitespace) or jsonl (one ayah per line)")
+    args = parser.parse_args()
+    main(force=args.force, json_format=args.json_format) 
\ No newline at end of file
@@ -0,0 +1,135 @@
+import json
+import os
+
+# Configuration
+# 'indented' is the readable default; 'compact' is the same JSON without
+# whitespace; 'jsonl' writes a header line and then one line per record
+JSON_FORMATS = ('indented', 'compact', 'jsonl')
+DEFAULT_JSON_FORMAT = 'indented'
+JSON_LINES_EXTENSION = '.jsonl'
+
+
+def output_path(path, json_format=DEFAULT_JSON_FORMAT):
+    """path with a .jsonl extension for the 'jsonl' format, unchanged otherwise."""
+    if json_format == 'jsonl':
+        return os.path.splitext(path)[0] + JSON_LINES_EXTENSION
+    return path
+
+
+def _iter_records(mapping, depth, prefix=()):
+    """
+    Yield (key path, value) for every entry depth levels down a nested dict.
+    An empty dict above that depth is yielded as it is (with a shorter key
+    path), so it survives the round trip.
+    """
+    for key, value in mapping.items():
+        if depth > 1 and isinstance(value, dict) and value:
+            yield from _iter_records(value, depth - 1, prefix + (key,))
+        else:
+            yield prefix + (key,), value
+
+
+def dump_json(data, path, json_format=DEFAULT_JSON_FORMAT, indent=2, records_key=None, depth=1):
+    """
+    Write data in one of JSON_FORMATS and return the path written.
+
+    For 'jsonl' the records are the entries of data[records_key] (or of data
+    itself), flattened depth levels deep, e.g. depth=2 on {surah: {ayah: ...}}
+    gives one line per ayah. Everything else in data goes in the header line.
+    Keys are written as JSON strings, as json.dump would.
+    """
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f"Unknown JSON format {json_format!r}, expected one of {JSON_FORMATS}")
+
+    path = output_path(path, json_format)
+    with open(path, 'w', encoding='utf-8') as f:
+        if json_format == 'indented':
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        elif json_format == 'compact':
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            records = data[records_key] if records_key is not None else data
+            header = {key: value for key, value in data.items() if key != records_key} if records_key is not None else {}
+            f.write(json.dumps({"records_key": records_key, "depth": depth, "header": header},
+                               ensure_ascii=False, separators=(',', ':')) + '\n')
+            for keys, value in _iter_records(records, depth):
+                f.write(json.dumps([[str(key) for key in keys], value], ensure_ascii=False, separators=(',', ':')) + '\n')
+    return path
+
+
+class JsonLinesFile:
+    """
+    Lazy reader for files written by dump_json(..., json_format='jsonl').
+
+    Only the header is read on open. Iterating streams the records one line at
+    a time; get() seeks straight to one record through a byte-offset index
+    built on first use (only the keys of each line are decoded for it).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = None
+        with open(path, 'r', encoding='utf-8') as f:
+            info = json.loads(f.readline())
+        self.header = info["header"]
+        self.records_key = info["records_key"]
+        self.depth = info["depth"]
+
+    def __iter__(self):
+        """Yield (key tuple, value) for every record, in file order."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                keys, value = json.loads(line)
+                yield tuple(keys), value
+
+    def _build_offsets(self):
+        decoder = json.JSONDecoder()
+        offsets = {}
+        with open(self.path, 'rb') as f:
+            f.readline()
+            offset = f.tell()
+            for line in f:
+                # The line starts with '[[keys...],' so the key list can be decoded on its own
+                keys, _ = decoder.raw_decode(line.decode('utf-8'), 1)
+                offsets[tuple(keys)] = offset
+                offset += len(line)
+        return offsets
+
+    def get(self, *keys, default=None):
+        """The record stored under keys (converted to strings), or default."""
+        if self._offsets is None:
+            self._offsets = self._build_offsets()
+        offset = self._offsets.get(tuple(str(key) for key in keys))
+        if offset is None:
+            return default
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline().decode('utf-8'))[1]
+
+    def keys(self):
+        if self._offsets is None:
+            self._offsets = self._build_offsets()
+        return list(self._offsets)
+
+    def load(self):
+        """The whole file as the nested dict that was written."""
+        records = {}
+        for keys, value in self:
+            target = records
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+        if self.records_key is None:
+            return records
+        data = dict(self.header)
+        data[self.records_key] = records
+        return data
+
+
+def load_json(path):
+    """Load a file written by dump_json in any format (a .jsonl file is read fully)."""
+    if path.endswith(JSON_LINES_EXTENSION):
+        return JsonLinesFile(path).load()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
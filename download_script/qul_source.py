@@ -0,0 +1,183 @@
+import json
+import re
+import sqlite3
+
+from reciters import get_source_format
+
+# Configuration
+CHUNK_SIZE = 64 * 1024
+
+# Top-level entries look like  "113:1":{"surah_number":113,...,"segments":[[1,0,70],...]}
+# Ayah objects hold no nested objects, so a value can be matched (and
+# skipped) without decoding it.
+_OBJECT_START = re.compile(r'\s*\{')
+_ENTRY_KEY = re.compile(r'\s*,?\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+_OBJECT_END = re.compile(r'\s*\}')
+_FLAT_OBJECT = re.compile(r'\{(?:[^{}"]|"(?:[^"\\]|\\.)*")*\}')
+
+
+class _StreamBuffer:
+    """Text buffer over a file that is refilled whenever a pattern runs off its end."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+
+    def match(self, pattern):
+        """Match pattern at the current position, reading more input until the result is final."""
+        while True:
+            m = pattern.match(self.text, self.pos)
+            if self.eof or (m is not None and m.end() < len(self.text)):
+                break
+            self._fill()
+        if m is not None:
+            self.pos = m.end()
+        return m
+
+    def decode_value(self):
+        """Fallback for values that are not flat objects: decode with the stdlib decoder."""
+        decoder = json.JSONDecoder()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.text, self.pos)
+
+
+def normalize_segment(segment):
+    """
+    [word, start_ms, end_ms] for a segment in either QUL layout.
+    JSON files store [word, start, end]; .db exports prefix an index
+    ([idx, word, start, end]). Returns None for malformed segments.
+    """
+    if not isinstance(segment, (list, tuple)) or len(segment) < 3:
+        return None
+    return list(segment[-3:])
+
+
+def normalize_segments(segments):
+    """Normalize a list of segments, dropping malformed ones."""
+    normalized = []
+    for segment in segments or []:
+        segment = normalize_segment(segment)
+        if segment is not None:
+            normalized.append(segment)
+    return normalized
+
+
+def _surah_from_key(key):
+    """'113:5' -> 113, or None when the key is not in surah:ayah form."""
+    surah, _, ayah = key.partition(':')
+    if surah.isdigit() and ayah.isdigit():
+        return int(surah)
+    return None
+
+
+def iter_json_ayahs(source_path, surah_numbers=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream ayah records out of a QUL recitation JSON file.
+
+    The top-level "surah:ayah" keys are read without decoding their values,
+    so only the requested surahs are ever turned into Python objects. QUL
+    files list ayahs in order, so reading stops once the last requested
+    surah has been passed.
+
+    Yields the ayah dicts as stored in the file, with normalized segments.
+    """
+    wanted = set(surah_numbers) if surah_numbers is not None else None
+    last_wanted = max(wanted) if wanted else None
+
+    with open(source_path, 'r', encoding='utf-8') as f:
+        stream = _StreamBuffer(f, chunk_size)
+        if stream.match(_OBJECT_START) is None:
+            raise stream.error("Expected a JSON object")
+
+        while True:
+            key_match = stream.match(_ENTRY_KEY)
+            if key_match is None:
+                if stream.match(_OBJECT_END) is None:
+                    raise stream.error("Expected an ayah key or end of object")
+                return
+
+            surah_number = _surah_from_key(key_match.group(1))
+            if wanted is not None and surah_number is not None:
+                if surah_number > last_wanted:
+                    return
+                if surah_number not in wanted:
+                    if stream.match(_FLAT_OBJECT) is None:
+                        stream.decode_value()
+                    continue
+
+            value_match = stream.match(_FLAT_OBJECT)
+            ayah_info = json.loads(value_match.group(0)) if value_match else stream.decode_value()
+
+            if not isinstance(ayah_info, dict):
+                continue
+            if wanted is not None and ayah_info.get("surah_number") not in wanted:
+                continue
+            if "segments" in ayah_info:
+                ayah_info["segments"] = normalize_segments(ayah_info["segments"])
+            yield ayah_info
+
+
+def iter_db_ayahs(source_path, surah_numbers=None):
+    """
+    Stream ayah records out of a QUL SQLite export through a cursor.
+
+    Rows come back in the same dict shape as the JSON records. The surah
+    filter is part of the query (WHERE surah_number IN (...)), so rows of
+    other surahs are never read. QUL .db exports number ayahs globally
+    (113:1 is ayah_number 6226), so they are renumbered from the first
+    ayah of each surah.
+    """
+    query = "SELECT surah_number, ayah_number, audio_url, duration, segments FROM verses"
+    params = []
+    if surah_numbers is not None:
+        params = sorted(set(surah_numbers))
+        query += f" WHERE surah_number IN ({', '.join('?' * len(params))})"
+    query += " ORDER BY surah_number, ayah_number"
+
+    conn = sqlite3.connect(source_path)
+    try:
+        surah_start = {}
+        for surah_number, ayah_number, audio_url, duration, segments in conn.execute(query, params):
+            first_ayah = surah_start.setdefault(surah_number, ayah_number)
+            yield {
+                "surah_number": surah_number,
+                "ayah_number": ayah_number - first_ayah + 1,
+                "audio_url": audio_url,
+                "duration": duration,
+                "segments": normalize_segments(json.loads(segments or '[]'))
+            }
+    finally:
+        conn.close()
+
+
+def iter_ayahs(source_path, surah_numbers=None):
+    """
+    Stream ayah records from either kind of QUL source, optionally limited
+    to some surahs. Every record has surah-relative ayah numbers and
+    [word, start_ms, end_ms] segments, whatever the source format.
+    """
+    if get_source_format(source_path) == 'db':
+        return iter_db_ayahs(source_path, surah_numbers)
+    return iter_json_ayahs(source_path, surah_numbers)
@@ -0,0 +1,127 @@
+import os
+import re
+import glob
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+QUL_AUDIO_PATH = os.path.normpath(os.path.join(BASE_PATH, '..', 'qul_downloads', 'audio'))
+
+# Registry of the reciters used throughout the project.
+# 'source' is the QUL recitation file, 'reciter_name' is the label stored in
+# the extracted timestamps and 'folder' is where script.py puts the audio.
+RECITERS = {
+    'husary': {
+        'source': os.path.join(BASE_PATH, 'ayah-recitation-mahmoud-khalil-al-husary-murattal-hafs-957.json'),
+        'reciter_name': 'Husary',
+        'folder': 'downloaded_quran_audio_direct'
+    },
+    'minshawi': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-muhammad-siddiq-al-minshawi-murattal-hafs-959.json', 'ayah-recitation-muhammad-siddiq-al-minshawi-murattal-hafs-959.json'),
+        'reciter_name': 'Minshawi',
+        'folder': 'downloaded_quran_audio_direct_minshawi'
+    },
+    'abdul_basit': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-abdul-basit-abdul-samad-murattal-hafs-950.json', 'ayah-recitation-abdul-basit-abdul-samad-murattal-hafs-950.json'),
+        'reciter_name': 'Abdul Basit',
+        'folder': 'downloaded_quran_audio_direct_abdul_basit'
+    },
+    'mishary': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-mishari-rashid-al-afasy-murattal-hafs-953.json', 'ayah-recitation-mishari-rashid-al-afasy-murattal-hafs-953.json'),
+        'reciter_name': 'Mishary',
+        'folder': 'downloaded_quran_audio_direct_mishary'
+    },
+    'maher': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-maher-al-mu-aiqly-murattal-hafs-948.json', 'ayah-recitation-maher-al-mu-aiqly-murattal-hafs-948.json'),
+        'reciter_name': "Maher Al-Mu'aiqly",
+        'folder': 'downloaded_quran_audio_direct_maher'
+    },
+    'yasser': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-yasser-al-dosari-murattal-hafs-961.json', 'ayah-recitation-yasser-al-dosari-murattal-hafs-961.json'),
+        'reciter_name': 'Yasser Al-Dosari',
+        'folder': 'downloaded_quran_audio_direct_yasser'
+    },
+    'shuraim': {
+        'source': os.path.join(QUL_AUDIO_PATH, 'ayah-recitation-saud-al-shuraim-murattal-hafs-960.json', 'ayah-recitation-saud-al-shuraim-murattal-hafs-960.json'),
+        'reciter_name': 'Saud Al-Shuraim',
+        'folder': 'downloaded_quran_audio_direct_shuraim'
+    }
+}
+
+QUL_FILENAME_PATTERN = re.compile(r'^ayah-recitation-(?P<slug>.+)-hafs-(?P<qul_id>\d+)\.(?P<format>json|db)$')
+
+
+def get_source_format(source_path):
+    """Return 'db' for QUL SQLite exports and 'json' for everything else."""
+    return 'db' if source_path.lower().endswith('.db') else 'json'
+
+
+def discover_qul_sources(qul_audio_path=QUL_AUDIO_PATH):
+    """
+    Find every QUL recitation file under qul_downloads/audio.
+
+    QUL zips unpack into a folder named after the file, so both
+    '<name>.json' and '<name>.json/<name>.json' layouts are accepted.
+    Files that belong to a registered reciter keep that reciter's key;
+    any other file gets a key derived from its QUL slug
+    (e.g. 'mahmoud_khalil_al_husary_mujawwad').
+
+    Returns a dict of reciter_key -> {'source', 'reciter_name', 'folder', 'qul_id'}.
+    """
+    registered = {os.path.basename(info['source']): key for key, info in RECITERS.items()}
+    sources = {}
+
+    candidates = glob.glob(os.path.join(qul_audio_path, '*'))
+    candidates += glob.glob(os.path.join(qul_audio_path, '*', '*'))
+
+    for path in sorted(candidates):
+        if not os.path.isfile(path):
+            continue
+
+        filename = os.path.basename(path)
+        match = QUL_FILENAME_PATTERN.match(filename)
+        if not match:
+            continue
+
+        key = registered.get(filename, match.group('slug').replace('-', '_'))
+        if key in sources:
+            continue
+
+        if key in RECITERS:
+            info = dict(RECITERS[key])
+            info['source'] = path
+        else:
+            info = {
+                'source': path,
+                'reciter_name': match.group('slug').replace('-', ' ').title(),
+                'folder': f"downloaded_quran_audio_direct_{key}"
+            }
+        info['qul_id'] = int(match.group('qul_id'))
+        sources[key] = info
+
+    return sources
+
+
+def get_all_sources():
+    """Registered reciters plus any extra QUL files found on disk."""
+    sources = {key: dict(info) for key, info in RECITERS.items()}
+    for key, info in discover_qul_sources().items():
+        if key not in sources:
+            sources[key] = info
+    return sources
+
+
+def get_audio_folder(reciter_key):
+    """Folder (under download_script) that script.py downloads a reciter's audio into."""
+    if reciter_key in RECITERS:
+        return os.path.join(BASE_PATH, RECITERS[reciter_key]['folder'])
+    return os.path.join(BASE_PATH, f"downloaded_quran_audio_direct_{reciter_key}")
+
+
+def find_audio_file(reciter_key, surah_number, ayah_number):
+    """
+    Path of a downloaded ayah (<folder>/<NNN>_<Surah-Name>/Ayah_<NNN>.mp3), or None.
+    The surah folder is matched on its number, so any naming of the surah works.
+    """
+    pattern = os.path.join(get_audio_folder(reciter_key), f"{surah_number:03d}_*", f"Ayah_{ayah_number:03d}.mp3")
+    matches = sorted(glob.glob(pattern))
+    return matches[0] if matches else None
@@ -1,12 +1,25 @@
+import argparse
 import json
-import requests
 import os
 
+from downloader import download_all
+from qul_source import iter_ayahs
+from reciters import BASE_PATH, get_all_sources
+
 # --- Configuration ---
 # **IMPORTANT: Replace with the actual path to your JSON file**
 QURAN_JSON_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\qul_downloads\audio\ayah-recitation-saud-al-shuraim-murattal-hafs-960.json\ayah-recitation-saud-al-shuraim-murattal-hafs-960.json'
 OUTPUT_ROOT_DIR = "downloaded_quran_audio_direct_shuraim"
 
+# Number of parallel downloads sharing one pooled HTTP session
+MAX_WORKERS = 8
+# Compare already-downloaded files against the server's Content-Length (one HEAD per file)
+VERIFY_EXISTING = False
+
+# Batch mode: one global queue for every reciter, capped per host
+BATCH_MAX_WORKERS = 16
+MAX_CONNECTIONS_PER_HOST = 8
+
 # List of Surah numbers for the surahs you want to download.
 # We'll use this to filter the huge JSON.
 SURAH_NUMBERS_TO_DOWNLOAD = [
@@ -39,10 +52,10 @@ def download_ayahs_from_json():
     # Create the root output directory if it doesn't exist
     os.makedirs(OUTPUT_ROOT_DIR, exist_ok=True)
 
+    # First pass: stream only the specified surahs out of the huge JSON
+    print("Filtering JSON for specified surahs...")
     try:
-        # Load the huge JSON file
-        with open(QURAN_JSON_PATH, 'r', encoding='utf-8') as f:
-            quran_data = json.load(f)
+        ayahs_to_process = list(iter_ayahs(QURAN_JSON_PATH, SURAH_NUMBERS_TO_DOWNLOAD))
     except FileNotFoundError:
         print(f"Error: JSON file not found at '{QURAN_JSON_PATH}'. Please check the path.")
         return
@@ -52,27 +65,14 @@ def download_ayahs_from_json():
     except Exception as e:
         print(f"An unexpected error occurred while loading JSON: {e}")
         return
-
-    download_count = 0
-    skipped_count = 0
-    ayahs_to_process = []
-
-    # First pass: Filter and collect relevant ayah data
-    print("Filtering JSON for specified surahs...")
-    for key, ayah_info in quran_data.items():
-        if isinstance(ayah_info, dict): # Ensure it's a dictionary entry
-            surah_number = ayah_info.get("surah_number")
-            if surah_number in SURAH_NUMBERS_TO_DOWNLOAD:
-                ayahs_to_process.append(ayah_info)
     
     # Sort ayahs for organized downloading (optional but good practice)
     ayahs_to_process.sort(key=lambda x: (x.get("surah_number", 0), x.get("ayah_number", 0)))
 
     print(f"Found {len(ayahs_to_process)} ayahs to potentially download from specified surahs.")
 
-    current_surah_dir = None
-    last_surah_number = None
-
+    # Second pass: turn each ayah into a download job
+    jobs = []
     for ayah_info in ayahs_to_process:
         surah_number = ayah_info.get("surah_number")
         ayah_number = ayah_info.get("ayah_number")
@@ -82,44 +82,130 @@ def download_ayahs_from_json():
             print(f"Warning: Skipping malformed ayah entry: {ayah_info}")
             continue
 
-        if surah_number != last_surah_number:
-            surah_name = SURAH_NUMBER_TO_NAME.get(surah_number, f"Surah_{pad_number(surah_number)}")
-            current_surah_dir = os.path.join(OUTPUT_ROOT_DIR, f"{pad_number(surah_number)}_{surah_name}")
-            os.makedirs(current_surah_dir, exist_ok=True)
-            print(f"\n--- Processing Surah {surah_number}: {surah_name} ---")
-            last_surah_number = surah_number
+        surah_name = SURAH_NUMBER_TO_NAME.get(surah_number, f"Surah_{pad_number(surah_number)}")
+        surah_dir = os.path.join(OUTPUT_ROOT_DIR, f"{pad_number(surah_number)}_{surah_name}")
 
-        # Extract filename from URL or create a standardized one
         # Using a standardized name for consistency: Ayah_001.mp3
         local_filename = f"Ayah_{pad_number(ayah_number)}.mp3"
-        local_filepath = os.path.join(current_surah_dir, local_filename)
+        jobs.append({
+            'url': audio_url,
+            'dest': os.path.join(surah_dir, local_filename),
+            'label': f"{surah_name} {local_filename}"
+        })
+
+    # Partial downloads resume from .part files; finished files are only
+    # renamed into place once complete, so the skip check is safe.
+    print(f"Downloading with {MAX_WORKERS} workers...")
+    counts = download_all(jobs, workers=MAX_WORKERS, verify_existing=VERIFY_EXISTING)
+
+    print(f"\n--- Download Summary ---")
+    print(f"Total downloaded files: {counts['downloaded']}")
+    print(f"Total skipped (already exists): {counts['skipped']}")
+    print(f"Total failed: {counts['failed']}")
+    print(f"Process complete.")
 
-        if os.path.exists(local_filepath):
-            print(f"Skipping: {local_filename} already exists in {os.path.basename(current_surah_dir)}")
-            skipped_count += 1
+# --- Multi-Reciter Batch Mode ---
+def load_manifest(manifest_path=None):
+    """
+    Load a download manifest.
+
+    A manifest is a JSON file of the form
+        {"surahs": [1, 113], "reciters": ["husary", "shuraim"]}
+    where "reciters" may also map keys to {"source": ..., "folder": ...}
+    overrides. Without a manifest (or without "reciters") every source in
+    qul_downloads/audio (JSON and .db) is used; without "surahs"
+    SURAH_NUMBERS_TO_DOWNLOAD is used.
+    """
+    manifest = {}
+    if manifest_path:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    all_sources = get_all_sources()
+    reciters = manifest.get("reciters")
+    if reciters is None:
+        sources = all_sources
+    elif isinstance(reciters, dict):
+        sources = {}
+        for key, override in reciters.items():
+            source = {**all_sources.get(key, {}), **(override or {})}
+            missing = [field for field in ('source', 'folder') if field not in source]
+            if missing:
+                print(f"Warning: Reciter '{key}' in manifest has no {' or '.join(missing)}, skipping.")
+                continue
+            sources[key] = source
+    else:
+        sources = {key: all_sources[key] for key in reciters if key in all_sources}
+        for key in reciters:
+            if key not in all_sources:
+                print(f"Warning: Unknown reciter '{key}' in manifest, skipping.")
+
+    return {
+        "surahs": manifest.get("surahs", SURAH_NUMBERS_TO_DOWNLOAD),
+        "sources": sources
+    }
+
+
+def build_download_jobs(sources, surah_numbers):
+    """Turn every (reciter, ayah) in the selected surahs into a download job."""
+    surah_numbers = set(surah_numbers)
+    jobs = []
+
+    for reciter_key, info in sources.items():
+        source_path = info.get('source')
+        if not source_path or not os.path.exists(source_path):
+            print(f"Warning: Source file not found for {reciter_key} at {source_path}")
             continue
 
-        try:
-            print(f"Downloading {surah_name} Ayah {ayah_number} from {audio_url}...")
-            response = requests.get(audio_url, stream=True, timeout=30) # Increased timeout
-            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-
-            with open(local_filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Downloaded: {local_filename}")
-            download_count += 1
-        except requests.exceptions.RequestException as e:
-            print(f"Error downloading {audio_url}: {e}")
-            print(f"Could not download Ayah {ayah_number} from Surah {surah_name}.")
-        except Exception as e:
-            print(f"An unexpected error occurred for Ayah {ayah_number} from Surah {surah_name}: {e}")
+        output_root = os.path.join(BASE_PATH, info['folder'])
+        reciter_jobs = 0
+        for ayah_info in iter_ayahs(source_path, surah_numbers):
+            surah_number = ayah_info.get("surah_number")
+            ayah_number = ayah_info.get("ayah_number")
+            audio_url = ayah_info.get("audio_url")
+            if ayah_number is None or not audio_url:
+                continue
 
-    print(f"\n--- Download Summary ---")
-    print(f"Total downloaded files: {download_count}")
-    print(f"Total skipped (already exists): {skipped_count}")
+            surah_name = SURAH_NUMBER_TO_NAME.get(surah_number, f"Surah_{pad_number(surah_number)}")
+            local_filename = f"Ayah_{pad_number(ayah_number)}.mp3"
+            jobs.append({
+                'url': audio_url,
+                'dest': os.path.join(output_root, f"{pad_number(surah_number)}_{surah_name}", local_filename),
+                'label': f"{reciter_key} {surah_name} {local_filename}"
+            })
+            reciter_jobs += 1
+
+        print(f"{reciter_key}: {reciter_jobs} ayahs queued")
+
+    return jobs
+
+
+def download_all_reciters(manifest_path=None):
+    """Download every reciter in the manifest through one shared work queue."""
+    manifest = load_manifest(manifest_path)
+    print(f"Building download queue for {len(manifest['sources'])} reciters...")
+    jobs = build_download_jobs(manifest["sources"], manifest["surahs"])
+
+    print(f"Downloading {len(jobs)} files with {BATCH_MAX_WORKERS} workers "
+          f"(max {MAX_CONNECTIONS_PER_HOST} per host)...")
+    counts = download_all(jobs, workers=BATCH_MAX_WORKERS, host_limit=MAX_CONNECTIONS_PER_HOST,
+                          verify_existing=VERIFY_EXISTING)
+
+    print(f"\n--- Batch Download Summary ---")
+    print(f"Total downloaded files: {counts['downloaded']}")
+    print(f"Total skipped (already exists): {counts['skipped']}")
+    print(f"Total failed: {counts['failed']}")
     print(f"Process complete.")
 
 # --- Run the downloader ---
 if __name__ == "__main__":
-    download_ayahs_from_json()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download per-ayah Quran recitation audio.")
+    parser.add_argument('--all-reciters', action='store_true',
+                        help="download every reciter source in qul_downloads/audio in one pass")
+    parser.add_argument('--manifest', help="JSON manifest selecting reciters and surahs (implies batch mode)")
+    args = parser.parse_args()
+
+    if args.all_reciters or args.manifest:
+        download_all_reciters(args.manifest)
+    else:
+        download_ayahs_from_json()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import json
+import os
+
+import numpy as np
+
+from corpus_store import CORPUS_DB_PATH, build_corpus_store, open_corpus_store
+from reciters import BASE_PATH
+
+# Configuration
+SEGMENT_ARRAYS_DIR = os.path.join(BASE_PATH, 'segment_arrays')
+SEGMENTS_FILE = 'segments.npy'
+INDEX_FILE = 'index.npy'
+# Written by segment_refine.py: same rows as segments.npy, boundaries snapped to the audio
+REFINED_SEGMENTS_FILE = 'refined_segments.npy'
+METADATA_FILE = 'metadata.json'
+
+# index.npy columns
+INDEX_RECITER, INDEX_SURAH, INDEX_AYAH, INDEX_OFFSET, INDEX_COUNT = range(5)
+# segments.npy columns
+SEGMENT_WORD, SEGMENT_START, SEGMENT_END = range(3)
+# QUL fills words it has no boundary for with 70 or 100 ms segments; no
+# spoken word is this short, so these durations are treated as unmeasured
+PLACEHOLDER_MAX_MS = 100
+
+
+def _pack_keys(reciter_ids, surahs, ayahs):
+    """Combine (reciter, surah, ayah) into one sortable int64 key."""
+    return (np.asarray(reciter_ids, dtype=np.int64) * 1_000_000
+            + np.asarray(surahs, dtype=np.int64) * 1_000
+            + np.asarray(ayahs, dtype=np.int64))
+
+
+def export_segment_arrays(output_dir=SEGMENT_ARRAYS_DIR, db_path=CORPUS_DB_PATH):
+    """
+    Export every word segment in the corpus store as fixed-width int32 arrays.
+
+    segments.npy  (N, 3)  word, start_ms, end_ms for every word of every ayah
+    index.npy     (M, 5)  reciter_id, surah, ayah, offset, count into segments.npy
+    metadata.json         reciter keys/names (reciter_id is the position in the list)
+
+    The store already holds segments as packed int32, so the export is a
+    straight byte copy with no JSON parsing.
+    """
+    if not os.path.exists(db_path):
+        print(f"Corpus store not found at {db_path}, building it first...")
+        build_corpus_store(db_path)
+
+    os.makedirs(output_dir, exist_ok=True)
+    conn = open_corpus_store(db_path)
+    try:
+        reciters = conn.execute("SELECT reciter, reciter_name FROM reciters ORDER BY reciter").fetchall()
+        reciter_ids = {reciter_key: i for i, (reciter_key, _) in enumerate(reciters)}
+
+        rows = conn.execute("SELECT reciter, surah_number, ayah_number, segments FROM verses "
+                            "ORDER BY reciter, surah_number, ayah_number").fetchall()
+    finally:
+        conn.close()
+
+    chunks = [np.frombuffer(blob or b'', dtype='<i4') for _, _, _, blob in rows]
+    counts = np.array([len(chunk) // 3 for chunk in chunks], dtype=np.int32)
+    offsets = np.zeros(len(counts), dtype=np.int32)
+    np.cumsum(counts[:-1], out=offsets[1:])
+
+    segments = (np.concatenate(chunks) if chunks else np.empty(0, dtype='<i4')).astype(np.int32).reshape(-1, 3)
+    index = np.column_stack([
+        np.array([reciter_ids[row[0]] for row in rows], dtype=np.int32),
+        np.array([row[1] for row in rows], dtype=np.int32),
+        np.array([row[2] for row in rows], dtype=np.int32),
+        offsets,
+        counts
+    ]).astype(np.int32)
+
+    np.save(os.path.join(output_dir, SEGMENTS_FILE), segments)
+    # Rows may have moved, so any earlier refinement no longer lines up
+    refined_path = os.path.join(output_dir, REFINED_SEGMENTS_FILE)
+    if os.path.exists(refined_path):
+        os.remove(refined_path)
+    np.save(os.path.join(output_dir, INDEX_FILE), index)
+    with open(os.path.join(output_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            "reciters": [reciter_key for reciter_key, _ in reciters],
+            "reciter_names": {reciter_key: reciter_name for reciter_key, reciter_name in reciters},
+            "segment_columns": ["word", "start_ms", "end_ms"],
+            "index_columns": ["reciter_id", "surah", "ayah", "offset", "count"]
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"Exported {len(segments)} word segments for {len(index)} ayahs to {output_dir}")
+    return segments.shape[0], index.shape[0]
+
+
+class SegmentArrays:
+    """
+    Memory-mapped view over an export from export_segment_arrays.
+
+    Nothing is parsed on load; pages are shared between processes that map
+    the same files. Lookups return read-only (count, 3) views, taken from
+    refined_segments.npy instead when refined=True and it has been built.
+    """
+
+    def __init__(self, directory=SEGMENT_ARRAYS_DIR):
+        self.directory = directory
+        self.segments = np.load(os.path.join(directory, SEGMENTS_FILE), mmap_mode='r')
+        self.index = np.load(os.path.join(directory, INDEX_FILE), mmap_mode='r')
+        refined_path = os.path.join(directory, REFINED_SEGMENTS_FILE)
+        self.refined = np.load(refined_path, mmap_mode='r') if os.path.exists(refined_path) else None
+        with open(os.path.join(directory, METADATA_FILE), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        self.reciters = metadata["reciters"]
+        self.reciter_names = metadata["reciter_names"]
+        self.reciter_ids = {reciter_key: i for i, reciter_key in enumerate(self.reciters)}
+        self.keys = _pack_keys(self.index[:, INDEX_RECITER], self.index[:, INDEX_SURAH], self.index[:, INDEX_AYAH])
+
+    def find(self, reciter_key, surah_number, ayah_number):
+        """Row of the index for one ayah, or -1."""
+        reciter_id = self.reciter_ids.get(reciter_key)
+        if reciter_id is None:
+            return -1
+        key = int(_pack_keys(reciter_id, surah_number, ayah_number))
+        row = int(np.searchsorted(self.keys, key))
+        if row < len(self.keys) and self.keys[row] == key:
+            return row
+        return -1
+
+    def segments_for(self, refined=False):
+        """The refined segments if asked for and available, else the originals."""
+        return self.refined if refined and self.refined is not None else self.segments
+
+    def get_ayah(self, reciter_key, surah_number, ayah_number, refined=False):
+        """(count, 3) array of word, start_ms, end_ms, or None if the ayah is unknown."""
+        row = self.find(reciter_key, surah_number, ayah_number)
+        if row < 0:
+            return None
+        offset, count = self.index[row, INDEX_OFFSET], self.index[row, INDEX_COUNT]
+        return self.segments_for(refined)[offset:offset + count]
+
+    def get_surah(self, reciter_key, surah_number, refined=False):
+        """{ayah_number: (count, 3) array} for one reciter's surah."""
+        reciter_id = self.reciter_ids.get(reciter_key)
+        if reciter_id is None:
+            return {}
+        segments = self.segments_for(refined)
+        start = int(np.searchsorted(self.keys, _pack_keys(reciter_id, surah_number, 0)))
+        end = int(np.searchsorted(self.keys, _pack_keys(reciter_id, surah_number + 1, 0)))
+        return {int(ayah): segments[offset:offset + count]
+                for ayah, offset, count in self.index[start:end, INDEX_AYAH:]}
+
+    def rows_for(self, reciter_key=None, surah_numbers=None):
+        """Boolean mask over the index selecting a reciter and/or some surahs."""
+        mask = np.ones(len(self.index), dtype=bool)
+        if reciter_key is not None:
+            mask &= self.index[:, INDEX_RECITER] == self.reciter_ids.get(reciter_key, -1)
+        if surah_numbers is not None:
+            mask &= np.isin(self.index[:, INDEX_SURAH], list(surah_numbers))
+        return mask
+
+
+if __name__ == "__main__":
+    print("Exporting word segments as memory-mappable arrays...")
+    export_segment_arrays()
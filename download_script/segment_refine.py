@@ -0,0 +1,199 @@
+import argparse
+import os
+
+import numpy as np
+
+from audio_features import (FEATURE_CACHE_DIR, SurahFeatures, extract_features, feature_cache_path,
+                            frame_to_ms, ms_to_frame)
+from segment_arrays import (SEGMENT_ARRAYS_DIR, REFINED_SEGMENTS_FILE, SegmentArrays, INDEX_RECITER, INDEX_SURAH,
+                            INDEX_AYAH, INDEX_OFFSET, INDEX_COUNT, SEGMENT_START, SEGMENT_END)
+
+# Configuration
+# Boundaries between words move at most this far past the original start/end
+SNAP_MS = 150
+# A boundary is never placed closer than this to the outer edge of either word
+MIN_WORD_MS = 120
+# The first word's start and last word's end may move further (leading/trailing silence)
+OUTER_SNAP_MS = 1000
+# Frames this far below the ayah's peak RMS count as silence
+SILENCE_DB = -35.0
+# Energy is smoothed over this many frames before looking for minima
+SMOOTHING_FRAMES = 3
+# Boundaries are processed in batches of this many rows
+BATCH_ROWS = 20000
+
+
+def _window(values, lo, hi, fill):
+    """(rows, max width) matrix of values[lo:hi] per row, padded with fill; plus the validity mask."""
+    width = max(int((hi - lo).max()), 1)
+    index = lo[:, None] + np.arange(width)[None, :]
+    valid = index < hi[:, None]
+    return np.where(valid, values[np.clip(index, 0, len(values) - 1)], fill), valid
+
+
+def snap_between(energy_db, left_end, right_start, lower, upper):
+    """
+    New (end of word k, start of word k+1) for each boundary, in frames.
+
+    The boundary is searched between the two original times widened by
+    SNAP_MS, keeping MIN_WORD_MS inside the outer edges of the two words
+    (lower/upper). If the quietest frame is silence the words are split
+    around the whole silent run (the pause is kept); otherwise both snap to
+    the minimum. Boundaries with no room to search are left as they are.
+    """
+    snap = int(ms_to_frame(SNAP_MS))
+    min_word = int(ms_to_frame(MIN_WORD_MS))
+    lo = np.maximum(np.minimum(left_end, right_start) - snap, lower + min_word)
+    hi = np.minimum(np.maximum(left_end, right_start) + snap, upper - min_word)
+    searchable = hi > lo
+    hi = np.maximum(hi, lo + 1)
+
+    new_end, new_start = left_end.copy(), right_start.copy()
+    for batch in range(0, len(lo), BATCH_ROWS):
+        part = slice(batch, batch + BATCH_ROWS)
+        window, valid = _window(energy_db, lo[part], hi[part], np.inf)
+        quietest = window.argmin(axis=1)
+        rows = np.arange(len(quietest))
+        columns = np.arange(window.shape[1])[None, :]
+
+        silent = valid & (window < SILENCE_DB)
+        loud = valid & ~silent
+        run_start = np.where(loud & (columns < quietest[:, None]), columns, -1).max(axis=1) + 1
+        run_end = np.where(loud & (columns > quietest[:, None]), columns, window.shape[1]).min(axis=1)
+        run_end = np.minimum(run_end, hi[part] - lo[part])
+
+        in_silence = silent[rows, quietest]
+        new_end[part] = lo[part] + np.where(in_silence, run_start, quietest)
+        new_start[part] = lo[part] + np.where(in_silence, run_end, quietest)
+
+    new_end = np.where(searchable, new_end, left_end)
+    new_start = np.where(searchable, new_start, right_start)
+    return new_end, new_start
+
+
+def snap_outer(energy_db, start, end, ayah_start, ayah_end):
+    """Move the first word's start to the first non-silent frame and the last word's end past the last one."""
+    snap = int(ms_to_frame(OUTER_SNAP_MS))
+    new_start, new_end = start.copy(), end.copy()
+
+    lo = np.maximum(start - snap, ayah_start)
+    hi = np.maximum(np.minimum(start + snap, end), lo + 1)
+    window, valid = _window(energy_db, lo, hi, -np.inf)
+    loud = valid & (window >= SILENCE_DB)
+    new_start = np.where(loud.any(axis=1), lo + loud.argmax(axis=1), start)
+
+    lo = np.maximum(end - snap, new_start)
+    hi = np.maximum(np.minimum(end + snap, ayah_end), lo + 1)
+    window, valid = _window(energy_db, lo, hi, -np.inf)
+    loud = valid & (window >= SILENCE_DB)
+    last_loud = loud.shape[1] - 1 - loud[:, ::-1].argmax(axis=1)
+    new_end = np.where(loud.any(axis=1), lo + last_loud + 1, end)
+    return new_start, new_end
+
+
+def _load_envelopes(arrays, rows, cache_dir):
+    """
+    Concatenate the smoothed RMS (in dB relative to each ayah's peak) of every
+    ayah in rows. Returns the envelope and each row's (frame start, frame end)
+    in it, or -1 for ayahs without cached features.
+    """
+    parts, ayah_start, ayah_end = [], np.full(len(rows), -1), np.full(len(rows), -1)
+    base = 0
+    loaded = {}
+    for i, (reciter_id, surah_number, ayah_number) in enumerate(rows[:, [INDEX_RECITER, INDEX_SURAH, INDEX_AYAH]]):
+        key = (arrays.reciters[reciter_id], int(surah_number))
+        if key not in loaded:
+            loaded[key] = SurahFeatures(*key, cache_dir) if os.path.exists(feature_cache_path(*key, cache_dir)) else None
+        features = loaded[key]
+        frames = features.ayah_frames(int(ayah_number)) if features else None
+        if frames is None:
+            continue
+
+        rms = features.rms[frames[0]:frames[1]].astype(np.float64)
+        if SMOOTHING_FRAMES > 1 and len(rms) >= SMOOTHING_FRAMES:
+            rms = np.convolve(rms, np.ones(SMOOTHING_FRAMES) / SMOOTHING_FRAMES, mode='same')
+        parts.append(20 * np.log10(rms / max(rms.max(), 1e-9) + 1e-6))
+        ayah_start[i], ayah_end[i] = base, base + len(rms)
+        base += len(rms)
+
+    envelope = np.concatenate(parts) if parts else np.empty(0)
+    return envelope, ayah_start, ayah_end
+
+
+def refine_segments(arrays, reciters=None, surah_numbers=None, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Snap every word boundary of the selected ayahs to nearby silence or
+    energy minima. Returns a copy of the refined segments built so far (or
+    of arrays.segments on the first run) in which only the selected ayahs
+    with cached audio features are refined again from their original
+    times, and the number of ayahs refined.
+    """
+    refined = np.array(arrays.refined if arrays.refined is not None else arrays.segments, dtype=np.int32)
+    mask = arrays.rows_for(None, surah_numbers) & (np.asarray(arrays.index[:, INDEX_COUNT]) > 0)
+    if reciters is not None:
+        mask &= np.isin(arrays.index[:, INDEX_RECITER], [arrays.reciter_ids[key] for key in reciters if key in arrays.reciter_ids])
+    rows = np.asarray(arrays.index[mask])
+
+    envelope, ayah_start, ayah_end = _load_envelopes(arrays, rows, cache_dir)
+    has_audio = ayah_start >= 0
+    rows, ayah_start, ayah_end = rows[has_audio], ayah_start[has_audio], ayah_end[has_audio]
+    if not len(rows):
+        return refined, 0
+
+    counts = rows[:, INDEX_COUNT].astype(np.int64)
+    first = np.cumsum(counts) - counts
+    segment_rows = np.repeat(rows[:, INDEX_OFFSET].astype(np.int64), counts) + np.arange(counts.sum()) - np.repeat(first, counts)
+    base = np.repeat(ayah_start, counts)
+    limit = np.repeat(ayah_end, counts)
+
+    original = np.asarray(arrays.segments[segment_rows])
+    start = np.clip(base + ms_to_frame(original[:, SEGMENT_START]), base, limit)
+    end = np.clip(base + ms_to_frame(original[:, SEGMENT_END]), start, limit)
+
+    # Leading silence before the first word and trailing silence after the
+    # last, first, so the inner search below cannot land in them
+    last = first + counts - 1
+    start[first], end[last] = snap_outer(envelope, start[first], end[last], ayah_start, ayah_end)
+    end = np.maximum(end, start)
+
+    # Boundaries between consecutive words of the same ayah
+    inner = np.ones(len(start), dtype=bool)
+    inner[last] = False
+    left = np.flatnonzero(inner)
+    new_end, new_start = snap_between(envelope, end[left], start[left + 1], start[left], end[left + 1])
+    start[left + 1], end[left] = new_start, new_end
+    end = np.maximum(end, start)
+
+    refined[segment_rows, SEGMENT_START] = np.round(frame_to_ms(start - base)).astype(np.int32)
+    refined[segment_rows, SEGMENT_END] = np.round(frame_to_ms(end - base)).astype(np.int32)
+    return refined, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refine word boundaries against the decoded audio.")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every registered reciter with audio)")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every downloaded surah)")
+    parser.add_argument('--arrays-dir', default=SEGMENT_ARRAYS_DIR)
+    parser.add_argument('--cache-dir', default=FEATURE_CACHE_DIR)
+    args = parser.parse_args()
+
+    print("Making sure audio features are cached...")
+    extract_features(args.reciters, args.surahs, args.arrays_dir, args.cache_dir)
+
+    arrays = SegmentArrays(args.arrays_dir)
+    refined, ayah_count = refine_segments(arrays, args.reciters, args.surahs, args.cache_dir)
+
+    output_path = os.path.join(args.arrays_dir, REFINED_SEGMENTS_FILE)
+    temp_path = output_path + '.part.npy'
+    np.save(temp_path, refined)
+    os.replace(temp_path, output_path)
+
+    shift = np.abs(refined[:, SEGMENT_START:] - np.asarray(arrays.segments[:, SEGMENT_START:]))
+    moved = shift.any(axis=1)
+    print(f"Refined {ayah_count} ayahs; {int(moved.sum())} words in the file differ from the original segments, "
+          f"mean boundary shift {shift[moved].mean() if moved.any() else 0:.0f} ms")
+    print(f"Saved refined segments to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
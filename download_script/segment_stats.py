@@ -0,0 +1,171 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from reciters import BASE_PATH
+from segment_arrays import (SEGMENT_ARRAYS_DIR, SegmentArrays, INDEX_RECITER, INDEX_SURAH, INDEX_AYAH,
+                            INDEX_OFFSET, INDEX_COUNT, SEGMENT_WORD, SEGMENT_START, SEGMENT_END,
+                            PLACEHOLDER_MAX_MS)
+
+# Configuration
+STATS_OUTPUT_DIR = os.path.join(BASE_PATH, 'segment_stats')
+
+# A word held this many times longer than the reciter's ms-per-word in that
+# ayah is reported as a madd candidate
+MADD_MIN_TEMPO_RATIO = 1.75
+# ...and is listed at word level when at least this share of reciters agree
+MADD_MIN_RECITER_SHARE = 0.5
+
+
+def _gather_rows(index):
+    """Positions in segments.npy for every word of the selected index rows."""
+    counts = index[:, INDEX_COUNT].astype(np.int64)
+    first = np.cumsum(counts) - counts
+    within = np.arange(counts.sum()) - np.repeat(first, counts)
+    return np.repeat(index[:, INDEX_OFFSET].astype(np.int64), counts) + within, first
+
+
+def build_word_frame(arrays, surah_numbers=None, reciters=None, refined=False):
+    """
+    Per-word statistics for the selected surahs/reciters, computed in batched array operations.
+
+    Columns: reciter, surah, ayah, word, start_ms, end_ms, measured,
+    duration_ms, gap_ms (silence before the word, NaN for the first word),
+    tempo_ms_per_word (the measured words' durations and the pauses
+    before them, divided by the number of measured words), tempo_ratio (duration_ms / tempo_ms_per_word) and
+    duration_z (z-score of duration_ms across reciters for the same
+    surah/ayah/word). QUL placeholder segments (PLACEHOLDER_MAX_MS or
+    shorter) are not measured: their duration_ms, gap_ms, tempo_ratio and
+    duration_z are NaN and they are left out of the tempo.
+    With refined=True the audio-snapped boundaries from segment_refine.py are used.
+    """
+    mask = arrays.rows_for(None, surah_numbers) & (np.asarray(arrays.index[:, INDEX_COUNT]) > 0)
+    if reciters is not None:
+        reciter_ids = [arrays.reciter_ids[key] for key in reciters if key in arrays.reciter_ids]
+        mask &= np.isin(arrays.index[:, INDEX_RECITER], reciter_ids)
+    index = np.asarray(arrays.index[mask])
+
+    rows, first = _gather_rows(index)
+    segments = np.asarray(arrays.segments_for(refined)[rows])
+    counts = index[:, INDEX_COUNT]
+    # Placeholders are a property of the QUL source, so refined rows are masked by the original ones
+    original = np.asarray(arrays.segments[rows]) if refined else segments
+    measured = original[:, SEGMENT_END] - original[:, SEGMENT_START] > PLACEHOLDER_MAX_MS
+
+    start = segments[:, SEGMENT_START].astype(np.float64)
+    end = segments[:, SEGMENT_END].astype(np.float64)
+    duration = np.where(measured, end - start, np.nan)
+
+    gap = np.empty_like(start)
+    gap[1:] = start[1:] - end[:-1]
+    gap[first] = np.nan
+    gap[~measured] = np.nan
+    gap[1:][~measured[:-1]] = np.nan
+
+    ayah_of_word = np.repeat(np.arange(len(index)), counts)
+    span = np.bincount(ayah_of_word, weights=np.nan_to_num(duration) + np.nan_to_num(gap), minlength=len(index))
+    measured_words = np.bincount(ayah_of_word, weights=measured, minlength=len(index))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tempo = np.where(measured_words > 0, span / measured_words, np.nan)
+    tempo_per_word = np.repeat(tempo, counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tempo_ratio = np.where(tempo_per_word > 0, duration / tempo_per_word, np.nan)
+
+    reciter_names = np.array(arrays.reciters)
+    words = pd.DataFrame({
+        'reciter': pd.Categorical(reciter_names[np.repeat(index[:, INDEX_RECITER], counts)], categories=arrays.reciters),
+        'surah': np.repeat(index[:, INDEX_SURAH], counts),
+        'ayah': np.repeat(index[:, INDEX_AYAH], counts),
+        'word': segments[:, SEGMENT_WORD],
+        'start_ms': segments[:, SEGMENT_START],
+        'end_ms': segments[:, SEGMENT_END],
+        'measured': measured,
+        'duration_ms': duration,
+        'gap_ms': gap,
+        'tempo_ms_per_word': tempo_per_word,
+        'tempo_ratio': tempo_ratio
+    })
+
+    grouped = words.groupby(['surah', 'ayah', 'word'], sort=False)['duration_ms']
+    mean = grouped.transform('mean')
+    std = grouped.transform('std', ddof=0)
+    words['duration_z'] = np.where(std > 0, (words['duration_ms'] - mean) / std.where(std > 0, 1), 0.0)
+    words.loc[~measured, 'duration_z'] = np.nan
+
+    return words
+
+
+def build_ayah_frame(words):
+    """Per-ayah totals: word count, span, tempo, speaking time and total pause (measured words only)."""
+    ayahs = words.groupby(['reciter', 'surah', 'ayah'], observed=True).agg(
+        word_count=('word', 'size'),
+        measured_words=('measured', 'sum'),
+        start_ms=('start_ms', 'min'),
+        end_ms=('end_ms', 'max'),
+        speech_ms=('duration_ms', 'sum'),
+        pause_ms=('gap_ms', 'sum'),
+        tempo_ms_per_word=('tempo_ms_per_word', 'first'),
+        max_tempo_ratio=('tempo_ratio', 'max')
+    ).reset_index()
+    ayahs['span_ms'] = ayahs['end_ms'] - ayahs['start_ms']
+    return ayahs
+
+
+def find_madd_candidates(words, min_tempo_ratio=MADD_MIN_TEMPO_RATIO, min_reciter_share=MADD_MIN_RECITER_SHARE):
+    """
+    Words held unusually long relative to each reciter's own tempo.
+
+    Returns (per_reciter, per_word): every flagged (reciter, word) row, and
+    one row per surah/ayah/word with the share of reciters that flagged it,
+    keeping words where at least min_reciter_share of reciters agree. Only
+    measured words count, and a reciter who repeats a word counts once.
+    """
+    flagged = words['tempo_ratio'] >= min_tempo_ratio
+    per_reciter = words[flagged].sort_values('tempo_ratio', ascending=False)
+
+    per_word = words[words['measured']].assign(flagged_reciter=words['reciter'].where(flagged))
+    per_word = per_word.groupby(['surah', 'ayah', 'word']).agg(
+        reciters=('reciter', 'nunique'),
+        reciters_flagged=('flagged_reciter', 'nunique'),
+        mean_tempo_ratio=('tempo_ratio', 'mean'),
+        mean_duration_ms=('duration_ms', 'mean')
+    ).reset_index()
+    per_word['reciter_share'] = per_word['reciters_flagged'] / per_word['reciters']
+    per_word = per_word[per_word['reciter_share'] >= min_reciter_share]
+    return per_reciter, per_word.sort_values(['surah', 'ayah', 'word'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Word-duration statistics across reciters.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: whole Quran)")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every reciter in the export)")
+    parser.add_argument('--arrays-dir', default=SEGMENT_ARRAYS_DIR)
+    parser.add_argument('--output-dir', default=STATS_OUTPUT_DIR)
+    parser.add_argument('--min-tempo-ratio', type=float, default=MADD_MIN_TEMPO_RATIO)
+    parser.add_argument('--word-stats', action='store_true', help="also write the full per-word table")
+    parser.add_argument('--refined', action='store_true', help="use the boundaries from segment_refine.py")
+    args = parser.parse_args()
+
+    arrays = SegmentArrays(args.arrays_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("Computing word statistics...")
+    words = build_word_frame(arrays, args.surahs, args.reciters, args.refined)
+    ayahs = build_ayah_frame(words)
+    per_reciter, per_word = find_madd_candidates(words, args.min_tempo_ratio)
+
+    ayahs.to_csv(os.path.join(args.output_dir, 'ayah_stats.csv'), index=False)
+    per_reciter.to_csv(os.path.join(args.output_dir, 'madd_candidates_by_reciter.csv'), index=False)
+    per_word.to_csv(os.path.join(args.output_dir, 'madd_candidates.csv'), index=False)
+    if args.word_stats:
+        words.to_csv(os.path.join(args.output_dir, 'word_stats.csv'), index=False)
+
+    print(f"Words analysed: {len(words)} across {words['reciter'].nunique()} reciters")
+    print(f"Madd candidates: {len(per_reciter)} reciter-words, {len(per_word)} words")
+    print(f"Saved statistics to: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
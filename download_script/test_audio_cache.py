@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+import audio_cache
+from audio_cache import SAMPLE_RATE, get_pcm
+
+
+class GetPcmTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.source = os.path.join(self.directory, 'Ayah_001.wav')
+        samples = np.sin(np.linspace(0, 200, SAMPLE_RATE // 4)).astype(np.float32) * 0.5
+        sf.write(self.source, samples, SAMPLE_RATE, subtype='PCM_16')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self):
+        return get_pcm('husary', 1, 1, self.source, self.cache_dir)
+
+    def test_hit_maps_cached_entry(self):
+        first = np.array(self.get())
+        with mock.patch('audio_cache.decode_audio') as decode:
+            np.testing.assert_array_equal(self.get(), first)
+        decode.assert_not_called()
+
+    def test_entry_evicted_between_check_and_load(self):
+        expected = np.array(self.get())
+        real_load_pcm = audio_cache.load_pcm
+        evicted = []
+
+        def load_after_eviction(path):
+            if not evicted:
+                os.remove(path)
+                evicted.append(path)
+            return real_load_pcm(path)
+
+        with mock.patch('audio_cache.load_pcm', side_effect=load_after_eviction):
+            pcm = self.get()
+        self.assertEqual(len(evicted), 1)
+        np.testing.assert_array_equal(pcm, expected)
+        self.assertTrue(os.path.exists(evicted[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from downloader import create_session, download_file
+
+BODY = bytes(range(256)) * 64
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves BODY with Range support; the first `failures` requests get `failure_status`."""
+
+    failures = 0
+    failure_status = 503
+    requests_seen = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests_seen.append(self.headers.get('Range'))
+        if cls.failures:
+            cls.failures -= 1
+            self.send_response(cls.failure_status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(BODY):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(BODY)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(BODY) - 1}/{len(BODY)}')
+            body = BODY[start:]
+        else:
+            self.send_response(200)
+            body = BODY
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class DownloadFileTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/ayah.mp3'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInHandler.failures = 0
+        StandInHandler.failure_status = 503
+        StandInHandler.requests_seen = []
+        self.directory = tempfile.mkdtemp()
+        self.dest = os.path.join(self.directory, 'ayah.mp3')
+        self.session = create_session(1)
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.directory)
+
+    def write_part(self, data):
+        with open(self.dest + '.part', 'wb') as f:
+            f.write(data)
+
+    def read_dest(self):
+        with open(self.dest, 'rb') as f:
+            return f.read()
+
+    def test_resumes_from_part_file(self):
+        self.write_part(BODY[:1000])
+        self.assertEqual(download_file(self.session, self.url, self.dest), 'downloaded')
+        self.assertEqual(self.read_dest(), BODY)
+        self.assertEqual(StandInHandler.requests_seen, ['bytes=1000-'])
+
+    def test_416_with_complete_part_file(self):
+        self.write_part(BODY)
+        self.assertEqual(download_file(self.session, self.url, self.dest), 'downloaded')
+        self.assertEqual(self.read_dest(), BODY)
+        self.assertEqual(StandInHandler.requests_seen, [f'bytes={len(BODY)}-'])
+
+    def test_416_with_oversized_part_file_restarts(self):
+        self.write_part(BODY + b'garbage')
+        with mock.patch('downloader.time.sleep'):
+            self.assertEqual(download_file(self.session, self.url, self.dest), 'downloaded')
+        self.assertEqual(self.read_dest(), BODY)
+        self.assertEqual(StandInHandler.requests_seen, [f'bytes={len(BODY) + 7}-', None])
+
+    def test_backs_off_on_server_errors(self):
+        StandInHandler.failures = 2
+        with mock.patch('downloader.time.sleep') as sleep:
+            self.assertEqual(download_file(self.session, self.url, self.dest, backoff=0.5), 'downloaded')
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(self.read_dest(), BODY)
+
+    def test_gives_up_on_client_errors(self):
+        StandInHandler.failures = 1
+        StandInHandler.failure_status = 404
+        with mock.patch('downloader.time.sleep') as sleep:
+            self.assertEqual(download_file(self.session, self.url, self.dest), 'failed')
+        sleep.assert_not_called()
+        self.assertFalse(os.path.exists(self.dest))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import argparse
+import os
+import time
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from extract_timestamps import SURAH_NUMBER_TO_NAME, write_csv_rows
+from qul_source import iter_ayahs
+from reciters import BASE_PATH, RECITERS
+
+# Configuration
+EXPORT_DIR = os.path.join(BASE_PATH, 'extracted_timestamps')
+PARQUET_FILE = 'word_timestamps.parquet'
+CSV_FILE = 'word_timestamps.csv'
+# Rows per Parquet row group (and per batch held in memory)
+ROW_GROUP_ROWS = 100000
+
+# Strings repeated on every word of an ayah (or of the whole file) are
+# stored once per row group as dictionaries
+DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP_SCHEMA = pa.schema([
+    ('surah_number', pa.int16()),
+    ('surah_name', DICTIONARY),
+    ('ayah_number', pa.int16()),
+    ('reciter', DICTIONARY),
+    ('word_number', pa.int16()),
+    ('start_time_ms', pa.int32()),
+    ('end_time_ms', pa.int32()),
+    ('duration_ms', pa.int32()),
+    ('audio_url', DICTIONARY),
+])
+
+
+def iter_source_rows(reciter_keys=None, surah_numbers=None):
+    """
+    Yield one TIMESTAMP_COLUMNS tuple per word segment straight from the QUL
+    sources, reciter by reciter, without building the nested timestamps dict.
+    """
+    for reciter_key in reciter_keys or list(RECITERS):
+        reciter_info = RECITERS.get(reciter_key)
+        if reciter_info is None:
+            print(f"Warning: Unknown reciter '{reciter_key}', skipping.")
+            continue
+        if not os.path.exists(reciter_info['source']):
+            print(f"Warning: Source not found for {reciter_key}: {reciter_info['source']}")
+            continue
+        reciter = reciter_info['reciter_name']
+        for ayah_info in iter_ayahs(reciter_info['source'], surah_numbers):
+            surah_num = ayah_info["surah_number"]
+            ayah_num = ayah_info["ayah_number"]
+            surah_name = SURAH_NUMBER_TO_NAME.get(surah_num, f"Surah_{surah_num}")
+            audio_url = ayah_info.get("audio_url")
+            for word_num, start_time, end_time in ayah_info.get("segments", []):
+                yield (surah_num, surah_name, ayah_num, reciter, word_num,
+                       start_time, end_time, end_time - start_time, audio_url)
+
+
+def iter_record_batches(rows, batch_rows=ROW_GROUP_ROWS):
+    """Group row tuples into Arrow record batches of TIMESTAMP_SCHEMA."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_rows))
+        if not chunk:
+            return
+        columns = []
+        for field, values in zip(TIMESTAMP_SCHEMA, zip(*chunk)):
+            if pa.types.is_dictionary(field.type):
+                columns.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                columns.append(pa.array(values, type=field.type))
+        yield pa.RecordBatch.from_arrays(columns, schema=TIMESTAMP_SCHEMA)
+
+
+def write_parquet_rows(rows, output_file, row_group_rows=ROW_GROUP_ROWS):
+    """
+    Write TIMESTAMP_COLUMNS rows to Parquet, one row group per batch, so only
+    one batch is ever in memory. Returns the number of rows written.
+    """
+    temp_path = output_file + '.part'
+    written = 0
+    with pq.ParquetWriter(temp_path, TIMESTAMP_SCHEMA, compression='zstd') as writer:
+        for batch in iter_record_batches(rows, row_group_rows):
+            writer.write_batch(batch, row_group_size=row_group_rows)
+            written += batch.num_rows
+    os.replace(temp_path, output_file)
+    return written
+
+
+def read_timestamps(parquet_file=os.path.join(EXPORT_DIR, PARQUET_FILE), reciters=None, surah_numbers=None, columns=None):
+    """
+    Load the Parquet export as a pandas DataFrame. Reciter and surah filters
+    are pushed down to the reader, so row groups that cannot match are skipped.
+    """
+    filters = []
+    if reciters is not None:
+        filters.append(('reciter', 'in', [RECITERS[key]['reciter_name'] if key in RECITERS else key for key in reciters]))
+    if surah_numbers is not None:
+        filters.append(('surah_number', 'in', list(surah_numbers)))
+    return pq.read_table(parquet_file, columns=columns, filters=filters or None).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export word timestamps of every reciter as Parquet (and optionally CSV).")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every registered reciter)")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: the whole Quran)")
+    parser.add_argument('--output-dir', default=EXPORT_DIR)
+    parser.add_argument('--row-group-rows', type=int, default=ROW_GROUP_ROWS)
+    parser.add_argument('--csv', action='store_true', help=f"also write {CSV_FILE}")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    parquet_file = os.path.join(args.output_dir, PARQUET_FILE)
+    written = write_parquet_rows(iter_source_rows(args.reciters, args.surahs), parquet_file, args.row_group_rows)
+    print(f"Saved {written} word timestamps to: {parquet_file} ({time.perf_counter() - start:.1f} s, "
+          f"{os.path.getsize(parquet_file) / 1024 ** 2:.1f} MB)")
+
+    if args.csv:
+        csv_file = os.path.join(args.output_dir, CSV_FILE)
+        write_csv_rows(iter_source_rows(args.reciters, args.surahs), csv_file)
+        print(f"Saved timestamps CSV to: {csv_file} ({os.path.getsize(csv_file) / 1024 ** 2:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
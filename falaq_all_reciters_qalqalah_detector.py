@@ -1,7 +1,11 @@
 import json
-import re
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+
+from qalqalah_rules import QALQALAH_LETTERS, detect_qalqalah_strict, index_by_word, summarize_qalqalah
+from quran_text import load_surah_text
 
 # Configuration
 BASE_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script'
@@ -46,77 +50,24 @@ RECITERS = {
     }
 }
 
-# Surah Al-Falaq Arabic text (5 ayahs)
-FALAQ_TEXT = {
-    1: "قُلْ أَعُوذُ بِرَبِّ الْفَلَقِ",
-    2: "مِن شَرِّ مَا خَلَقَ",
-    3: "وَمِن شَرِّ غَاسِقٍ إِذَا وَقَبَ",
-    4: "وَمِن شَرِّ النَّفَّاثَاتِ فِي الْعُقَدِ",
-    5: "وَمِن شَرِّ حَاسِدٍ إِذَا حَسَدَ"
-}
-
-# Qalqalah letters: ق ط ب ج د
-QALQALAH_LETTERS = ['ق', 'ط', 'ب', 'ج', 'د']
+# Reciters are annotated in parallel, one worker process each
+MAX_WORKERS = min(len(RECITERS), os.cpu_count() or 1)
 
-def detect_qalqalah_strict(ayah_text, ayah_number):
+@lru_cache(maxsize=None)
+def build_text_annotations():
     """
-    Detect Qalqalah strictly according to Tajweed rules.
-    Focus on Qalqalah Kubra at end-of-ayah stopping.
-    Avoid false positives from Tanween letters.
+    Detect Qalqalah on the Al-Falaq text once.
+    The text is the same for every reciter, so workers receive this result
+    instead of re-running detection per reciter.
     """
-    qalqalah_instances = []
-    
-    # Split text into words
-    words = ayah_text.split()
-    
-    # Check the last word of the ayah for Qalqalah Kubra (stopping position)
-    last_word = words[-1]
-    
-    # Find the LAST Qalqalah letter in the last word (this is what becomes sakin when stopping)
-    last_qalqalah_position = -1
-    last_qalqalah_letter = None
-    
-    for i, char in enumerate(last_word):
-        if char in QALQALAH_LETTERS:
-            last_qalqalah_position = i
-            last_qalqalah_letter = char
-    
-    # Only add Qalqalah Kubra for the last Qalqalah letter in the word
-    if last_qalqalah_position >= 0:
-        qalqalah_instances.append({
-            'word': last_word,
-            'word_position': len(words),  # Last word
-            'letter': last_qalqalah_letter,
-            'letter_position': last_qalqalah_position,
-            'type': 'Qalqalah_Kubra',
-            'reason': f'Qalqalah letter {last_qalqalah_letter} at end of ayah {ayah_number} (stopping position - becomes sakin)',
-            'ayah_end': True,
-            'confidence': 'High'
-        })
-    
-    # Check for Qalqalah Sughra within words (only for letters with actual sukoon)
-    for word_index, word in enumerate(words, 1):
-        for i, char in enumerate(word):
-            if char in QALQALAH_LETTERS:
-                # Only consider if it's not the last word (already handled above)
-                if word_index < len(words):
-                    # Check if the letter has sukoon (ْ) or is followed by another consonant
-                    if i < len(word) - 1:
-                        next_char = word[i + 1]
-                        # Check for actual sukoon (ْ) or consonant (not vowel marks)
-                        if next_char == 'ْ' or next_char not in ['َ', 'ِ', 'ُ', 'ّ', 'ً', 'ٍ', 'ٌ']:
-                            qalqalah_instances.append({
-                                'word': word,
-                                'word_position': word_index,
-                                'letter': char,
-                                'letter_position': i,
-                                'type': 'Qalqalah_Sughra',
-                                'reason': f'Qalqalah letter {char} with sukoon within word',
-                                'ayah_end': False,
-                                'confidence': 'Medium'
-                            })
-    
-    return qalqalah_instances
+    text_annotations = {}
+    for ayah_num, arabic_text in load_surah_text(113).items():
+        text_annotations[ayah_num] = {
+            "arabic_text": arabic_text,
+            "words": arabic_text.split(),
+            "qalqalah_instances": detect_qalqalah_strict(arabic_text, ayah_num)
+        }
+    return text_annotations
 
 def load_timestamps(reciter_key):
     """Load the timestamps file for a specific reciter."""
@@ -172,11 +123,14 @@ def check_reciter_availability(reciter_key):
     
     return True
 
-def create_reciter_annotations(reciter_key):
+def create_reciter_annotations(reciter_key, text_annotations=None):
     """
     Create annotated dataset for a specific reciter.
+    text_annotations is the output of build_text_annotations (computed here if not given).
     """
     reciter_info = RECITERS[reciter_key]
+    if text_annotations is None:
+        text_annotations = build_text_annotations()
     
     # Load timestamps
     timestamps_data = load_timestamps(reciter_key)
@@ -221,22 +175,22 @@ def create_reciter_annotations(reciter_key):
             continue
         
         ayah_timestamps = timestamps_data["ayahs"][ayah_key]
-        arabic_text = FALAQ_TEXT[ayah_num]
         
         # Get local audio path
         local_audio_path = get_local_audio_path(reciter_key, ayah_num)
         
-        # Detect Qalqalah with strict logic
-        qalqalah_instances = detect_qalqalah_strict(arabic_text, ayah_num)
-        
-        # Split text into words for annotation
-        words = arabic_text.split()
+        # Text, words and Qalqalah (strict logic) are shared by all reciters
+        text_annotation = text_annotations[ayah_num]
+        arabic_text = text_annotation["arabic_text"]
+        words = text_annotation["words"]
+        qalqalah_instances = text_annotation["qalqalah_instances"]
         
         # Process each word
+        qalqalah_by_word = index_by_word(qalqalah_instances)
         word_annotations = []
         for word_index, word_text in enumerate(words, 1):
-            # Find Qalqalah instances for this word
-            word_qalqalah = [inst for inst in qalqalah_instances if inst['word'] == word_text]
+            # Qalqalah instances for this word, joined on its position in the ayah
+            word_qalqalah = qalqalah_by_word.get(word_index, [])
             
             # Determine if this word has Qalqalah
             has_qalqalah = len(word_qalqalah) > 0
@@ -268,14 +222,8 @@ def create_reciter_annotations(reciter_key):
             "segments": ayah_timestamps.get("segments", []),
             "reciter": reciter_info['display_name'],
             "words": word_annotations,
-            "total_qalqalah_words": sum(1 for word in word_annotations if word["has_qalqalah"]),
-            "qalqalah_summary": {
-                "total_occurrences": len(qalqalah_instances),
-                "words_with_qalqalah": list(set([word["word_text"] for word in word_annotations if word["has_qalqalah"]])),
-                "qalqalah_kubra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']),
-                "qalqalah_sughra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Sughra']),
-                "primary_targets": list(set([inst['word'] for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']))
-            }
+            "total_qalqalah_words": len(qalqalah_by_word),
+            "qalqalah_summary": summarize_qalqalah(qalqalah_instances)
         }
         
         annotations["ayahs"][ayah_key] = ayah_annotation
@@ -294,6 +242,18 @@ def save_annotations(annotations, reciter_key):
         print(f"❌ Error saving annotations for {reciter_key}: {e}")
         return None
 
+def process_reciter(reciter_key, text_annotations):
+    """
+    Worker: check availability, annotate and save one reciter.
+    Returns (reciter_key, available, output_file, annotations).
+    """
+    if not check_reciter_availability(reciter_key):
+        return reciter_key, False, None, None
+    
+    annotations = create_reciter_annotations(reciter_key, text_annotations)
+    output_file = save_annotations(annotations, reciter_key) if annotations else None
+    return reciter_key, True, output_file, annotations
+
 def print_reciter_summary(annotations, reciter_key):
     """Print a summary for a specific reciter."""
     if not annotations:
@@ -342,33 +302,31 @@ def main():
     print("🎯 PROCESSING ALL RECITERS FOR SURAH AL-FALAQ QALQALAH DETECTION")
     print("=" * 80)
     
-    # Check availability for each reciter
-    available_reciters = []
-    for reciter_key in RECITERS.keys():
-        if check_reciter_availability(reciter_key):
-            available_reciters.append(reciter_key)
+    # Detect Qalqalah on the text once, then fan the reciters out to workers
+    text_annotations = build_text_annotations()
+    
+    print(f"\n🎵 Processing {len(RECITERS)} reciters with {MAX_WORKERS} worker processes...")
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(process_reciter, reciter_key, text_annotations) for reciter_key in RECITERS]
+        outcomes = [future.result() for future in futures]
+    
+    # Report in registry order
+    for reciter_key, available, _, _ in outcomes:
+        if available:
             print(f"✅ {RECITERS[reciter_key]['display_name']} - Available")
         else:
             print(f"❌ {RECITERS[reciter_key]['display_name']} - Not available")
     
-    if not available_reciters:
+    if not any(available for _, available, _, _ in outcomes):
         print("\n❌ No reciters available. Please check your audio files and timestamps.")
         return
     
-    print(f"\n🎵 Processing {len(available_reciters)} available reciters...")
-    
-    # Process each available reciter
     results = []
-    for reciter_key in available_reciters:
-        print(f"\n🔄 Processing {RECITERS[reciter_key]['display_name']}...")
-        
-        # Create annotations
-        annotations = create_reciter_annotations(reciter_key)
+    for reciter_key, available, output_file, annotations in outcomes:
+        if not available:
+            continue
         
         if annotations:
-            # Save annotations
-            output_file = save_annotations(annotations, reciter_key)
-            
             # Print summary
             result = print_reciter_summary(annotations, reciter_key)
             if result:
@@ -1,98 +1,41 @@
 import json
-import re
+import os
+import sys
 from datetime import datetime
 
+from qalqalah_rules import QALQALAH_LETTERS, detect_qalqalah_strict, index_by_word, summarize_qalqalah
+from quran_text import get_ayah_text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from corpus_store import CORPUS_DB_PATH, open_corpus_store, get_surah
+from qul_source import iter_ayahs
+
 # Configuration
 JSON_FILE_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script\ayah-recitation-mahmoud-khalil-al-husary-murattal-hafs-957.json'
+RECITER_KEY = 'husary'
 OUTPUT_FILE = 'falaq_tajweed_annotations.json'
 
-# Surah Al-Falaq Arabic text (5 ayahs)
-FALAQ_TEXT = {
-    1: "قُلْ أَعُوذُ بِرَبِّ الْفَلَقِ",
-    2: "مِن شَرِّ مَا خَلَقَ",
-    3: "وَمِن شَرِّ غَاسِقٍ إِذَا وَقَبَ",
-    4: "وَمِن شَرِّ النَّفَّاثَاتِ فِي الْعُقَدِ",
-    5: "وَمِن شَرِّ حَاسِدٍ إِذَا حَسَدَ"
-}
-
-# Qalqalah letters: ق ط ب ج د
-QALQALAH_LETTERS = ['ق', 'ط', 'ب', 'ج', 'د']
-
-def detect_qalqalah_strict(ayah_text, ayah_number):
-    """
-    Detect Qalqalah strictly according to Tajweed rules.
-    Focus on Qalqalah Kubra at end-of-ayah stopping.
-    Avoid false positives from Tanween letters.
-    """
-    qalqalah_instances = []
-    
-    # Split text into words
-    words = ayah_text.split()
-    
-    # Check the last word of the ayah for Qalqalah Kubra (stopping position)
-    last_word = words[-1]
-    
-    # Find the LAST Qalqalah letter in the last word (this is what becomes sakin when stopping)
-    last_qalqalah_position = -1
-    last_qalqalah_letter = None
-    
-    for i, char in enumerate(last_word):
-        if char in QALQALAH_LETTERS:
-            last_qalqalah_position = i
-            last_qalqalah_letter = char
-    
-    # Only add Qalqalah Kubra for the last Qalqalah letter in the word
-    if last_qalqalah_position >= 0:
-        qalqalah_instances.append({
-            'word': last_word,
-            'word_position': len(words),  # Last word
-            'letter': last_qalqalah_letter,
-            'letter_position': last_qalqalah_position,
-            'type': 'Qalqalah_Kubra',
-            'reason': f'Qalqalah letter {last_qalqalah_letter} at end of ayah {ayah_number} (stopping position - becomes sakin)',
-            'ayah_end': True,
-            'confidence': 'High'
-        })
-    
-    # Check for Qalqalah Sughra within words (only for letters with actual sukoon)
-    for word_index, word in enumerate(words, 1):
-        for i, char in enumerate(word):
-            if char in QALQALAH_LETTERS:
-                # Only consider if it's not the last word (already handled above)
-                if word_index < len(words):
-                    # Check if the letter has sukoon (ْ) or is followed by another consonant
-                    if i < len(word) - 1:
-                        next_char = word[i + 1]
-                        # Check for actual sukoon (ْ) or consonant (not vowel marks)
-                        if next_char == 'ْ' or next_char not in ['َ', 'ِ', 'ُ', 'ّ', 'ً', 'ٍ', 'ٌ']:
-                            qalqalah_instances.append({
-                                'word': word,
-                                'word_position': word_index,
-                                'letter': char,
-                                'letter_position': i,
-                                'type': 'Qalqalah_Sughra',
-                                'reason': f'Qalqalah letter {char} with sukoon within word',
-                                'ayah_end': False,
-                                'confidence': 'Medium'
-                            })
-    
-    return qalqalah_instances
-
 def extract_falaq_data(json_file_path):
     """
-    Extract Surah Al-Falaq data from the JSON file.
+    Extract Surah Al-Falaq data.
+    Uses the indexed corpus store when it has been built (download_script/corpus_store.py)
+    and falls back to streaming the JSON file otherwise.
     """
+    if os.path.exists(CORPUS_DB_PATH):
+        conn = open_corpus_store(CORPUS_DB_PATH)
+        try:
+            ayahs = get_surah(conn, 113, [RECITER_KEY]).get(RECITER_KEY)
+        finally:
+            conn.close()
+        if ayahs:
+            return {str(ayah_num): ayah_data for ayah_num, ayah_data in ayahs.items()}
+
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         falaq_data = {}
         
         # Extract ayahs 113:1 to 113:5
-        for ayah_num in range(1, 6):
-            key = f"113:{ayah_num}"
-            if key in data:
-                falaq_data[str(ayah_num)] = data[key]
+        for ayah_info in iter_ayahs(json_file_path, [113]):
+            falaq_data[str(ayah_info["ayah_number"])] = ayah_info
         
         return falaq_data
     
@@ -150,7 +93,7 @@ def create_falaq_annotations():
             continue
         
         ayah_data = falaq_data[ayah_key]
-        arabic_text = FALAQ_TEXT[ayah_num]
+        arabic_text = get_ayah_text(113, ayah_num)
         
         # Detect Qalqalah with strict logic
         qalqalah_instances = detect_qalqalah_strict(arabic_text, ayah_num)
@@ -159,10 +102,11 @@ def create_falaq_annotations():
         words = arabic_text.split()
         
         # Process each word
+        qalqalah_by_word = index_by_word(qalqalah_instances)
         word_annotations = []
         for word_index, word_text in enumerate(words, 1):
-            # Find Qalqalah instances for this word
-            word_qalqalah = [inst for inst in qalqalah_instances if inst['word'] == word_text]
+            # Qalqalah instances for this word, joined on its position in the ayah
+            word_qalqalah = qalqalah_by_word.get(word_index, [])
             
             # Determine if this word has Qalqalah
             has_qalqalah = len(word_qalqalah) > 0
@@ -192,14 +136,8 @@ def create_falaq_annotations():
             "arabic_text": arabic_text,
             "segments": ayah_data.get("segments", []),
             "words": word_annotations,
-            "total_qalqalah_words": sum(1 for word in word_annotations if word["has_qalqalah"]),
-            "qalqalah_summary": {
-                "total_occurrences": len(qalqalah_instances),
-                "words_with_qalqalah": list(set([word["word_text"] for word in word_annotations if word["has_qalqalah"]])),
-                "qalqalah_kubra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']),
-                "qalqalah_sughra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Sughra']),
-                "primary_targets": list(set([inst['word'] for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']))
-            }
+            "total_qalqalah_words": len(qalqalah_by_word),
+            "qalqalah_summary": summarize_qalqalah(qalqalah_instances)
         }
         
         annotations["ayahs"][ayah_key] = ayah_annotation
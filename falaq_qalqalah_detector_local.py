@@ -1,86 +1,16 @@
 import json
-import re
 import os
 from datetime import datetime
 
+from qalqalah_rules import QALQALAH_LETTERS, detect_qalqalah_strict, index_by_word, summarize_qalqalah
+from quran_text import get_ayah_text
+
 # Configuration
 JSON_FILE_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script\ayah-recitation-mahmoud-khalil-al-husary-murattal-hafs-957.json'
 TIMESTAMPS_FILE_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script\extracted_timestamps\husary_by_surah\113_Al-Falaq_timestamps.json'
 AUDIO_BASE_PATH = r'C:\Users\noobd\Desktop\TAJWEED AI\download_script\downloaded_quran_audio_direct\113_Al-Falaq'
 OUTPUT_FILE = 'falaq_tajweed_annotations_local.json'
 
-# Surah Al-Falaq Arabic text (5 ayahs)
-FALAQ_TEXT = {
-    1: "قُلْ أَعُوذُ بِرَبِّ الْفَلَقِ",
-    2: "مِن شَرِّ مَا خَلَقَ",
-    3: "وَمِن شَرِّ غَاسِقٍ إِذَا وَقَبَ",
-    4: "وَمِن شَرِّ النَّفَّاثَاتِ فِي الْعُقَدِ",
-    5: "وَمِن شَرِّ حَاسِدٍ إِذَا حَسَدَ"
-}
-
-# Qalqalah letters: ق ط ب ج د
-QALQALAH_LETTERS = ['ق', 'ط', 'ب', 'ج', 'د']
-
-def detect_qalqalah_strict(ayah_text, ayah_number):
-    """
-    Detect Qalqalah strictly according to Tajweed rules.
-    Focus on Qalqalah Kubra at end-of-ayah stopping.
-    Avoid false positives from Tanween letters.
-    """
-    qalqalah_instances = []
-    
-    # Split text into words
-    words = ayah_text.split()
-    
-    # Check the last word of the ayah for Qalqalah Kubra (stopping position)
-    last_word = words[-1]
-    
-    # Find the LAST Qalqalah letter in the last word (this is what becomes sakin when stopping)
-    last_qalqalah_position = -1
-    last_qalqalah_letter = None
-    
-    for i, char in enumerate(last_word):
-        if char in QALQALAH_LETTERS:
-            last_qalqalah_position = i
-            last_qalqalah_letter = char
-    
-    # Only add Qalqalah Kubra for the last Qalqalah letter in the word
-    if last_qalqalah_position >= 0:
-        qalqalah_instances.append({
-            'word': last_word,
-            'word_position': len(words),  # Last word
-            'letter': last_qalqalah_letter,
-            'letter_position': last_qalqalah_position,
-            'type': 'Qalqalah_Kubra',
-            'reason': f'Qalqalah letter {last_qalqalah_letter} at end of ayah {ayah_number} (stopping position - becomes sakin)',
-            'ayah_end': True,
-            'confidence': 'High'
-        })
-    
-    # Check for Qalqalah Sughra within words (only for letters with actual sukoon)
-    for word_index, word in enumerate(words, 1):
-        for i, char in enumerate(word):
-            if char in QALQALAH_LETTERS:
-                # Only consider if it's not the last word (already handled above)
-                if word_index < len(words):
-                    # Check if the letter has sukoon (ْ) or is followed by another consonant
-                    if i < len(word) - 1:
-                        next_char = word[i + 1]
-                        # Check for actual sukoon (ْ) or consonant (not vowel marks)
-                        if next_char == 'ْ' or next_char not in ['َ', 'ِ', 'ُ', 'ّ', 'ً', 'ٍ', 'ٌ']:
-                            qalqalah_instances.append({
-                                'word': word,
-                                'word_position': word_index,
-                                'letter': char,
-                                'letter_position': i,
-                                'type': 'Qalqalah_Sughra',
-                                'reason': f'Qalqalah letter {char} with sukoon within word',
-                                'ayah_end': False,
-                                'confidence': 'Medium'
-                            })
-    
-    return qalqalah_instances
-
 def load_timestamps():
     """Load the local timestamps file."""
     try:
@@ -153,7 +83,7 @@ def create_falaq_annotations_local():
             continue
         
         ayah_timestamps = timestamps_data["ayahs"][ayah_key]
-        arabic_text = FALAQ_TEXT[ayah_num]
+        arabic_text = get_ayah_text(113, ayah_num)
         
         # Get local audio path
         local_audio_path = get_local_audio_path(ayah_num)
@@ -165,10 +95,11 @@ def create_falaq_annotations_local():
         words = arabic_text.split()
         
         # Process each word
+        qalqalah_by_word = index_by_word(qalqalah_instances)
         word_annotations = []
         for word_index, word_text in enumerate(words, 1):
-            # Find Qalqalah instances for this word
-            word_qalqalah = [inst for inst in qalqalah_instances if inst['word'] == word_text]
+            # Qalqalah instances for this word, joined on its position in the ayah
+            word_qalqalah = qalqalah_by_word.get(word_index, [])
             
             # Determine if this word has Qalqalah
             has_qalqalah = len(word_qalqalah) > 0
@@ -200,14 +131,8 @@ def create_falaq_annotations_local():
             "segments": ayah_timestamps.get("segments", []),
             "reciter": ayah_timestamps.get("reciter", "Husary"),
             "words": word_annotations,
-            "total_qalqalah_words": sum(1 for word in word_annotations if word["has_qalqalah"]),
-            "qalqalah_summary": {
-                "total_occurrences": len(qalqalah_instances),
-                "words_with_qalqalah": list(set([word["word_text"] for word in word_annotations if word["has_qalqalah"]])),
-                "qalqalah_kubra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']),
-                "qalqalah_sughra_count": len([inst for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Sughra']),
-                "primary_targets": list(set([inst['word'] for inst in qalqalah_instances if inst['type'] == 'Qalqalah_Kubra']))
-            }
+            "total_qalqalah_words": len(qalqalah_by_word),
+            "qalqalah_summary": summarize_qalqalah(qalqalah_instances)
         }
         
         annotations["ayahs"][ayah_key] = ayah_annotation
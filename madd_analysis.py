@@ -0,0 +1,201 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from alignment_index import ALIGNMENT_INDEX_PATH, load_alignment_index
+from quran_text import get_word_spans
+from quran_tokens import MADDAH, load_ayah_tokens
+from tajweed_rules import annotate_surahs
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+MADD_TABLE_PATH = os.path.join(BASE_PATH, 'madd_durations.csv')
+# Lengths a madd is held for, in harakat
+MADD_COUNTS = np.array([2, 4, 5, 6])
+# Estimates outside this range (in harakat) are segmentation errors, not madds
+MADD_COUNT_RANGE = (1.0, 7.0)
+# Words with any of these rules hold a sound longer than one harakah per
+# syllable, so they are left out of the harakah-unit estimate
+HELD_RULES = ('Madd', 'Ghunnah', 'Idgham', 'Ikhfa', 'Iqlab')
+# Fewer short-vowel words than this and the reciter gets no harakah unit
+MIN_UNIT_WORDS = 50
+
+
+def find_madd_words(tokens, annotations):
+    """
+    {(surah, ayah, word): (madd count, has maddah)} for every word with a Madd
+    instance. A letter followed by a madd letter carrying the maddah sign is
+    one elongation, not two.
+    """
+    madd_words = {}
+    for key, instances in annotations.items():
+        ayah_tokens = tokens[key]
+        token_index = {(word, position): i for i, (word, position)
+                       in enumerate(zip(ayah_tokens.words, ayah_tokens.positions))}
+        madd_tokens = {token_index[(inst['word_position'], inst['letter_position'])]
+                       for inst in instances if inst['type'] == 'Madd'}
+        for i in sorted(madd_tokens):
+            has_maddah = bool(ayah_tokens.marks[i] & MADDAH)
+            if i + 1 in madd_tokens and ayah_tokens.marks[i + 1] & MADDAH:
+                continue
+            count, maddah = madd_words.get((*key, ayah_tokens.words[i]), (0, False))
+            madd_words[(*key, ayah_tokens.words[i])] = (count + 1, maddah or has_maddah)
+    return madd_words
+
+
+def held_words(annotations):
+    """Set of (surah, ayah, word) with any of HELD_RULES."""
+    return {(*key, inst['word_position']) for key, instances in annotations.items()
+            for inst in instances if inst['type'] in HELD_RULES}
+
+
+def qul_words(keys, whole=False):
+    """
+    {(surah, ayah, text word): [QUL word, ...]} for keys of text words. By
+    default only words that are one QUL word each are kept; with whole, a
+    joined word (يٰٓأَيُّهَا) maps to both of its QUL words. Ayahs that cannot
+    be lined up with QUL are left out.
+    """
+    spans, words = {}, {}
+    for surah_number, ayah_number, word in keys:
+        if (surah_number, ayah_number) not in spans:
+            spans[(surah_number, ayah_number)] = get_word_spans(surah_number, ayah_number) or []
+        ayah_spans = spans[(surah_number, ayah_number)]
+        if word > len(ayah_spans):
+            continue
+        first, last = ayah_spans[word - 1]
+        if first == last or whole:
+            words[(surah_number, ayah_number, word)] = list(range(first, last + 1))
+    return words
+
+
+def _rows(alignment, keys):
+    """Alignment rows of (surah, ayah, QUL word) keys, as an int array."""
+    keys = np.array(list(keys), dtype=np.int64).reshape(-1, 3)
+    return alignment.ayah_first[keys[:, 0], keys[:, 1]].astype(np.int64) + keys[:, 2] - 1, keys
+
+
+def estimate_harakah_units(alignment, annotations, min_words=MIN_UNIT_WORDS):
+    """
+    Each reciter's harakah unit in ms: the median duration per syllable of
+    words whose every syllable is a single short vowel (no HELD_RULES) and
+    that do not end an ayah. Placeholder segments (not alignment.measured)
+    are left out. NaN where fewer than min_words were found.
+    """
+    held = [(surah_number, ayah_number, qul_word) for (surah_number, ayah_number, _), words
+            in qul_words(held_words(annotations), whole=True).items() for qul_word in words]
+    rows, _ = _rows(alignment, held)
+    short = alignment.syllables > 0
+    short[rows] = False
+    last_words = alignment.ayah_first + alignment.word_count - 1
+    short[last_words[alignment.word_count > 0]] = False
+
+    start, end = alignment.start_ms[short], alignment.end_ms[short]
+    per_syllable = np.where(alignment.measured[short], end - start, np.nan) / alignment.syllables[short, None]
+    found = (~np.isnan(per_syllable)).sum(axis=0)
+
+    units = np.full(len(alignment.reciters), np.nan)
+    enough = found >= min_words
+    units[enough] = np.nanmedian(per_syllable[:, enough], axis=0)
+    return units, found
+
+
+def classify_counts(counts):
+    """
+    Nearest of MADD_COUNTS for each estimated count, 0 (unmeasured) where
+    there is no estimate or it falls outside MADD_COUNT_RANGE.
+    """
+    nearest = MADD_COUNTS[np.abs(np.nan_to_num(counts, nan=-100)[..., None] - MADD_COUNTS).argmin(axis=-1)]
+    with np.errstate(invalid='ignore'):
+        in_range = (counts >= MADD_COUNT_RANGE[0]) & (counts <= MADD_COUNT_RANGE[1])
+    return np.where(in_range, nearest, 0)
+
+
+def build_madd_table(alignment, tokens, annotations, units):
+    """
+    One row per (reciter, madd word) with the word's measured length in
+    harakat (units from estimate_harakah_units), classified into MADD_COUNTS.
+
+    A word of s syllables takes s harakat when nothing is lengthened; each
+    natural madd adds one, and the longest madd adds the rest, so its count
+    is duration / unit - s + 1 - (other madds in the word). All reciters and
+    words are computed in one pass over the (words, reciters) matrices.
+
+    Only words that are one QUL word each are measured (see qul_words), and
+    placeholder segments (not alignment.measured) are left out of the table.
+    """
+    madd_words = find_madd_words(tokens, annotations)
+    qul_word = qul_words(madd_words)
+
+    keys_list = sorted(qul_word)
+    rows, _ = _rows(alignment, [(surah, ayah, qul_word[(surah, ayah, word)][0]) for surah, ayah, word in keys_list])
+    keys = np.array(keys_list, dtype=np.int64).reshape(-1, 3)
+    madd_count = np.array([madd_words[key][0] for key in keys_list])
+    has_maddah = np.array([madd_words[key][1] for key in keys_list], dtype=bool)
+    syllables = alignment.syllables[rows].astype(np.float64)
+
+    start, end = alignment.start_ms[rows], alignment.end_ms[rows]
+    present = alignment.measured[rows]
+    duration = np.where(present, end - start, np.nan).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        held = duration / units - syllables[:, None] + 1 - (madd_count[:, None] - 1)
+    classified = classify_counts(held)
+
+    word_rows, reciter_ids = np.nonzero(present)
+    word_texts = [tokens[(surah, ayah)].word_texts[word - 1] for surah, ayah, word in keys_list]
+    ayah_final = np.array([word == len(tokens[(surah, ayah)].word_texts) for surah, ayah, word in keys_list], dtype=bool)
+    table = pd.DataFrame({
+        'reciter': pd.Categorical(np.array(alignment.reciters)[reciter_ids], categories=alignment.reciters),
+        'surah': keys[word_rows, 0],
+        'ayah': keys[word_rows, 1],
+        'word': keys[word_rows, 2],
+        'word_text': np.array(word_texts, dtype=object)[word_rows],
+        'madd_letters': madd_count[word_rows],
+        'has_maddah': has_maddah[word_rows],
+        'ayah_final': ayah_final[word_rows],
+        'syllables': syllables[word_rows].astype(np.int64),
+        'duration_ms': duration[word_rows, reciter_ids].astype(np.int64),
+        'harakah_ms': np.round(units[reciter_ids], 1),
+        'estimated_counts': np.round(held[word_rows, reciter_ids], 2),
+        'madd_counts': classified[word_rows, reciter_ids]
+    })
+    return table
+
+
+def summarize(table):
+    """Per reciter: how many madd words fell in each count class, split by maddah sign."""
+    return table.pivot_table(index=['reciter', 'has_maddah'], columns='madd_counts', values='word',
+                             aggfunc='size', fill_value=0, observed=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long every reciter holds each madd.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every surah with text)")
+    parser.add_argument('--alignment', default=ALIGNMENT_INDEX_PATH, help="alignment index (built if missing)")
+    parser.add_argument('--output', default=MADD_TABLE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    alignment = load_alignment_index(args.alignment)
+    tokens = load_ayah_tokens()
+    annotations = annotate_surahs()
+    # The harakah unit is always estimated from the whole text
+    units, found = estimate_harakah_units(alignment, annotations)
+    if args.surahs:
+        annotations = {key: value for key, value in annotations.items() if key[0] in args.surahs}
+    table = build_madd_table(alignment, tokens, annotations, units)
+    table.to_csv(args.output, index=False)
+    elapsed = time.perf_counter() - start
+
+    for reciter_key, unit, words in zip(alignment.reciters, units, found):
+        print(f"  {reciter_key}: harakah {unit:.0f} ms (from {words} short-vowel words)")
+    print(summarize(table).to_string())
+    print(f"Measured {len(table)} madd words in {elapsed:.1f} s")
+    print(f"Saved madd table to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
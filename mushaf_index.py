@@ -0,0 +1,342 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from qul_source import iter_ayahs
+from reciters import RECITERS
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BASE_PATH, 'other downloads', 'pages')
+MUSHAF_INDEX_PATH = os.path.join(BASE_PATH, 'mushaf_index.json')
+MUSHAF_INDEX_VERSION = 3
+# QUL source whose segments give the expected number of words per ayah
+WORD_COUNT_RECITER = 'husary'
+MAX_WORKERS = os.cpu_count() or 1
+
+# The page fonts draw ayah numbers as private-use glyphs: U+F500 is 1,
+# U+F501 is 2, ... up to 286. Other private-use glyphs are ligatures and
+# decorations without a text equivalent and are dropped.
+AYAH_NUMBER_FIRST = 0xF500
+AYAH_NUMBER_LAST = AYAH_NUMBER_FIRST + 285
+_PRIVATE_USE = re.compile('[-]')
+_AYAH_NUMBER = re.compile(f'([{chr(AYAH_NUMBER_FIRST)}-{chr(AYAH_NUMBER_LAST)}])')
+_PARAGRAPH = re.compile(r'<w:p[ >].*?</w:p>', re.DOTALL)
+_TEXT_RUN = re.compile(r'<w:t(?: [^>]*)?>([^<]*)</w:t>')
+
+# The pages use the Indo-Pak spelling; these bring it to the letters the
+# rule engines expect (farsi yeh, the small high madda, and a voweled alef,
+# which is a hamza: bare alefs are hamzat al-wasl)
+FARSI_YEH = 'ی'
+REPLACEMENTS = {'ۤ': 'ٓ', 'ک': 'ك', 'ہ': 'ه', 'ۃ': 'ة'}
+HAMZA_ALEF = {'َ': 'أ', 'ُ': 'أ', 'ِ': 'إ'}
+# ...except the alef of a definite article that starts a sentence, which is
+# voweled too (اَللّٰهُ, اَلْحَيُّ, اَلَّذِيْنَ) but still hamzat al-wasl. It is
+# told apart from the Quran's words with a real hamza before lam (أَلَمْ,
+# أَلَّا, أَلْفَ, أَلْسِنَة, أَلْوَان, أَلْزَمْ, أَلْهٰى, أَلْحَقْ, أَلْقٰى) by what
+# follows the lam: a letter with shadda, the shadda of الَّذِيْ/الَّتِيْ, or a
+# sukun not starting one of those words
+WASL_ARTICLE = re.compile('^اَل(?:[ء-ي][ً-ِ]?ّ|(?:َّ|ّ[َٰ]?)[ذت]|ْ(?![فسوزه]|حَقْ|ق(?!َا)))')
+
+# QUL gives the vocative يا (and ها before أَنْتُمْ) a word number of its
+# own, where this mushaf writes it joined to the next word (يٰٓأَيُّهَا,
+# وَيٰقَوْمِ); the vocative is followed by a word of at least two letters,
+# which keeps out يٰسٓ
+SPLIT_WORD = re.compile('^(?:وَ)?(?:يّ?ٰٓ?|هٰٓ(?=أ))(?=[ء-يٱ]\\S*[ء-يٱ])')
+
+# This mushaf does not number the basmala of Al-Fatiha and splits its last
+# two ayahs differently, so its Fatiha cannot be mapped onto the Hafs count
+SKIPPED_SURAHS = (1,)
+
+
+def normalize_word(word):
+    """Indo-Pak word -> standard Arabic code points (yeh / alef maksura, hamza, maddah)."""
+    chars = []
+    wasl_article = WASL_ARTICLE.match(word) is not None
+    for i, char in enumerate(word):
+        char = REPLACEMENTS.get(char, char)
+        next_char = word[i + 1] if i + 1 < len(word) else ''
+        if char == FARSI_YEH:
+            # A bare yeh at the end of a word is an alef maksura
+            char = 'ى' if not next_char else 'ي'
+        elif char == 'ا' and not (i == 0 and wasl_article):
+            char = HAMZA_ALEF.get(next_char, char)
+        chars.append(char)
+    return ''.join(chars)
+
+
+def qul_word_count(word):
+    """Number of QUL words one word of this mushaf stands for (1, or 2 for SPLIT_WORD)."""
+    return 2 if SPLIT_WORD.match(word) else 1
+
+
+def _is_word(token):
+    """False for stand-alone pause and ayah-end signs (no base letter)."""
+    return any(unicodedata.category(char) == 'Lo' for char in token)
+
+
+def read_page(page_number, pages_dir=PAGES_DIR):
+    """
+    Split one page into chunks of words ending at an ayah number.
+
+    Returns [(words, ayah_number), ...] in reading order; the last chunk has
+    ayah_number None when the page ends in the middle of an ayah.
+    """
+    with zipfile.ZipFile(os.path.join(pages_dir, f"{page_number}.docx")) as docx:
+        xml = docx.read('word/document.xml').decode('utf-8')
+
+    # Every paragraph is one line of the page
+    text = ' '.join(''.join(_TEXT_RUN.findall(paragraph)) for paragraph in _PARAGRAPH.findall(xml))
+
+    chunks, words = [], []
+    for part in _AYAH_NUMBER.split(text):
+        if len(part) == 1 and AYAH_NUMBER_FIRST <= ord(part) <= AYAH_NUMBER_LAST:
+            chunks.append((words, ord(part) - AYAH_NUMBER_FIRST + 1))
+            words = []
+        else:
+            words.extend(normalize_word(token) for token in _PRIVATE_USE.sub('', part).split() if _is_word(token))
+    if words:
+        chunks.append((words, None))
+    return chunks
+
+
+def page_numbers(pages_dir=PAGES_DIR):
+    """Numbers of the page files in pages_dir, in order."""
+    numbers = []
+    for path in glob.glob(os.path.join(pages_dir, '*.docx')):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name.isdigit():
+            numbers.append(int(name))
+    return sorted(numbers)
+
+
+def load_word_counts(reciter_key=WORD_COUNT_RECITER):
+    """{(surah, ayah): number of words} from a QUL source, or {} if it is missing."""
+    source_path = RECITERS[reciter_key]['source']
+    if not os.path.exists(source_path):
+        print(f"Warning: {source_path} not found, ayah boundaries will not be checked against word counts")
+        return {}
+    counts = {}
+    for ayah_info in iter_ayahs(source_path):
+        segments = ayah_info.get("segments") or []
+        counts[(ayah_info["surah_number"], ayah_info["ayah_number"])] = max((segment[0] for segment in segments), default=0)
+    return counts
+
+
+def resync_boundaries(markers, expected, positions=None):
+    """
+    Choose where each ayah ends in a surah's word stream.
+
+    markers[k] is the number of words before the k-th ayah number glyph.
+    The page text sometimes puts the first word of the next ayah in front of
+    the glyph, so each end is either at the glyph or one word before it;
+    the choice that best matches the expected word counts wins (dynamic
+    programming over the surah, ties keep the glyph position). positions[n]
+    is the number of expected-count words before word n, when the two
+    count words differently (see qul_word_count).
+    """
+    if positions is None:
+        positions = range(max(markers, default=0) + 1)
+    # states: split point -> (cost, previous split point)
+    states = [{0: (0, None)}]
+    for marker, count in zip(markers, expected):
+        current = {}
+        for shift in (0, -1):
+            split = marker + shift
+            for previous, (cost, _) in states[-1].items():
+                if split < previous:
+                    continue
+                total = cost + abs(positions[split] - positions[previous] - count) + (0.01 if shift else 0)
+                if split not in current or total < current[split][0]:
+                    current[split] = (total, previous)
+        states.append(current)
+
+    split = min(states[-1], key=lambda point: states[-1][point][0])
+    splits = []
+    for state in reversed(states[1:]):
+        splits.append(split)
+        split = state[split][1]
+    return splits[::-1]
+
+
+def _word_stream(pages):
+    """
+    Every word of the mushaf in reading order, the page each one is on, and
+    each ayah number glyph as (ayah_number, number of words before it).
+    """
+    words, word_pages, glyphs = [], [], []
+    for page_number, chunks in pages:
+        for chunk_words, ayah_number in chunks:
+            words.extend(chunk_words)
+            word_pages.extend([page_number] * len(chunk_words))
+            if ayah_number is not None:
+                glyphs.append((ayah_number, len(words)))
+    return words, word_pages, glyphs
+
+
+def _number_ayahs(glyphs, counts):
+    """
+    Turn glyph numbers into (surah, ayah) keys; a new surah starts wherever
+    the numbering resets.
+
+    Some glyphs are missing (an ayah number drawn together with a sajdah
+    sign, often at the end of a surah). When word counts are known the
+    missing ayahs are added at their expected length after the previous
+    glyph; otherwise they are left out. Returns [((surah, ayah), marker)].
+    """
+    surah_lengths = {}
+    for surah_number, ayah_number in counts:
+        surah_lengths[surah_number] = max(surah_lengths.get(surah_number, 0), ayah_number)
+
+    keys = []
+    surah_number, previous, previous_marker = 1, 0, 0
+    for ayah_number, marker in glyphs:
+        missing = []
+        if ayah_number <= previous:
+            missing = [(surah_number, number) for number in range(previous + 1, surah_lengths.get(surah_number, 0) + 1)]
+            surah_number, previous = surah_number + 1, 0
+        missing += [(surah_number, number) for number in range(previous + 1, ayah_number)]
+
+        for key in missing:
+            if key not in counts:
+                break
+            previous_marker = min(previous_marker + counts[key], marker)
+            keys.append((key, previous_marker))
+        keys.append(((surah_number, ayah_number), marker))
+        previous, previous_marker = ayah_number, marker
+    return keys
+
+
+def build_mushaf_index(pages_dir=PAGES_DIR, workers=MAX_WORKERS, counts=None):
+    """
+    Extract every page in parallel and build the ayah and page indexes.
+
+    Returns {"ayahs": {"surah:ayah": text}, "pages": {page: ["surah:ayah", "surah:ayah"]},
+    "split_words": {"surah:ayah": [word, ...]}, "unmatched": ["surah:ayah", ...]}.
+    pages holds the first and last ayah that starts or ends on each page
+    (in the mushaf's own numbering for SKIPPED_SURAHS, whose text is left out).
+    split_words lists the (1-based) words of an ayah that are two QUL words,
+    and unmatched the ayahs whose words cannot be lined up with the QUL word
+    numbers at all (their QUL word count is different).
+    """
+    numbers = page_numbers(pages_dir)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pages = list(zip(numbers, executor.map(read_page, numbers, itertools.repeat(pages_dir), chunksize=16)))
+
+    counts = load_word_counts() if counts is None else counts
+    words, word_pages, glyphs = _word_stream(pages)
+    keys = _number_ayahs(glyphs, counts)
+    markers = [marker for _, marker in keys]
+    positions = list(itertools.accumulate((qul_word_count(word) for word in words), initial=0))
+    splits = resync_boundaries(markers, [counts.get(key, 0) for key, _ in keys], positions) if counts else markers
+
+    ayahs, page_ayahs, split_words, unmatched = {}, {}, {}, []
+    previous_key, start = None, 0
+    for (surah_number, ayah_number), end in zip((key for key, _ in keys), splits):
+        # Without word counts, an ayah after a missing glyph also holds the one before it
+        follows = ayah_number == 1 or previous_key == (surah_number, ayah_number - 1)
+        previous_key = (surah_number, ayah_number)
+        if end <= start or not follows:
+            start = max(start, end)
+            continue
+
+        key = f"{surah_number}:{ayah_number}"
+        if surah_number not in SKIPPED_SURAHS:
+            ayahs[key] = ' '.join(words[start:end])
+            splits_here = [i for i, word in enumerate(words[start:end], 1) if qul_word_count(word) > 1]
+            qul_count = counts.get((surah_number, ayah_number))
+            if qul_count is not None and qul_count != end - start + len(splits_here):
+                unmatched.append(key)
+            elif splits_here:
+                split_words[key] = splits_here
+        for page_number in (word_pages[start], word_pages[end - 1]):
+            page_ayahs.setdefault(page_number, []).append(key)
+        start = end
+
+    page_ranges = {str(page_number): [keys[0], keys[-1]] for page_number, keys in sorted(page_ayahs.items())}
+    return {"ayahs": ayahs, "pages": page_ranges, "split_words": split_words, "unmatched": unmatched}
+
+
+def _sources_signature(pages_dir):
+    """Name, size and mtime of every page file, so a stale index is rebuilt."""
+    return [[os.path.basename(path), os.path.getsize(path), int(os.path.getmtime(path))]
+            for path in sorted(glob.glob(os.path.join(pages_dir, '*.docx')))]
+
+
+def load_mushaf_index(index_path=MUSHAF_INDEX_PATH, pages_dir=PAGES_DIR, rebuild=False):
+    """
+    Return (ayah_texts, page_ranges, split_words):
+    ayah_texts   {(surah, ayah): text}
+    page_ranges  {page: ((surah, ayah), (surah, ayah))}
+    split_words  {(surah, ayah): (word, ...)} words that are two QUL words,
+                 None for an ayah that cannot be lined up with QUL at all
+
+    The index is built from the page files once and saved to index_path;
+    later calls only read that file. Returns ({}, {}, {}) if there are no pages.
+    """
+    signature = _sources_signature(pages_dir)
+    payload = None
+    if not rebuild and os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get("version") != MUSHAF_INDEX_VERSION or payload.get("sources") != signature:
+                payload = None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable mushaf index {index_path}: {e}")
+            payload = None
+
+    if payload is None:
+        if not signature:
+            return {}, {}, {}
+        payload = {"version": MUSHAF_INDEX_VERSION, "sources": signature}
+        payload.update(build_mushaf_index(pages_dir))
+        temp_path = index_path + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+
+    def parse_key(key):
+        surah_number, ayah_number = key.split(':')
+        return int(surah_number), int(ayah_number)
+
+    ayah_texts = {parse_key(key): text for key, text in payload["ayahs"].items()}
+    page_ranges = {int(page): (parse_key(first), parse_key(last)) for page, (first, last) in payload["pages"].items()}
+    split_words = {parse_key(key): tuple(words) for key, words in payload["split_words"].items()}
+    split_words.update({parse_key(key): None for key in payload["unmatched"]})
+    return ayah_texts, page_ranges, split_words
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ayah text index from the mushaf page .docx files.")
+    parser.add_argument('--pages-dir', default=PAGES_DIR)
+    parser.add_argument('--output', default=MUSHAF_INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ayah_texts, page_ranges, split_words = load_mushaf_index(args.output, args.pages_dir, rebuild=True)
+    elapsed = time.perf_counter() - start
+    if not ayah_texts:
+        print(f"No page files found in {args.pages_dir}")
+        return
+
+    surahs = {surah_number for surah_number, _ in ayah_texts}
+    print(f"Indexed {len(ayah_texts)} ayahs of {len(surahs)} surahs on {len(page_ranges)} pages in {elapsed:.1f} s")
+    unmatched = sorted(key for key, words in split_words.items() if words is None)
+    print(f"{len(split_words) - len(unmatched)} ayahs have words that QUL splits in two, "
+          f"{len(unmatched)} cannot be lined up with the QUL words: "
+          + ', '.join(f"{surah_number}:{ayah_number}" for surah_number, ayah_number in unmatched))
+    print(f"Saved mushaf index to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+from qalqalah_rules import annotate_qalqalah
+from quran_text import get_word_spans
+from quran_tokens import load_ayah_tokens
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from audio_features import (FEATURE_CACHE_DIR, HOP_LENGTH, SAMPLE_RATE, SurahFeatures, feature_cache_path,
+                            frame_to_ms, ms_to_frame)
+from reciters import RECITERS
+from segment_arrays import PLACEHOLDER_MAX_MS
+
+# Configuration
+SCORES_FILE = 'qalqalah_burst_scores.csv'
+ANNOTATION_FILE_PATTERN = 'falaq_tajweed_annotations_*.json'
+
+# Segments often run on into the silence after the ayah, so the word's
+# audible end is the last frame above this share of its peak RMS, looking
+# back at most SEARCH_MS from the segment end
+SILENCE_RATIO = 0.1
+SEARCH_MS = 1500
+# The final letter is searched for from this long before the audible end
+# until this long after it
+REGION_BEFORE_MS = 300
+REGION_AFTER_MS = 50
+# A burst is a rise in energy over the quietest frame in the preceding window
+DIP_MS = 80
+
+# burst_score (rise relative to the word's peak RMS) needed for each confidence
+HIGH_BURST_SCORE = 0.35
+MEDIUM_BURST_SCORE = 0.15
+
+FRAME_MS = HOP_LENGTH * 1000 / SAMPLE_RATE
+SEARCH_FRAMES = int(round(SEARCH_MS / FRAME_MS))
+REGION_FRAMES = int(round((REGION_BEFORE_MS + REGION_AFTER_MS) / FRAME_MS))
+DIP_FRAMES = max(1, int(round(DIP_MS / FRAME_MS)))
+
+
+def find_kubra_targets(surah_numbers=None):
+    """
+    [(surah, ayah, word_position, letter, QUL word)] for every Qalqalah Kubra
+    in the known text. Only word-final letters are kept, since the burst is
+    looked for at the end of the word's audio, which is the end of the last
+    QUL word the text word spans. Ayahs whose words cannot be lined up with
+    QUL are skipped.
+    """
+    ayah_tokens = load_ayah_tokens(surah_numbers)
+    targets = []
+    for (surah_number, ayah_number), instances in sorted(annotate_qalqalah(ayah_tokens).items()):
+        tokens = ayah_tokens[(surah_number, ayah_number)]
+        spans = get_word_spans(surah_number, ayah_number)
+        for inst in instances:
+            if inst['type'] != 'Qalqalah_Kubra':
+                continue
+            i = next(i for i in range(len(tokens)) if tokens.words[i] == inst['word_position']
+                     and tokens.positions[i] == inst['letter_position'])
+            if not tokens.is_word_end(i):
+                print(f"Warning: Skipping Kubra {surah_number}:{ayah_number} word {inst['word_position']}, "
+                      f"{inst['letter']} does not end the word")
+                continue
+            if spans is None:
+                print(f"Warning: Skipping Kubra {surah_number}:{ayah_number} word {inst['word_position']}, "
+                      f"the ayah's words do not line up with the QUL words")
+                continue
+            qul_word = spans[inst['word_position'] - 1][1]
+            targets.append((surah_number, ayah_number, inst['word_position'], inst['letter'], qul_word))
+    return targets
+
+
+def _gather_targets(targets, reciters, cache_dir):
+    """
+    Concatenate the cached RMS of every (reciter, surah) involved and turn
+    each target into absolute frame ranges in that one array. Targets whose
+    word segment is a QUL placeholder (PLACEHOLDER_MAX_MS or shorter) have
+    no real word end to search from and are left out.
+    """
+    surah_numbers = sorted({target[0] for target in targets})
+    rms_parts, rows = [], []
+    base = 0
+    for reciter_key in reciters:
+        for surah_number in surah_numbers:
+            if not os.path.exists(feature_cache_path(reciter_key, surah_number, cache_dir)):
+                continue
+            features = SurahFeatures(reciter_key, surah_number, cache_dir)
+            for target in targets:
+                if target[0] != surah_number:
+                    continue
+                word = features.word_frames(target[1], target[4])
+                ayah = features.ayah_frames(target[1])
+                if word is None or ayah is None or word[1] <= word[0]:
+                    continue
+                word_start_ms, word_end_ms = features.word_ms(target[1], target[4])
+                if word_end_ms - word_start_ms <= PLACEHOLDER_MAX_MS:
+                    continue
+                rows.append((reciter_key, target, base + word[0], base + word[1], base + ayah[0], base + ayah[1]))
+            rms_parts.append(features.rms)
+            base += len(features.rms)
+    rms = np.concatenate(rms_parts) if rms_parts else np.empty(0, dtype=np.float32)
+    return rms, rows
+
+
+def score_kubra_targets(targets, reciters=None, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Measure the release burst of every Kubra target for every reciter at once.
+
+    For each target the final-letter region is cut out of the cached RMS
+    envelope around the audible end of its word segment (all targets are
+    stacked into one matrix).
+    The burst score is the largest rise of RMS over the minimum of the
+    preceding DIP_MS, relative to the word's peak RMS; the burst time is
+    where that rise happens. Returns one dict per (reciter, target).
+    """
+    reciters = reciters or list(RECITERS)
+    rms, rows = _gather_targets(targets, reciters, cache_dir)
+    if not rows:
+        return []
+
+    word_start, word_end, ayah_start, ayah_end = (np.array([row[i] for row in rows], dtype=np.int64) for i in range(2, 6))
+
+    # Peak RMS of every word, in one reduceat over [start, end) pairs
+    bounds = np.column_stack([word_start, word_end]).ravel()
+    word_peak = np.maximum.reduceat(np.append(rms, 0.0), bounds)[::2]
+
+    peak = np.maximum(word_peak, 1e-9)[:, None]
+
+    # Audible end: last frame of the word above SILENCE_RATIO of its peak
+    search_index = word_end[:, None] - SEARCH_FRAMES + np.arange(SEARCH_FRAMES)[None, :]
+    voiced = (search_index >= word_start[:, None]) & (rms[np.maximum(search_index, 0)] / peak > SILENCE_RATIO)
+    last_voiced = SEARCH_FRAMES - 1 - voiced[:, ::-1].argmax(axis=1)
+    audible_end = np.where(voiced.any(axis=1), search_index[np.arange(len(rows)), last_voiced] + 1, word_end)
+
+    region_start = np.maximum(audible_end - ms_to_frame(REGION_BEFORE_MS), word_start)
+    region_end = np.minimum(region_start + REGION_FRAMES, ayah_end)
+    frame_index = region_start[:, None] + np.arange(REGION_FRAMES)[None, :]
+    valid = frame_index < region_end[:, None]
+    envelope = np.where(valid, rms[np.minimum(frame_index, len(rms) - 1)], np.nan) / peak
+
+    # Minimum of the DIP_FRAMES frames before each frame (the dip before the release)
+    padded = np.pad(np.where(valid, envelope, np.inf), ((0, 0), (DIP_FRAMES, 0)), constant_values=np.inf)
+    dip = np.lib.stride_tricks.sliding_window_view(padded, DIP_FRAMES, axis=1)[:, :REGION_FRAMES].min(axis=2)
+    rise = np.where(valid & np.isfinite(dip), envelope - dip, -np.inf)
+
+    burst_frame = rise.argmax(axis=1)
+    burst_score = np.maximum(rise[np.arange(len(rows)), burst_frame], 0.0)
+    burst_ms = frame_to_ms(region_start + burst_frame - ayah_start)
+
+    scores = []
+    for i, (reciter_key, (surah_number, ayah_number, word_position, letter, _), *_) in enumerate(rows):
+        if burst_score[i] >= HIGH_BURST_SCORE:
+            confidence = 'High'
+        elif burst_score[i] >= MEDIUM_BURST_SCORE:
+            confidence = 'Medium'
+        else:
+            confidence = 'Low'
+        scores.append({
+            'reciter': reciter_key,
+            'surah_number': surah_number,
+            'ayah_number': ayah_number,
+            'word_position': word_position,
+            'letter': letter,
+            'burst_score': round(float(burst_score[i]), 4),
+            'burst_time_ms': int(round(burst_ms[i])),
+            'word_end_ms': int(round(frame_to_ms(word_end[i] - ayah_start[i]))),
+            'measured_confidence': confidence
+        })
+    return scores
+
+
+def add_scores_to_annotations(annotations, scores):
+    """
+    Attach measured burst results to the Kubra details of an annotation file
+    written by falaq_all_reciters_qalqalah_detector.py. Returns how many were added.
+    """
+    reciter_key = annotations["metadata"].get("reciter_key")
+    surah_number = annotations["metadata"].get("surah_number")
+    by_target = {(score['ayah_number'], score['word_position']): score for score in scores
+                 if score['reciter'] == reciter_key and score['surah_number'] == surah_number}
+
+    added = 0
+    for ayah_key, ayah in annotations["ayahs"].items():
+        for word in ayah["words"]:
+            score = by_target.get((int(ayah_key), word["word_index"]))
+            if score is None:
+                continue
+            for detail in word["qalqalah_details"]:
+                if detail['type'] == 'Qalqalah_Kubra':
+                    detail['measured_confidence'] = score['measured_confidence']
+                    detail['burst_score'] = score['burst_score']
+                    detail['burst_time_ms'] = score['burst_time_ms']
+                    added += 1
+    return added
+
+
+def save_scores(scores, output_file):
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(scores[0].keys()), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Qalqalah Kubra release bursts from cached audio features.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every surah with text)")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every registered reciter)")
+    parser.add_argument('--cache-dir', default=FEATURE_CACHE_DIR)
+    parser.add_argument('--output', default=SCORES_FILE)
+    parser.add_argument('--annotations', nargs='*', help=f"annotation files to update (default: {ANNOTATION_FILE_PATTERN})")
+    args = parser.parse_args()
+
+    targets = find_kubra_targets(args.surahs)
+    scores = score_kubra_targets(targets, args.reciters, args.cache_dir)
+    if not scores:
+        print("No targets with cached audio features. Run download_script/audio_features.py first.")
+        return
+
+    save_scores(scores, args.output)
+    counts = {level: sum(1 for score in scores if score['measured_confidence'] == level) for level in ('High', 'Medium', 'Low')}
+    print(f"Scored {len(scores)} Qalqalah Kubra targets ({len(targets)} per reciter at most)")
+    print(f"  High: {counts['High']}, Medium: {counts['Medium']}, Low: {counts['Low']}")
+    print(f"Saved scores to: {args.output}")
+
+    for path in args.annotations if args.annotations is not None else sorted(glob.glob(ANNOTATION_FILE_PATTERN)):
+        with open(path, 'r', encoding='utf-8') as f:
+            annotations = json.load(f)
+        added = add_scores_to_annotations(annotations, scores)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(annotations, f, ensure_ascii=False, indent=2)
+        print(f"Added {added} measurements to {path}")
+
+
+if __name__ == "__main__":
+    main()
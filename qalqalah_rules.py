@@ -0,0 +1,145 @@
+import time
+
+from quran_tokens import VOWEL_BITS, load_ayah_tokens, tokenize_ayah
+
+# Qalqalah letters: ق ط ب ج د
+QALQALAH_LETTERS = ['ق', 'ط', 'ب', 'ج', 'د']
+QALQALAH_CODES = frozenset(ord(letter) for letter in QALQALAH_LETTERS)
+
+
+def detect_qalqalah_tokens(tokens, ayah_number):
+    """
+    Detect Qalqalah in one tokenized ayah (see quran_tokens.tokenize_ayah).
+    A single pass over the letters; the harakat mask of each letter says
+    whether it is sakin, however many marks are stacked on it.
+    """
+    qalqalah_instances = []
+    word_texts = tokens.word_texts
+    if not word_texts:
+        return qalqalah_instances
+    last_word_index = len(word_texts)
+
+    kubra = None
+    for i, code in enumerate(tokens.letters):
+        if code not in QALQALAH_CODES:
+            continue
+        word_index = tokens.words[i]
+
+        # Only a Qalqalah letter ending the last word becomes sakin when stopping
+        if word_index == last_word_index and tokens.is_word_end(i):
+            kubra = i
+            continue
+
+        # Qalqalah Sughra: no vowel on the letter, and it either carries a
+        # mark (sukoon) or is followed by another letter in the word
+        mask = tokens.marks[i]
+        if mask & VOWEL_BITS or (not mask and tokens.is_word_end(i)):
+            continue
+        letter = chr(code)
+        qalqalah_instances.append({
+            'word': word_texts[word_index - 1],
+            'word_position': word_index,
+            'letter': letter,
+            'letter_position': tokens.positions[i],
+            'type': 'Qalqalah_Sughra',
+            'reason': f'Qalqalah letter {letter} with sukoon within word',
+            'ayah_end': False,
+            'confidence': 'Medium'
+        })
+
+    if kubra is not None:
+        letter = chr(tokens.letters[kubra])
+        qalqalah_instances.insert(0, {
+            'word': word_texts[-1],
+            'word_position': last_word_index,  # Last word
+            'letter': letter,
+            'letter_position': tokens.positions[kubra],
+            'type': 'Qalqalah_Kubra',
+            'reason': f'Qalqalah letter {letter} at end of ayah {ayah_number} (stopping position - becomes sakin)',
+            'ayah_end': True,
+            'confidence': 'High'
+        })
+
+    return qalqalah_instances
+
+
+def detect_qalqalah_strict(ayah_text, ayah_number):
+    """
+    Detect Qalqalah strictly according to Tajweed rules.
+    Focus on Qalqalah Kubra at end-of-ayah stopping.
+    Avoid false positives from Tanween letters.
+    """
+    return detect_qalqalah_tokens(tokenize_ayah(ayah_text), ayah_number)
+
+
+def index_by_word(qalqalah_instances):
+    """
+    Group one ayah's instances by word_position, for joining them to words.
+    Joining on position (not word text) keeps repeated words apart.
+    """
+    by_word = {}
+    for inst in qalqalah_instances:
+        by_word.setdefault(inst['word_position'], []).append(inst)
+    return by_word
+
+
+def summarize_qalqalah(qalqalah_instances):
+    """
+    The per-ayah qalqalah_summary block, built in one pass over the instances.
+    Words are listed once each, in the order they appear in the ayah.
+    """
+    words_by_position = {}
+    kubra_targets = {}
+    kubra_count = sughra_count = 0
+    for inst in qalqalah_instances:
+        words_by_position[inst['word_position']] = inst['word']
+        if inst['type'] == 'Qalqalah_Kubra':
+            kubra_count += 1
+            kubra_targets[inst['word']] = True
+        elif inst['type'] == 'Qalqalah_Sughra':
+            sughra_count += 1
+
+    return {
+        "total_occurrences": len(qalqalah_instances),
+        "words_with_qalqalah": list(dict.fromkeys(words_by_position[pos] for pos in sorted(words_by_position))),
+        "qalqalah_kubra_count": kubra_count,
+        "qalqalah_sughra_count": sughra_count,
+        "primary_targets": list(kubra_targets)
+    }
+
+
+def annotate_qalqalah(ayah_tokens):
+    """
+    Run detect_qalqalah_tokens over many ayahs.
+
+    ayah_tokens maps (surah_number, ayah_number) -> AyahTokens (see
+    quran_tokens.load_ayah_tokens); the result maps the same keys to their
+    Qalqalah instances (ayahs without any are left out).
+    """
+    annotations = {}
+    for (surah_number, ayah_number), tokens in ayah_tokens.items():
+        instances = detect_qalqalah_tokens(tokens, ayah_number)
+        if instances:
+            annotations[(surah_number, ayah_number)] = instances
+    return annotations
+
+
+def main():
+    """Annotate every ayah with known text and print totals."""
+    ayah_tokens = load_ayah_tokens()
+
+    start = time.perf_counter()
+    annotations = annotate_qalqalah(ayah_tokens)
+    elapsed = time.perf_counter() - start
+
+    total_kubra = sum(1 for instances in annotations.values() for inst in instances if inst['type'] == 'Qalqalah_Kubra')
+    total_sughra = sum(1 for instances in annotations.values() for inst in instances if inst['type'] == 'Qalqalah_Sughra')
+
+    print(f"Annotated {len(ayah_tokens)} ayahs in {elapsed * 1000:.1f} ms")
+    print(f"Ayahs with Qalqalah: {len(annotations)}")
+    print(f"  - Qalqalah Kubra: {total_kubra}")
+    print(f"  - Qalqalah Sughra: {total_sughra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import csv
+import os
+from functools import lru_cache
+
+from mushaf_index import load_mushaf_index
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+FATIHA_CSV_PATH = os.path.join(BASE_PATH, 'fatiha_tajweed_dataset', 'fatiha_tajweed_annotations.csv')
+
+# Surah Al-Falaq Arabic text (5 ayahs), used when the mushaf pages are not available
+FALAQ_TEXT = {
+    1: "قُلْ أَعُوذُ بِرَبِّ الْفَلَقِ",
+    2: "مِن شَرِّ مَا خَلَقَ",
+    3: "وَمِن شَرِّ غَاسِقٍ إِذَا وَقَبَ",
+    4: "وَمِن شَرِّ النَّفَّاثَاتِ فِي الْعُقَدِ",
+    5: "وَمِن شَرِّ حَاسِدٍ إِذَا حَسَدَ"
+}
+
+
+def load_fatiha_text(csv_path=FATIHA_CSV_PATH):
+    """Rebuild Al-Fatiha's ayah texts from the word rows of the annotation CSV."""
+    words = {}
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                key = int(row['ayah_number'])
+                words.setdefault(key, []).append((int(row['word_index']), row['word_text']))
+    except FileNotFoundError:
+        return {}
+    return {ayah_num: ' '.join(text for _, text in sorted(ayah_words))
+            for ayah_num, ayah_words in words.items()}
+
+
+@lru_cache(maxsize=None)
+def _load_texts():
+    """(ayah_texts, split_words) as in load_mushaf_index, with the fallback and Fatiha texts added."""
+    ayah_texts, _, split_words = load_mushaf_index()
+    if not ayah_texts:
+        ayah_texts = {(113, ayah_number): text for ayah_number, text in FALAQ_TEXT.items()}
+    # The mushaf index leaves Al-Fatiha out (its ayahs are split differently)
+    ayah_texts.update({(1, ayah_number): text for ayah_number, text in load_fatiha_text().items()})
+    return ayah_texts, split_words
+
+
+def _all_ayah_texts():
+    return _load_texts()[0]
+
+
+def load_ayah_texts(surah_numbers=None):
+    """
+    Return {(surah_number, ayah_number): text} for every ayah with known text,
+    optionally limited to some surahs.
+
+    Texts come from the mushaf page index (mushaf_index.py, built on first
+    use) and Al-Fatiha from the annotation CSV.
+    """
+    ayah_texts = _all_ayah_texts()
+    if surah_numbers is None:
+        return dict(ayah_texts)
+    return {key: text for key, text in ayah_texts.items() if key[0] in surah_numbers}
+
+
+def load_surah_text(surah_number):
+    """Return {ayah_number: text} for one surah."""
+    return {ayah_number: text for (number, ayah_number), text in sorted(load_ayah_texts([surah_number]).items())}
+
+
+def get_ayah_text(surah_number, ayah_number):
+    """Text of one ayah, or None if it is not known."""
+    return _all_ayah_texts().get((surah_number, ayah_number))
+
+
+def get_word_spans(surah_number, ayah_number):
+    """
+    [(first, last)] QUL word numbers of every word of an ayah's text, or None
+    if the ayah is not known or its words cannot be lined up with QUL.
+
+    QUL numbers the vocative يا on its own where the mushaf joins it to the
+    next word (يٰٓأَيُّهَا), so such a word spans two QUL words and the words
+    after it are shifted by one.
+    """
+    ayah_texts, split_words = _load_texts()
+    text = ayah_texts.get((surah_number, ayah_number))
+    splits = split_words.get((surah_number, ayah_number), ())
+    if text is None or splits is None:
+        return None
+    spans, first = [], 1
+    for word_index in range(1, len(text.split()) + 1):
+        last = first + (word_index in splits)
+        spans.append((first, last))
+        first = last + 1
+    return spans
+
+
+def qul_to_text_words(surah_number, ayah_number):
+    """
+    {QUL word number: 1-based text word} for the words that are one QUL word
+    each; empty if the ayah cannot be lined up with QUL (see get_word_spans).
+    """
+    spans = get_word_spans(surah_number, ayah_number) or []
+    return {first: word_index for word_index, (first, last) in enumerate(spans, 1) if first == last}
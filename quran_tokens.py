@@ -0,0 +1,161 @@
+import hashlib
+import os
+import pickle
+import time
+from array import array
+
+from quran_text import load_ayah_texts
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+TOKEN_CACHE_PATH = os.path.join(BASE_PATH, 'quran_tokens.pkl')
+TOKEN_CACHE_VERSION = 1
+
+# Harakat bits, one per mark that can sit on a letter
+FATHA = 1 << 0
+KASRA = 1 << 1
+DAMMA = 1 << 2
+SUKOON = 1 << 3
+SHADDA = 1 << 4
+FATHATAN = 1 << 5
+KASRATAN = 1 << 6
+DAMMATAN = 1 << 7
+SUPERSCRIPT_ALEF = 1 << 8
+MADDAH = 1 << 9
+HAMZA_ABOVE = 1 << 10
+HAMZA_BELOW = 1 << 11
+OTHER_MARK = 1 << 12
+
+TANWEEN = FATHATAN | KASRATAN | DAMMATAN
+# Any of these means the letter is voweled, so it is not sakin
+VOWEL_BITS = FATHA | KASRA | DAMMA | SHADDA | TANWEEN | SUPERSCRIPT_ALEF
+
+MARK_BITS = {
+    'َ': FATHA,
+    'ِ': KASRA,
+    'ُ': DAMMA,
+    'ْ': SUKOON,
+    'ۡ': SUKOON,            # Uthmani sukoon (small high dotless head of khah)
+    'ّ': SHADDA,
+    'ً': FATHATAN,
+    'ٍ': KASRATAN,
+    'ٌ': DAMMATAN,
+    'ٰ': SUPERSCRIPT_ALEF,
+    'ٓ': MADDAH,
+    'ٔ': HAMZA_ABOVE,
+    'ٕ': HAMZA_BELOW,
+}
+
+
+def mark_bit(char):
+    """Harakat bit for a combining mark, or 0 if char starts a new grapheme."""
+    bit = MARK_BITS.get(char)
+    if bit is not None:
+        return bit
+    code = ord(char)
+    # Remaining Arabic combining marks and small Quranic annotation signs
+    if 0x0610 <= code <= 0x061A or 0x0656 <= code <= 0x065F or 0x06D6 <= code <= 0x06ED:
+        return OTHER_MARK
+    return 0
+
+
+class AyahTokens:
+    """
+    Letter + harakat lattice of one ayah, as parallel arrays.
+
+    letters[i]    code point of the i-th base letter
+    marks[i]      OR of the harakat bits stacked on it
+    words[i]      1-based index of its word in the ayah
+    positions[i]  index of the letter within its word string
+    """
+
+    __slots__ = ('letters', 'marks', 'words', 'positions', 'word_texts')
+
+    def __init__(self, letters, marks, words, positions, word_texts):
+        self.letters = letters
+        self.marks = marks
+        self.words = words
+        self.positions = positions
+        self.word_texts = word_texts
+
+    def __len__(self):
+        return len(self.letters)
+
+    def is_word_end(self, i):
+        """True if token i is the last letter of its word."""
+        return i + 1 == len(self.words) or self.words[i + 1] != self.words[i]
+
+
+def tokenize_ayah(ayah_text):
+    """Split an ayah into base letters, folding every following mark into a bitmask."""
+    letters, marks, words, positions = array('H'), array('H'), array('H'), array('H')
+    word_texts = ayah_text.split()
+
+    for word_index, word in enumerate(word_texts, 1):
+        for char_index, char in enumerate(word):
+            bit = mark_bit(char)
+            if bit and letters and words[-1] == word_index:
+                marks[-1] |= bit
+                continue
+            letters.append(ord(char))
+            marks.append(bit)
+            words.append(word_index)
+            positions.append(char_index)
+
+    return AyahTokens(letters, marks, words, positions, word_texts)
+
+
+def _texts_digest(ayah_texts):
+    """Fingerprint of the text source, so a stale cache is rebuilt."""
+    digest = hashlib.sha256(str(TOKEN_CACHE_VERSION).encode())
+    for key in sorted(ayah_texts):
+        digest.update(f"{key[0]}:{key[1]}:{ayah_texts[key]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_token_cache(ayah_texts, cache_path=TOKEN_CACHE_PATH):
+    """Tokenize every ayah and pickle the lattices to cache_path."""
+    tokens = {key: tokenize_ayah(text) for key, text in ayah_texts.items()}
+    payload = {
+        "digest": _texts_digest(ayah_texts),
+        "tokens": {key: (t.letters, t.marks, t.words, t.positions, t.word_texts) for key, t in tokens.items()}
+    }
+    with open(cache_path, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return tokens
+
+
+def load_ayah_tokens(surah_numbers=None, cache_path=TOKEN_CACHE_PATH, rebuild=False):
+    """
+    Return {(surah_number, ayah_number): AyahTokens}.
+
+    The lattice for every known ayah is cached on disk and reused while the
+    ayah texts are unchanged; the surah filter is applied after loading.
+    """
+    ayah_texts = load_ayah_texts()
+    tokens = None
+
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                payload = pickle.load(f)
+            if payload.get("digest") == _texts_digest(ayah_texts):
+                tokens = {key: AyahTokens(*fields) for key, fields in payload["tokens"].items()}
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError) as e:
+            print(f"Warning: Ignoring unreadable token cache {cache_path}: {e}")
+
+    if tokens is None:
+        tokens = build_token_cache(ayah_texts, cache_path)
+
+    if surah_numbers is None:
+        return tokens
+    return {key: value for key, value in tokens.items() if key[0] in surah_numbers}
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    all_tokens = load_ayah_tokens(rebuild=True)
+    elapsed = time.perf_counter() - start
+    total = sum(len(t) for t in all_tokens.values())
+    print(f"Tokenized {len(all_tokens)} ayahs into {total} letters in {elapsed * 1000:.1f} ms")
+    print(f"Saved token cache to: {TOKEN_CACHE_PATH}")
@@ -0,0 +1,317 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+
+from qalqalah_rules import detect_qalqalah_tokens
+from quran_text import get_word_spans
+from quran_tokens import (FATHA, KASRA, DAMMA, SUKOON, SHADDA, TANWEEN, SUPERSCRIPT_ALEF, MADDAH,
+                          VOWEL_BITS, load_ayah_tokens)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from corpus_store import CORPUS_DB_PATH, open_corpus_store, get_surahs
+from json_output import DEFAULT_JSON_FORMAT, JSON_FORMATS, dump_json
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_PATH, 'tajweed_annotation')
+RECITER_KEY = 'husary'
+CSV_COLUMNS = ['surah_number', 'ayah_number', 'word_index', 'word_text', 'start_time_ms',
+               'end_time_ms', 'duration_ms', 'tajweed_rules', 'notes']
+RULE_SEPARATOR = '; '
+
+
+def _codes(letters):
+    return frozenset(ord(letter) for letter in letters)
+
+
+NOON = ord('ن')
+MEEM = ord('م')
+LAM = ord('ل')
+ALEF_CODES = _codes('اٱ')
+# Letters skipped when looking for the letter after noon sakinah/tanween
+# (the alef after tanween fath, alef maqsura and hamzat al-wasl are not pronounced)
+SILENT_CODES = _codes('اىٱ')
+
+# Noon sakinah / tanween
+IZHAR_CODES = _codes('ءأإؤئهعحغخ')
+IDGHAM_GHUNNAH_CODES = _codes('ينمو')
+IDGHAM_NO_GHUNNAH_CODES = _codes('رل')
+IQLAB_CODES = _codes('ب')
+IKHFA_CODES = _codes('تثجدذزسشصضطظفقك')
+
+# Lam of the definite article
+SUN_CODES = _codes('تثدذرزسشصضطظلن')
+ARTICLE_PREFIX_CODES = _codes('وفبك')
+
+# Madd letters and the vowel each one lengthens
+MADD_LETTERS = {ord('ا'): FATHA, ord('ى'): FATHA, ord('و'): DAMMA, ord('ي'): KASRA}
+
+
+def _instance(tokens, i, rule, reason):
+    word_position = tokens.words[i]
+    return {
+        'word': tokens.word_texts[word_position - 1],
+        'word_position': word_position,
+        'letter': chr(tokens.letters[i]),
+        'letter_position': tokens.positions[i],
+        'type': rule,
+        'reason': reason
+    }
+
+
+def _next_spoken(tokens, i):
+    """Index of the next pronounced letter after token i (may be in the next word), or None."""
+    for j in range(i + 1, len(tokens)):
+        if tokens.letters[j] in SILENT_CODES and not tokens.marks[j] & VOWEL_BITS:
+            continue
+        return j
+    return None
+
+
+def _noon_rule(tokens, i, j):
+    """Rule for the noon sakinah/tanween at token i followed by token j."""
+    code = tokens.letters[j]
+    same_word = tokens.words[i] == tokens.words[j]
+    if code in IZHAR_CODES:
+        return 'Izhar', 'is followed by a throat letter'
+    if code in IQLAB_CODES:
+        return 'Iqlab', 'is followed by ب'
+    if code in IKHFA_CODES:
+        return 'Ikhfa', 'is followed by'
+    if same_word and (code in IDGHAM_GHUNNAH_CODES or code in IDGHAM_NO_GHUNNAH_CODES):
+        return 'Izhar', 'is followed by an idgham letter in the same word'
+    if code in IDGHAM_GHUNNAH_CODES:
+        return 'Idgham', 'merges with ghunnah into'
+    if code in IDGHAM_NO_GHUNNAH_CODES:
+        return 'Idgham', 'merges without ghunnah into'
+    return None, None
+
+
+def _article_lam(tokens, i):
+    """
+    (rule, reason) for a word-initial definite article whose lam is token
+    i, or (None, None). The article is ال, or a لِ/لَ prefix that drops its
+    alef (لِلنَّاسِ). A lam with shadda there is the article merged into the
+    lam of the word (الَّذِيْنَ, لِلَّهِ), which makes it shamsiyyah.
+    """
+    start = i - 1
+    if start < 0 or tokens.words[start] != tokens.words[i]:
+        return None, None
+    if tokens.letters[start] == LAM:
+        if not tokens.marks[start] & (FATHA | KASRA):
+            return None, None
+    elif tokens.letters[start] not in ALEF_CODES:
+        return None, None
+    if start > 0 and tokens.words[start - 1] == tokens.words[i]:
+        # Allow one attached prefix (وَ فَ بِ كَ) before the article
+        if start > 1 and tokens.words[start - 2] == tokens.words[i]:
+            return None, None
+        if tokens.letters[start - 1] not in ARTICLE_PREFIX_CODES:
+            return None, None
+    if tokens.marks[i] & SHADDA:
+        return 'Lam_Shamsiyyah', 'ل of the article merges into the ل with shaddah'
+    if tokens.marks[i] & VOWEL_BITS or tokens.is_word_end(i):
+        return None, None
+    rule = 'Lam_Shamsiyyah' if tokens.letters[i + 1] in SUN_CODES else 'Lam_Qamariyyah'
+    return rule, f'ل is followed by {chr(tokens.letters[i + 1])}'
+
+
+def annotate_ayah(tokens, ayah_number):
+    """
+    Apply every tajweed rule to one tokenized ayah.
+
+    One pass over the letters covers noon sakinah/tanween (Izhar, Idgham,
+    Iqlab, Ikhfa, looking across word boundaries), Ghunnah, Madd and the
+    lam of the definite article; Qalqalah comes from qalqalah_rules.
+    Returns instance dicts in the same shape as detect_qalqalah_strict.
+    """
+    instances = []
+    letters, marks = tokens.letters, tokens.marks
+
+    for i in range(len(tokens)):
+        code, mask = letters[i], marks[i]
+        letter = chr(code)
+
+        # Noon sakinah (sukoon or bare noon) and tanween
+        is_noon_sakinah = code == NOON and (mask & SUKOON or not mask & VOWEL_BITS)
+        if is_noon_sakinah or mask & TANWEEN:
+            j = _next_spoken(tokens, i)
+            if j is not None:
+                rule, reason = _noon_rule(tokens, i, j)
+                if rule:
+                    source = 'ن' if is_noon_sakinah else 'tanween'
+                    instances.append(_instance(tokens, i, rule, f'{source} {reason} {chr(letters[j])}'))
+
+        # Ghunnah on a doubled noon or meem
+        if (code == NOON or code == MEEM) and mask & SHADDA:
+            instances.append(_instance(tokens, i, 'Ghunnah', f'{letter} has shaddah'))
+
+        # Madd: a letter lengthened by its matching madd letter, superscript alef or maddah
+        if mask & (SUPERSCRIPT_ALEF | MADDAH):
+            instances.append(_instance(tokens, i, 'Madd', f'prolongation of {letter}'))
+        elif i + 1 < len(tokens) and tokens.words[i + 1] == tokens.words[i]:
+            vowel = MADD_LETTERS.get(letters[i + 1])
+            if vowel and mask & vowel and not marks[i + 1] & VOWEL_BITS:
+                instances.append(_instance(tokens, i, 'Madd', f'prolongation of {chr(letters[i + 1])}'))
+
+        # Lam of the definite article
+        if code == LAM:
+            rule, reason = _article_lam(tokens, i)
+            if rule:
+                instances.append(_instance(tokens, i, rule, reason))
+
+    instances.extend(detect_qalqalah_tokens(tokens, ayah_number))
+    return instances
+
+
+def rules_by_word(instances):
+    """{word_position: (rules, notes)} with each rule listed once per word."""
+    by_word = {}
+    for inst in instances:
+        rules, notes = by_word.setdefault(inst['word_position'], ([], []))
+        if inst['type'] not in rules:
+            rules.append(inst['type'])
+        notes.append(inst['reason'])
+    return by_word
+
+
+def annotate_surahs(surah_numbers=None):
+    """{(surah_number, ayah_number): instances} for every ayah with known text."""
+    return {(surah_number, ayah_number): annotate_ayah(tokens, ayah_number)
+            for (surah_number, ayah_number), tokens in load_ayah_tokens(surah_numbers).items()}
+
+
+def load_word_timings(surah_numbers, reciter_key=RECITER_KEY, db_path=CORPUS_DB_PATH):
+    """{(surah, ayah, QUL word number): (start_ms, end_ms)} from the corpus store, if it has been built."""
+    if not os.path.exists(db_path):
+        print(f"Warning: Corpus store not found at {db_path}, writing rows without timings")
+        return {}
+    conn = open_corpus_store(db_path)
+    try:
+        surahs = get_surahs(conn, surah_numbers, [reciter_key]).get(reciter_key, {})
+    finally:
+        conn.close()
+    timings = {}
+    for surah_number, ayahs in surahs.items():
+        for ayah_number, ayah_data in ayahs.items():
+            for word_index, start_ms, end_ms in ayah_data["segments"]:
+                timings[(surah_number, ayah_number, word_index)] = (start_ms, end_ms)
+    return timings
+
+
+def build_rows(annotations, timings):
+    """
+    Word rows in the fatiha_tajweed_annotations.csv layout. A word that is
+    two QUL words runs from the start of the first to the end of the second;
+    ayahs whose words cannot be lined up with QUL get no timings.
+    """
+    tokens = load_ayah_tokens({surah_number for surah_number, _ in annotations})
+    rows = []
+    for key in sorted(annotations):
+        by_word = rules_by_word(annotations[key])
+        spans = get_word_spans(*key) or []
+        for word_index, word_text in enumerate(tokens[key].word_texts, 1):
+            start_ms = end_ms = ''
+            if word_index <= len(spans):
+                first, last = spans[word_index - 1]
+                if (key[0], key[1], first) in timings and (key[0], key[1], last) in timings:
+                    start_ms, end_ms = timings[(key[0], key[1], first)][0], timings[(key[0], key[1], last)][1]
+            rules, notes = by_word.get(word_index, ([], []))
+            rows.append({
+                'surah_number': key[0],
+                'ayah_number': key[1],
+                'word_index': word_index,
+                'word_text': word_text,
+                'start_time_ms': start_ms,
+                'end_time_ms': end_ms,
+                'duration_ms': end_ms - start_ms if start_ms != '' else '',
+                'tajweed_rules': RULE_SEPARATOR.join(rules),
+                'notes': RULE_SEPARATOR.join(notes)
+            })
+    return rows
+
+
+def fill_annotation_csv(csv_path, annotations):
+    """Fill tajweed_rules/notes of an existing word-level CSV in place, keeping its timings."""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    by_ayah = {key: rules_by_word(instances) for key, instances in annotations.items()}
+    filled = 0
+    for row in rows:
+        key = (int(row['surah_number']), int(row['ayah_number']))
+        if key not in by_ayah:
+            continue
+        rules, notes = by_ayah[key].get(int(row['word_index']), ([], []))
+        row['tajweed_rules'] = RULE_SEPARATOR.join(rules)
+        row['notes'] = RULE_SEPARATOR.join(notes)
+        filled += 1
+
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    return filled
+
+
+def save_annotations(rows, annotations, output_dir, reciter_key, json_format=DEFAULT_JSON_FORMAT):
+    """Write the word rows as CSV and the full instances as JSON (one ayah per line for 'jsonl')."""
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, f'{reciter_key}_tajweed_annotations.csv')
+    json_path = os.path.join(output_dir, f'{reciter_key}_tajweed_annotations.json')
+
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    surahs = {}
+    for (surah_number, ayah_number), instances in sorted(annotations.items()):
+        surahs.setdefault(str(surah_number), {})[str(ayah_number)] = instances
+    json_path = dump_json({
+        "metadata": {
+            "created_date": datetime.now().isoformat(),
+            "reciter_key": reciter_key,
+            "total_ayahs": len(annotations),
+            "total_words": len(rows)
+        },
+        "surahs": surahs
+    }, json_path, json_format, records_key="surahs", depth=2)
+    return csv_path, json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate tajweed rules for every word.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every surah with text)")
+    parser.add_argument('--reciter', default=RECITER_KEY, help="reciter whose word timings go in the CSV")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--fill', metavar='CSV', help="fill an existing word-level CSV in place instead")
+    parser.add_argument('--json-format', choices=JSON_FORMATS, default=DEFAULT_JSON_FORMAT,
+                        help="indented (default), compact (no whitespace) or jsonl (one ayah per line)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    annotations = annotate_surahs(args.surahs)
+    elapsed = time.perf_counter() - start
+    total = sum(len(instances) for instances in annotations.values())
+    print(f"Annotated {len(annotations)} ayahs ({total} rule instances) in {elapsed * 1000:.1f} ms")
+
+    if args.fill:
+        filled = fill_annotation_csv(args.fill, annotations)
+        print(f"Filled {filled} words in {args.fill}")
+        return
+
+    timings = load_word_timings(sorted({surah_number for surah_number, _ in annotations}), args.reciter)
+    rows = build_rows(annotations, timings)
+    csv_path, json_path = save_annotations(rows, annotations, args.output_dir, args.reciter, args.json_format)
+    print(f"Saved annotations to: {csv_path}")
+    print(f"Saved annotations to: {json_path}")
+
+
+if __name__ == "__main__":
+    main()
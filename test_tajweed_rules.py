@@ -0,0 +1,39 @@
+import unittest
+
+from mushaf_index import normalize_word
+from quran_tokens import tokenize_ayah
+from tajweed_rules import annotate_ayah, annotate_surahs
+
+
+def lam_rules(instances):
+    return [(inst['word_position'], inst['type']) for inst in instances if inst['type'].startswith('Lam_')]
+
+
+class ArticleLamTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.annotations = annotate_surahs([1, 112])
+
+    def test_fatiha_7_merged_lam(self):
+        # صِرَاطَ الَّذِينَ ... الْمَغْضُوبِ ... الضَّالِّينَ
+        self.assertEqual(lam_rules(self.annotations[(1, 7)]),
+                         [(2, 'Lam_Shamsiyyah'), (6, 'Lam_Qamariyyah'), (9, 'Lam_Shamsiyyah')])
+
+    def test_ikhlas_2_voweled_article(self):
+        # اَللّٰهُ الصَّمَدُ: the sentence-initial article alef is voweled in the mushaf
+        self.assertEqual(lam_rules(self.annotations[(112, 2)]), [(1, 'Lam_Shamsiyyah'), (2, 'Lam_Shamsiyyah')])
+
+    def test_lam_prefix_drops_the_alef(self):
+        tokens = tokenize_ayah('لِلَّهِ لِلنَّاسِ لِلْمُتَّقِيْنَ')
+        self.assertEqual(lam_rules(annotate_ayah(tokens, 1)),
+                         [(1, 'Lam_Shamsiyyah'), (2, 'Lam_Shamsiyyah'), (3, 'Lam_Qamariyyah')])
+
+    def test_hamza_lam_words_are_not_articles(self):
+        words = [normalize_word(word) for word in ('اَلَّا', 'اَلْفَ', 'اَلْقٰى', 'اَلَمْ')]
+        self.assertEqual(lam_rules(annotate_ayah(tokenize_ayah(' '.join(words)), 1)), [])
+        self.assertTrue(all(word.startswith('أ') for word in words))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tarfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import soundfile as sf
+
+from tajweed_rules import annotate_surahs, rules_by_word
+from quran_text import qul_to_text_words
+from quran_tokens import load_ayah_tokens
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_script'))
+from audio_cache import SAMPLE_RATE, get_pcm
+from audio_features import downloaded_surahs
+from segment_arrays import PLACEHOLDER_MAX_MS, SEGMENT_ARRAYS_DIR, SegmentArrays
+
+# Configuration
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_PATH, 'word_clip_shards')
+CLIPS_PER_SHARD = 2000
+# Extra audio kept on each side of a word segment
+CLIP_PADDING_MS = 0
+MAX_WORKERS = os.cpu_count() or 1
+
+
+def plan_clips(arrays, surah_numbers=None, reciters=None):
+    """
+    One entry per word to cut, ordered by reciter/surah/ayah/word so that
+    a shard reads each ayah's audio only once. Only surahs that have been
+    downloaded for a reciter are included. Placeholder segments (QUL's
+    PLACEHOLDER_MAX_MS or shorter) are not words and are left out, and a
+    word the reciter repeats is cut from its first recitation only, so
+    every clip key is unique.
+    """
+    reciters = [key for key in (reciters or arrays.reciters) if key in arrays.reciter_ids]
+    clips = []
+    for reciter_key in reciters:
+        available = downloaded_surahs(reciter_key)
+        if surah_numbers is not None:
+            available = [surah_number for surah_number in available if surah_number in surah_numbers]
+        mask = arrays.rows_for(reciter_key, available)
+        clips.extend(_plan_rows(arrays, np.asarray(arrays.index[mask])))
+    return clips
+
+
+def _plan_rows(arrays, index_rows):
+    clips = []
+    for reciter_id, surah_number, ayah_number, offset, count in index_rows:
+        seen = set()
+        for word_number, start_ms, end_ms in np.asarray(arrays.segments[offset:offset + count]):
+            repeated = word_number in seen
+            seen.add(word_number)
+            if repeated or end_ms - start_ms <= PLACEHOLDER_MAX_MS:
+                continue
+            clips.append((arrays.reciters[reciter_id], int(surah_number), int(ayah_number),
+                          int(word_number), int(start_ms), int(end_ms)))
+    return clips
+
+
+def build_labels(surah_numbers=None):
+    """
+    {(surah, ayah, QUL word): {'word_text', 'tajweed_rules'}} for every ayah
+    with known text. Words the text joins (يٰٓأَيُّهَا is two QUL words) and
+    ayahs that cannot be lined up with QUL get no label.
+    """
+    tokens = load_ayah_tokens(surah_numbers)
+    labels = {}
+    for (surah_number, ayah_number), instances in annotate_surahs(surah_numbers).items():
+        by_word = rules_by_word(instances)
+        word_texts = tokens[(surah_number, ayah_number)].word_texts
+        for word_number, word_index in qul_to_text_words(surah_number, ayah_number).items():
+            labels[(surah_number, ayah_number, word_number)] = {
+                'word_text': word_texts[word_index - 1],
+                'tajweed_rules': by_word.get(word_index, ([], []))[0]
+            }
+    return labels
+
+
+def _add_bytes(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_shard(shard_path, clips, labels, padding_ms=CLIP_PADDING_MS):
+    """
+    Write one WebDataset-style tar: for each word a <key>.wav (16-bit mono)
+    and a <key>.json label, next to each other so readers stream them in order.
+    Returns the number of clips written.
+    """
+    padding = int(padding_ms * SAMPLE_RATE / 1000)
+    current_ayah, pcm = None, None
+    written = 0
+
+    temp_path = shard_path + '.part'
+    with tarfile.open(temp_path, 'w') as tar:
+        for reciter_key, surah_number, ayah_number, word_number, start_ms, end_ms in clips:
+            if (reciter_key, surah_number, ayah_number) != current_ayah:
+                current_ayah = (reciter_key, surah_number, ayah_number)
+                try:
+                    pcm = get_pcm(reciter_key, surah_number, ayah_number)
+                except (sf.LibsndfileError, RuntimeError) as e:
+                    print(f"Warning: Could not decode {reciter_key} {surah_number}:{ayah_number}: {e}")
+                    pcm = None
+            if pcm is None:
+                continue
+
+            start = max(start_ms * SAMPLE_RATE // 1000 - padding, 0)
+            end = min(end_ms * SAMPLE_RATE // 1000 + padding, len(pcm))
+            if end <= start:
+                continue
+
+            wav = io.BytesIO()
+            sf.write(wav, np.asarray(pcm[start:end]), SAMPLE_RATE, subtype='PCM_16', format='WAV')
+
+            key = f"{reciter_key}_{surah_number:03d}_{ayah_number:03d}_{word_number:03d}"
+            label = {
+                'reciter': reciter_key,
+                'surah_number': surah_number,
+                'ayah_number': ayah_number,
+                'word_index': word_number,
+                'start_ms': start_ms,
+                'end_ms': end_ms,
+                'word_text': None,
+                'tajweed_rules': []
+            }
+            label.update(labels.get((surah_number, ayah_number, word_number), {}))
+
+            _add_bytes(tar, f"{key}.wav", wav.getvalue())
+            _add_bytes(tar, f"{key}.json", json.dumps(label, ensure_ascii=False).encode('utf-8'))
+            written += 1
+
+    os.replace(temp_path, shard_path)
+    return written
+
+
+def export_word_clips(surah_numbers=None, reciters=None, output_dir=OUTPUT_DIR, clips_per_shard=CLIPS_PER_SHARD,
+                      arrays_dir=SEGMENT_ARRAYS_DIR, workers=MAX_WORKERS):
+    """Cut every selected word clip and pack them into shards in parallel. Returns the manifest."""
+    arrays = SegmentArrays(arrays_dir)
+    clips = plan_clips(arrays, surah_numbers, reciters)
+    labels = build_labels(surah_numbers)
+    os.makedirs(output_dir, exist_ok=True)
+
+    shards = [clips[i:i + clips_per_shard] for i in range(0, len(clips), clips_per_shard)]
+    counts = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for shard_number, shard_clips in enumerate(shards):
+            shard_name = f"words-{shard_number:05d}.tar"
+            shard_labels = {key: labels[key] for key in {clip[1:4] for clip in shard_clips} if key in labels}
+            future = executor.submit(write_shard, os.path.join(output_dir, shard_name), shard_clips, shard_labels)
+            futures[future] = shard_name
+        for future in as_completed(futures):
+            counts[futures[future]] = future.result()
+            print(f"  {futures[future]}: {counts[futures[future]]} clips")
+
+    manifest = {
+        "sample_rate": SAMPLE_RATE,
+        "padding_ms": CLIP_PADDING_MS,
+        "total_clips": sum(counts.values()),
+        "shards": [{"file": name, "clips": counts[name]} for name in sorted(counts)]
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export word-level audio clips as WebDataset-style tar shards.")
+    parser.add_argument('--surahs', type=int, nargs='*', help="surah numbers (default: every downloaded surah)")
+    parser.add_argument('--reciters', nargs='*', help="reciter keys (default: every reciter in the segment arrays)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--clips-per-shard', type=int, default=CLIPS_PER_SHARD)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    print("Exporting word clips...")
+    manifest = export_word_clips(args.surahs, args.reciters, args.output_dir, args.clips_per_shard, workers=args.workers)
+    print(f"Exported {manifest['total_clips']} clips in {len(manifest['shards'])} shards to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()